@@ -0,0 +1,413 @@
+#!/usr/bin/env python3
+"""
+和风天气异步工具
+与 WeatherToolkit 语义和缓存一致（过期数据策略、历史、预取记录相同），
+基于 aiohttp 共享连接池，可限制并发数
+"""
+
+import asyncio
+import time
+from typing import Dict, Iterable, List, Optional
+
+import aiohttp
+
+from cache import LRUCache
+from city_index import CityIndex
+from city_resolver import CityResolver, cached_search, search_cache_key, store_search
+from history_store import HistoryStore
+from http_transport import DEFAULT_TIMEOUT, UpstreamCall, build_url
+from metrics import Metrics, get_default_metrics
+from observation import Observation
+from output_sink import NDJSONSink
+from rate_limiter import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, QuotaExceeded, RateLimiter
+from resilience import CircuitBreakerRegistry, CircuitOpenError, RetryPolicy
+from response_decoder import decode_weather_now, loads, project_locations
+from singleflight import AsyncSingleFlight, request_key
+from token_manager import get_file_token_provider
+from tracing import Tracer, get_default_tracer
+from weather_toolkit import (SEARCH_PATH, WEATHER_PATH, WeatherToolkit, search_params,
+                             weather_params)
+
+DEFAULT_MAX_CONCURRENCY = 100
+
+
+class AsyncWeatherToolkit:
+    """异步天气工具箱"""
+
+    # 格式化方法与同步版本共用
+    format_city_list = WeatherToolkit.format_city_list
+    format_weather = WeatherToolkit.format_weather
+    # 天气缓存的读取、过期数据和保存逻辑与同步版本共用（后台刷新的方式不同）
+    _stale_weather = WeatherToolkit._stale_weather
+    _cached_weather = WeatherToolkit._cached_weather
+    _store_weather = WeatherToolkit._store_weather
+
+    def __init__(self, api_host: str, jwt_token_file: str,
+                 token_provider=None,
+                 cache: Optional[LRUCache] = None,
+                 city_index: Optional[CityIndex] = None,
+                 max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                 timeout: float = DEFAULT_TIMEOUT,
+                 session: Optional[aiohttp.ClientSession] = None,
+                 singleflight: Optional[AsyncSingleFlight] = None,
+                 stale_while_revalidate: float = 0,
+                 stale_if_error: float = 0,
+                 history: Optional[HistoryStore] = None,
+                 rate_limiter: Optional[RateLimiter] = None,
+                 retry_policy: Optional[RetryPolicy] = None,
+                 breakers: Optional[CircuitBreakerRegistry] = None,
+                 metrics: Optional[Metrics] = None,
+                 tracer: Optional[Tracer] = None,
+                 resolver: Optional[CityResolver] = None):
+        """
+        :param api_host: API Host
+        :param jwt_token_file: JWT令牌文件（未指定 token_provider 时使用）
+        :param token_provider: 令牌提供者，需实现 get_token()
+        :param cache: 缓存，默认新建一个有界 LRU 缓存（可与同步工具箱共用）
+        :param city_index: 离线城市索引
+        :param max_concurrency: 同时进行的最大请求数（也是连接池大小）
+        :param timeout: 单次请求超时时间（秒）
+        :param session: 外部传入的 aiohttp 会话（多个工具箱共用连接池时使用）
+        :param singleflight: 请求合并器，相同接口和参数的并发请求只发出一次
+        :param stale_while_revalidate: 天气缓存过期后多少秒内直接返回旧数据并在后台刷新
+        :param stale_if_error: 天气缓存过期后多少秒内，上游出错时返回旧数据
+        :param history: 观测历史存储，每次从上游获取的观测都会追加保存
+        :param rate_limiter: 限流器（可与同步客户端的传输层共用同一个实例）
+        :param retry_policy: 重试策略，默认最多尝试3次
+        :param breakers: 按接口路径的熔断器（可与同步客户端的传输层共用）
+        :param metrics: 指标注册表，默认使用进程内共享的注册表（与同步客户端相同）
+        :param tracer: 链路追踪器，默认使用进程内共享的追踪器（span 按协程区分）
+        :param resolver: 城市名称解析层，lookup 须为协程函数；默认把名称解析结果长期保存在
+                         cache 的 "resolve" 命名空间（可与同步工具箱共用同一个缓存）
+        """
+        self.api_host = api_host
+        self.jwt_token_file = jwt_token_file
+        self.token_provider = token_provider or get_file_token_provider(jwt_token_file)
+        self.cache = cache if cache is not None else LRUCache()
+        self.city_index = city_index
+        self.max_concurrency = max_concurrency
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self._session = session
+        self._owns_session = session is None
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.singleflight = singleflight if singleflight is not None else AsyncSingleFlight()
+        self.stale_while_revalidate = stale_while_revalidate
+        self.stale_if_error = stale_if_error
+        self.history = history
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy if retry_policy is not None else RetryPolicy()
+        self.breakers = breakers if breakers is not None else CircuitBreakerRegistry()
+        self.metrics = metrics if metrics is not None else get_default_metrics()
+        self.tracer = tracer if tracer is not None else get_default_tracer()
+        self.resolver = resolver or CityResolver(self._lookup_city, cache=self.cache)
+        self._refreshing = set()
+        self._background = set()  # 后台刷新任务（保留引用，关闭时取消）
+        self.prefetcher = None  # prefetch.PrefetchScheduler 创建时登记
+
+    def load_jwt_token(self):
+        """加载JWT令牌（内存缓存）"""
+        return self.token_provider.get_token()
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_concurrency)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+            self._owns_session = True
+        return self._session
+
+    async def _get_json(self, path: str, params: Dict) -> Dict:
+        """发送GET请求并解析JSON（合并相同的并发请求）"""
+        return await self.singleflight.do(request_key(path, params), self._request_json, path, params)
+
+    async def _acquire_permit(self, priority: int):
+        """
+        等待限流许可
+
+        轮询限流器的非阻塞接口并在事件循环中等待，不占用线程池；
+        等待中被取消时不消耗令牌和额度
+        """
+        limiter = self.rate_limiter
+        waited = 0.0
+        while True:
+            delay = limiter.try_acquire(priority, waited)
+            if delay <= 0:
+                return
+            await asyncio.sleep(delay)
+            waited += delay
+
+    async def _request(self, path: str, params: Dict, priority: int = PRIORITY_INTERACTIVE):
+        """
+        发送GET请求（受并发数限制，失败时按重试策略退避重试）
+
+        重试、熔断和指标与 HttpTransport.get 共用 UpstreamCall：
+        4xx 和重试用尽的 429/5xx 同样返回最后一次的响应，由调用方检查状态码
+
+        :param priority: 限流优先级，后台刷新应使用 PRIORITY_BACKGROUND
+        :return: (响应, 响应体)
+        """
+        url = build_url(self.api_host, path)
+        headers = {"Authorization": f"Bearer {self.load_jwt_token()}"}
+        call = UpstreamCall(path, self.retry_policy, self.breakers.get(path), self.metrics)
+
+        while True:
+            try:
+                # 先取得限流许可再占用熔断器的探测名额，限流失败或等待时被取消不会占住名额
+                if self.rate_limiter is not None:
+                    await self._acquire_permit(priority)
+                call.before_attempt()
+            except (CircuitOpenError, QuotaExceeded) as e:
+                call.on_rejected(e)
+                raise
+
+            try:
+                async with self._semaphore:
+                    start = time.perf_counter()
+                    async with self._get_session().get(url, params=params,
+                                                       headers=headers) as response:
+                        body = await response.read()
+                    elapsed = time.perf_counter() - start
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                delay = call.on_error(e)
+                if delay is None:
+                    raise
+            except BaseException:
+                # 其他异常（如读取响应体出错、任务被取消）
+                call.on_interrupt()
+                raise
+            else:
+                delay = call.on_response(response.status, response.headers, body, elapsed)
+                if delay is None:
+                    return response, body
+            await asyncio.sleep(delay)
+
+    async def _request_json(self, path: str, params: Dict,
+                            priority: int = PRIORITY_INTERACTIVE) -> Dict:
+        """发送GET请求并解析JSON（HTTP错误状态抛出 aiohttp.ClientResponseError）"""
+        response, body = await self._request(path, params, priority)
+        response.raise_for_status()
+        return loads(body)
+
+    async def search_city(self, city_name: str, adm: Optional[str] = None,
+                          range_code: Optional[str] = None, number: int = 10) -> List[Dict]:
+        """
+        搜索城市
+
+        :param city_name: 城市名称（支持模糊搜索）
+        :param adm: 上级行政区划（用于过滤重名）
+        :param range_code: 搜索范围（国家代码）
+        :param number: 返回结果数量
+        :return: 城市列表
+        """
+        with self.tracer.span("resolve", query=city_name) as span:
+            if self.city_index is not None:
+                local = self.city_index.search(city_name, adm=adm, range_code=range_code,
+                                               number=number)
+                if local:
+                    span.set("source", "index")
+                    return local
+
+            cache_key = search_cache_key(city_name, adm, range_code)
+            cached = cached_search(self.cache, cache_key, number)
+            span.set("cache_hit", cached is not None)
+            if cached is not None:
+                return cached
+
+            try:
+                with self.tracer.span("request", endpoint=SEARCH_PATH):
+                    data = await self._get_json(SEARCH_PATH,
+                                                search_params(city_name, adm, range_code, number))
+                if data.get("code") == "404":
+                    store_search(self.cache, cache_key, number, [])  # 负缓存
+                    return []
+                if data.get("code") != "200":
+                    return []
+
+                locations = project_locations(data)
+                store_search(self.cache, cache_key, number, locations)
+                return locations
+
+            except Exception as e:
+                self.metrics.inc("qweather_client_errors_total", operation="search_city")
+                span.fail(str(e))
+                print(f"搜索失败: {e}")
+                return []
+
+    async def _lookup_city(self, city_name: str, adm: Optional[str] = None) -> Optional[Dict]:
+        """城市搜索的第一个结果（供解析层使用）"""
+        cities = await self.search_city(city_name, adm=adm, number=1)
+        return cities[0] if cities else None
+
+    async def get_weather_now(self, city_id: str) -> Optional[Observation]:
+        """
+        获取实时天气（解析后的 Observation）
+
+        启用 stale_while_revalidate / stale_if_error 时可能返回过期数据，
+        此时结果中带有 stale=True 和 age（已缓存秒数）
+        """
+        if self.prefetcher is not None:
+            self.prefetcher.record_access(city_id)
+        with self.tracer.span("fetch", city_id=city_id) as span:
+            cached = self._cached_weather(city_id)
+            span.set("cache_hit", cached is not None)
+            if cached is not None:
+                span.set("stale", cached.stale)
+                return cached
+
+            try:
+                return await self._load_weather_now(city_id)
+            except Exception as e:
+                self.metrics.inc("qweather_client_errors_total", operation="get_weather_now")
+                span.fail(str(e))
+                print(f"天气查询失败: {e}")
+                return self._stale_weather(city_id, self.stale_if_error)
+
+    async def _load_weather_now(self, city_id: str, priority: int = PRIORITY_INTERACTIVE,
+                                refresh: bool = False) -> Observation:
+        """合并同一城市的并发请求（解析也在合并范围内，并发调用方拿到同一个 Observation）"""
+        return await self.singleflight.do(request_key(WEATHER_PATH, weather_params(city_id)),
+                                          self._fetch_weather_now, city_id, priority, refresh)
+
+    async def _fetch_weather_now(self, city_id: str, priority: int = PRIORITY_INTERACTIVE,
+                                 refresh: bool = False) -> Observation:
+        """请求实时天气并写入缓存（失败时抛出异常；refresh=True 时忽略未过期的缓存）"""
+        # 等待合并期间其他调用可能已写入缓存
+        cached = None if refresh else self.cache.get("weather", city_id)
+        if cached is not None:
+            return cached
+
+        with self.tracer.span("request", endpoint=WEATHER_PATH):
+            response, body = await self._request(WEATHER_PATH, weather_params(city_id), priority)
+            response.raise_for_status()
+
+        with self.metrics.time("qweather_stage_seconds", endpoint=WEATHER_PATH, stage="parse"), \
+                self.tracer.span("parse"):
+            code, observation = decode_weather_now(body)
+            if code != "200":
+                raise ValueError(f"API错误: {code}")
+
+        self._store_weather(city_id, observation)
+        return observation
+
+    async def refresh_weather_now(self, city_id: str,
+                                  priority: int = PRIORITY_BACKGROUND) -> Observation:
+        """
+        忽略缓存重新请求实时天气并写入缓存（供预取使用，失败时抛出异常）
+
+        :param priority: 限流优先级，默认作为后台请求
+        """
+        return await self._load_weather_now(city_id, priority, refresh=True)
+
+    def _refresh_in_background(self, city_id: str):
+        """在后台任务中刷新天气缓存（同一城市同时只有一个刷新）"""
+        if city_id in self._refreshing:
+            return
+        self._refreshing.add(city_id)
+
+        async def refresh():
+            try:
+                await self._load_weather_now(city_id, PRIORITY_BACKGROUND)
+            except Exception as e:
+                print(f"后台刷新失败: {e}")
+            finally:
+                self._refreshing.discard(city_id)
+
+        task = asyncio.ensure_future(refresh())
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _weather_record(self, city_id: str) -> Dict:
+        weather = await self.get_weather_now(city_id)
+        return {"id": city_id, "data": weather, "error": None if weather else "查询失败"}
+
+    async def stream_weather(self, city_ids: Iterable[str], sink: NDJSONSink,
+                             window: Optional[int] = None) -> Dict[str, int]:
+        """
+        批量获取实时天气并逐条写入输出（按完成顺序，结果不在内存中累积）
+
+        :param city_ids: 城市ID（可迭代对象，按需读取）
+        :param sink: 输出，如 output_sink.open_sink("weather.ndjson.gz")
+        :param window: 同时在途的城市数，默认为 max_concurrency 的两倍
+        :return: {"written": 写入条数, "errors": 失败条数}
+        """
+        window = window or self.max_concurrency * 2
+        written = errors = 0
+        pending = set()
+
+        async def drain(return_when):
+            nonlocal pending, written, errors
+            done, pending = await asyncio.wait(pending, return_when=return_when)
+            for task in done:
+                record = task.result()
+                sink.write(record)
+                written += 1
+                errors += record["error"] is not None
+
+        for city_id in city_ids:
+            if len(pending) >= window:
+                await drain(asyncio.FIRST_COMPLETED)
+            pending.add(asyncio.ensure_future(self._weather_record(city_id)))
+        if pending:
+            await drain(asyncio.ALL_COMPLETED)
+
+        return {"written": written, "errors": errors}
+
+    async def query_weather_by_city(self, city_name: str,
+                                    adm: Optional[str] = None) -> Optional[Observation]:
+        """
+        通过城市名称查询天气
+
+        之前解析过的名称不再请求城市搜索接口；城市ID和"经度,纬度"直接查询天气
+
+        :param city_name: 城市名称、9位城市ID或"经度,纬度"
+        :param adm: 上级行政区划（用于过滤重名）
+        :return: 天气数据（city 属性为城市信息），未找到城市或查询失败返回 None
+        """
+        with self.tracer.span("query_weather_by_city", query=city_name):
+            city = await self.resolver.resolve_async(city_name, adm)
+            if not city:
+                return None
+
+            weather = await self.get_weather_now(city["id"])
+            if not weather:
+                return None
+            # 生成副本再附加城市信息，缓存中的对象保持不变
+            return weather.replace(city=city)
+
+    async def close(self):
+        """关闭连接池（外部传入的会话由调用方关闭）"""
+        for task in list(self._background):
+            task.cancel()
+        if self._owns_session and self._session is not None:
+            await self._session.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+
+async def _demo():
+    API_HOST = "kh3dn95ne6.re.qweatherapi.com"
+    JWT_TOKEN_FILE = "jwt_token.txt"
+
+    async with AsyncWeatherToolkit(API_HOST, JWT_TOKEN_FILE, max_concurrency=10) as toolkit:
+        cities = ["北京", "上海", "武汉", "广州", "深圳", "杭州"]
+        results = await asyncio.gather(*(toolkit.query_weather_by_city(c) for c in cities))
+        for city, weather in zip(cities, results):
+            if weather:
+                print(toolkit.format_weather(weather, weather.city))
+            else:
+                print(f"❌ 无法获取 {city} 的天气")
+
+
+def main():
+    """主函数：并发查询多个城市的天气"""
+    print("=" * 70)
+    print("和风天气异步查询工具")
+    print("=" * 70)
+    asyncio.run(_demo())
+
+
+if __name__ == "__main__":
+    main()
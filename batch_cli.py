@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+批量查询命令行
+从文件或标准输入逐行读取城市名称或城市ID，并发解析和查询，
+结果以 NDJSON / CSV / 文本表格流式写到标准输出，统计信息写到标准错误
+
+用法:
+    python batch_cli.py cities.txt --format csv
+    cat cities.txt | python batch_cli.py --order completion > weather.ndjson
+"""
+
+import argparse
+import contextlib
+import functools
+import json
+import sys
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Iterable, Iterator, Optional, TextIO
+
+from city_index import CityIndex
+from city_resolver import KIND_NAME, classify
+from output_sink import to_json_compatible
+from renderer import TableRenderer, weather_row
+from weather_toolkit import DEFAULT_MAX_WORKERS, WeatherToolkit
+
+DEFAULT_API_HOST = "kh3dn95ne6.re.qweatherapi.com"
+CSV_FIELDS = ("query", "id", "name", "adm1", "obs_time", "temp", "feels_like", "text",
+              "humidity", "wind_dir", "wind_scale", "pressure", "stale", "error")
+
+
+def read_queries(stream: TextIO) -> Iterator[str]:
+    """逐行读取查询（跳过空行和 # 开头的注释）"""
+    for line in stream:
+        line = line.strip()
+        if line and not line.startswith("#"):
+            yield line
+
+
+def resolve_and_fetch(toolkit: WeatherToolkit, query: str) -> Dict:
+    """
+    解析一行查询并获取天气
+
+    :param query: 9位城市ID、"经度,纬度"，或"城市名称"、"城市名称,上级行政区划"
+    :return: {"query", "city", "weather", "error"}
+    """
+    record = {"query": query, "city": None, "weather": None, "error": None}
+    name, adm = query, None
+    if classify(query) == KIND_NAME:
+        name, _, adm = query.partition(",")
+    # 重复的城市名称由解析层缓存，不再请求城市搜索接口
+    city = toolkit.resolver.resolve(name, (adm or "").strip() or None)
+    if not city:
+        record["error"] = "未找到城市"
+        return record
+
+    record["city"] = city
+    weather = toolkit.get_weather_now(city["id"])
+    if weather is None:
+        record["error"] = "天气查询失败"
+    else:
+        record["weather"] = weather
+    return record
+
+
+class NDJSONWriter:
+    """每条结果一行 JSON"""
+
+    def __init__(self, out: TextIO):
+        self.out = out
+
+    def write(self, record: Dict):
+        self.out.write(json.dumps(record, ensure_ascii=False, separators=(",", ":"),
+                                  default=to_json_compatible) + "\n")
+
+
+class TableWriter:
+    """每条结果一行 CSV 或文本表格（只包含常用字段）"""
+
+    def __init__(self, out: TextIO, fmt: str = "csv"):
+        # 每行立即写出，便于管道下游实时处理
+        self.renderer = TableRenderer(out, fmt, columns=CSV_FIELDS, chunk_rows=1)
+        self.renderer.flush()  # 表头
+
+    def write(self, record: Dict):
+        row = weather_row(record["weather"], record["city"] or {}, record["error"])
+        row["query"] = record["query"]
+        self.renderer.write(row)
+
+
+WRITERS = {"ndjson": NDJSONWriter,
+           "csv": functools.partial(TableWriter, fmt="csv"),
+           "table": functools.partial(TableWriter, fmt="table")}
+
+
+def run_batch(toolkit: WeatherToolkit, queries: Iterable[str], out: TextIO,
+              fmt: str = "ndjson", order: str = "input",
+              workers: int = DEFAULT_MAX_WORKERS, flush: bool = True) -> Dict:
+    """
+    并发处理查询并流式输出
+
+    同时在途的查询不超过 workers 的两倍；按输入顺序输出时，慢查询会阻塞后面已完成的结果
+
+    :param fmt: 输出格式，ndjson、csv 或 table（对齐的文本表格）
+    :param order: input（与输入顺序一致）或 completion（先完成先输出）
+    :param workers: 并发数
+    :param flush: 每条结果后刷新输出（便于管道下游实时处理）
+    :return: 统计信息
+    """
+    writer = WRITERS[fmt](out)
+    window = workers * 2
+    stats = {"total": 0, "ok": 0, "errors": 0}
+    start = time.perf_counter()
+
+    def emit(future):
+        record = future.result()
+        writer.write(record)
+        if flush:
+            out.flush()
+        stats["total"] += 1
+        stats["errors" if record["error"] else "ok"] += 1
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        if order == "input":
+            queue = deque()
+            for query in queries:
+                if len(queue) >= window:
+                    emit(queue.popleft())
+                queue.append(pool.submit(resolve_and_fetch, toolkit, query))
+            while queue:
+                emit(queue.popleft())
+        else:
+            pending = set()
+            for query in queries:
+                if len(pending) >= window:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        emit(future)
+                pending.add(pool.submit(resolve_and_fetch, toolkit, query))
+            for future in wait(pending)[0]:
+                emit(future)
+
+    stats["seconds"] = time.perf_counter() - start
+    stats["per_second"] = stats["total"] / stats["seconds"] if stats["seconds"] else 0.0
+    return stats
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="批量查询实时天气（结果输出到标准输出）")
+    parser.add_argument("input", nargs="?", default="-",
+                        help="每行一个城市名称或城市ID的文件，默认读取标准输入")
+    parser.add_argument("--host", default=DEFAULT_API_HOST, help="API Host")
+    parser.add_argument("--token-file", default="jwt_token.txt", help="JWT令牌文件")
+    parser.add_argument("--format", choices=sorted(WRITERS), default="ndjson", help="输出格式")
+    parser.add_argument("--order", choices=("input", "completion"), default="input",
+                        help="输出顺序：与输入一致，或先完成先输出")
+    parser.add_argument("--workers", type=int, default=DEFAULT_MAX_WORKERS, help="并发数")
+    parser.add_argument("--cities", help="离线城市列表（如 city_search.json），本地解析城市名称")
+    return parser
+
+
+def main(argv: Optional[list] = None):
+    """主函数：批量查询"""
+    args = build_parser().parse_args(argv)
+    city_index = CityIndex.from_file(args.cities) if args.cities else None
+    toolkit = WeatherToolkit(args.host, args.token_file, city_index=city_index)
+
+    source = sys.stdin if args.input == "-" else open(args.input, 'r', encoding='utf-8')
+    out = sys.stdout
+    try:
+        # 工具箱的错误提示改到标准错误，标准输出只有结果
+        with contextlib.redirect_stdout(sys.stderr):
+            stats = run_batch(toolkit, read_queries(source), out, fmt=args.format,
+                              order=args.order, workers=args.workers)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+
+    cache = toolkit.cache.stats()
+    print(f"完成 {stats['total']} 条（成功 {stats['ok']}，失败 {stats['errors']}），"
+          f"耗时 {stats['seconds']:.2f} s，{stats['per_second']:.1f} 条/秒，"
+          f"缓存命中 {cache['hits']} 次，"
+          f"省去城市搜索 {toolkit.resolver.stats()['geo_calls_saved']} 次", file=sys.stderr)
+    return 0 if stats["errors"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
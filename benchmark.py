@@ -0,0 +1,575 @@
+#!/usr/bin/env python3
+"""
+性能基准测试
+在本地模拟服务上运行，不消耗真实API额度；结果可保存为JSON，与之前的版本对比
+
+用法:
+    python benchmark.py --save                       # 保存到 bench_results/
+    python benchmark.py --compare bench_results/旧结果.json
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import tempfile
+import tracemalloc
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import aiohttp
+import requests
+
+from async_toolkit import AsyncWeatherToolkit
+from cache import LRUCache, estimate_size
+from city_index import CityIndex
+from disk_cache import SQLiteCache, TieredCache
+from gateway import start_gateway
+from http_transport import HttpTransport, build_url
+from mock_server import MockQWeatherServer, load_fixtures
+from observation import Observation
+from renderer import WEATHER_COLUMNS, render, render_text, weather_row
+from resilience import RetryPolicy
+from response_decoder import orjson, project_locations
+from spatial_index import SpatialIndex
+from weather_toolkit import WeatherToolkit
+
+RESULTS_DIR = "bench_results"
+
+
+def _run(fetch, n: int, threads: int) -> float:
+    """执行 n 次请求，返回每秒请求数"""
+    start = time.perf_counter()
+    if threads <= 1:
+        for _ in range(n):
+            fetch()
+    else:
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            for _ in pool.map(lambda _: fetch(), range(n)):
+                pass
+    return n / (time.perf_counter() - start)
+
+
+def percentile(values, p: float) -> float:
+    """第 p 百分位数（最近秩法），values 需已排序"""
+    if not values:
+        return 0.0
+    rank = max(1, -(-len(values) * p // 100))  # 向上取整
+    return values[int(rank) - 1]
+
+
+def bench_transport(server_url: str, n: int = 500, threads: int = 1):
+    """对比裸 requests.get 与共享连接池的吞吐量"""
+    url = build_url(server_url, "/v7/weather/now")
+    params = {"location": "101010100", "lang": "zh"}
+
+    def bare():
+        requests.get(url, params=params, timeout=10).json()
+
+    transport = HttpTransport(pool_maxsize=max(threads, 1))
+
+    def pooled():
+        transport.get(url, params=params).json()
+
+    before = _run(bare, n, threads)
+    after = _run(pooled, n, threads)
+    transport.close()
+    return before, after
+
+
+def bench_cache_reads(n: int = 20000):
+    """各缓存后端的单次读取耗时（微秒）"""
+    with open("weather.json", 'r', encoding='utf-8') as f:
+        weather = json.load(f)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        disk = SQLiteCache(os.path.join(tmp, "cache.sqlite3"))
+        backends = {
+            "LRUCache": LRUCache(),
+            "SQLiteCache": disk,
+            "TieredCache": TieredCache(disk),
+        }
+        for name, cache in backends.items():
+            cache.set("weather", "101010100", weather)
+            start = time.perf_counter()
+            for _ in range(n):
+                cache.get("weather", "101010100")
+            results[name] = (time.perf_counter() - start) / n * 1e6
+        disk.close()
+    return results
+
+
+def synthetic_cities(count: int = 3500, seed: int = 1):
+    """生成接近全国城市列表规模的模拟城市数据（city_search.json 格式）"""
+    rng = random.Random(seed)
+    chars = "北京上海天津重庆广州深圳武汉杭州南宁西安成都长沙郑州济南沈阳哈尔滨昆明贵阳兰州太原石家庄合肥福州南昌海口银川西宁拉萨呼和浩特乌鲁木齐东城朝阳丰台通州顺义昌平大兴平谷延庆密云怀柔门头沟房山"
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    cities = []
+    for i in range(count):
+        name = "".join(rng.choice(chars) for _ in range(rng.choice((2, 2, 3))))
+        slug = "".join(rng.choice(letters) for _ in range(rng.randint(4, 10)))
+        city_id = str(101000000 + i)
+        cities.append({
+            "name": name, "id": city_id,
+            "lat": f"{rng.uniform(18, 53):.5f}", "lon": f"{rng.uniform(73, 135):.5f}",
+            "adm2": name, "adm1": rng.choice(("北京市", "广东省", "湖北省", "四川省")),
+            "country": "中国", "rank": str(rng.choice((10, 15, 25, 35, 45))),
+            "fxLink": f"https://www.qweather.com/weather/{slug}-{city_id}.html",
+        })
+    return cities
+
+
+def bench_city_index(count: int = 3500, queries: int = 2000):
+    """离线城市索引：构建耗时、内存占用和查询耗时"""
+    cities = synthetic_cities(count)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    index = CityIndex(cities)
+    index.search("北")  # 触发有序检索词表的构建
+    build_ms = (time.perf_counter() - start) * 1000
+    memory_kb = tracemalloc.get_traced_memory()[0] / 1024
+    tracemalloc.stop()
+
+    rng = random.Random(2)
+    sample = rng.sample(cities, min(queries, len(cities)))
+    workloads = {
+        "名称前缀": [c["name"][:1] for c in sample],
+        "名称子串": [c["name"][1:] for c in sample],
+        "拼音前缀": [c["fxLink"].rsplit("/", 1)[1][:3] for c in sample],
+        "城市ID": [c["id"] for c in sample],
+    }
+    latencies = {}
+    for name, words in workloads.items():
+        start = time.perf_counter()
+        for word in words:
+            index.search(word)
+        latencies[name] = (time.perf_counter() - start) / len(words) * 1e6
+    return build_ms, memory_kb, latencies
+
+
+def bench_observation_memory(count: int = 3500):
+    """每个缓存城市的内存占用（字节）：原始响应字典 vs Observation"""
+    with open("weather.json", 'r', encoding='utf-8') as f:
+        text = f.read()
+
+    def measure(build):
+        tracemalloc.start()
+        cache = LRUCache(max_entries=count)
+        for i in range(count):
+            cache.set("weather", str(101000000 + i), build())
+        used = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        return used / count
+
+    before = measure(lambda: json.loads(text))
+    after = measure(lambda: Observation.from_response(json.loads(text)))
+    return before, after
+
+
+def decoding_payloads(locations: int = 20):
+    """接近真实规模的响应体：20个城市的城市搜索结果、实时天气"""
+    cities, weather = load_fixtures()
+    lookup = {"code": "200", "location": [], "refer": weather.get("refer", {})}
+    for i in range(locations):
+        city = dict(cities[i % len(cities)])
+        city["id"] = str(int(city["id"]) + i // len(cities) * 1000)
+        lookup["location"].append(city)
+    encode = lambda data: json.dumps(data, ensure_ascii=False).encode("utf-8")
+    return encode(lookup), encode(weather)
+
+
+def bench_decoding(n: int = 5000):
+    """
+    响应解码耗时（微秒/次）：response.json() 完整解析 vs 解码为精简记录（标准库 / orjson）
+
+    :return: {"lookup_us": {...}, "now_us": {...}, "lookup_bytes": {...}}
+    """
+    lookup, now = decoding_payloads()
+    backends = {"json": json.loads}
+    if orjson is not None:
+        backends["orjson"] = orjson.loads
+
+    def timed(decode, body, rounds: int = 5):
+        # 取多轮中最快的一轮，减少机器负载波动的影响
+        best = float("inf")
+        for _ in range(rounds):
+            start = time.perf_counter()
+            for _ in range(n // rounds):
+                decode(body)
+            best = min(best, time.perf_counter() - start)
+        return best / (n // rounds) * 1e6
+
+    def response_json(body):
+        # 客户端原来的做法：requests 的 response.json()（检测编码后用标准库解析完整字典）
+        response = requests.Response()
+        response._content = body
+        response.headers["Content-Type"] = "application/json"
+        return response.json
+
+    results = {
+        "lookup_us": {"response.json()": timed(lambda f: f(), response_json(lookup))},
+        "now_us": {"response.json() + Observation": timed(
+            lambda f: Observation.from_response(f()), response_json(now))},
+    }
+    for name, loads in backends.items():
+        results["lookup_us"][f"{name} 投影"] = timed(
+            lambda body: project_locations(loads(body)), lookup)
+        results["now_us"][f"{name} + Observation"] = timed(
+            lambda body: Observation.from_response(loads(body)), now)
+    results["lookup_bytes"] = {
+        "完整": estimate_size(json.loads(lookup)["location"]),
+        "投影": estimate_size(project_locations(json.loads(lookup))),
+    }
+    return results
+
+
+def bench_render(rows: int = 10000):
+    """
+    结果渲染：原来逐行拼接字符串的城市列表 vs 渲染模块（文本表格 / CSV / JSON）
+
+    :return: {"city_list_ms": {...}, "file_ms": {...}, "file_peak_kb": {...}, "weather_report_ms"}
+    """
+    cities = synthetic_cities(rows)
+
+    def legacy(cities):
+        # 原来的 format_city_list：每个城市 += 四行
+        result = f"找到 {len(cities)} 个城市:\n"
+        for i, city in enumerate(cities, 1):
+            result += f"{i}. {city['name']} (ID: {city['id']})\n"
+            result += f"   位置: {city.get('adm1', '未知')}, {city.get('country', '未知')}\n"
+            result += f"   经纬度: {city.get('lat', '未知')}, {city.get('lon', '未知')}\n"
+            result += f"   排名: {city.get('rank', '未知')}\n\n"
+        return result
+
+    def timed(func, rounds: int = 3):
+        # 取多轮中最快的一轮
+        best = float("inf")
+        for _ in range(rounds):
+            start = time.perf_counter()
+            func()
+            best = min(best, time.perf_counter() - start)
+        return best * 1000
+
+    results = {"city_list_ms": {"逐行拼接": timed(lambda: legacy(cities))},
+               "file_ms": {}, "file_peak_kb": {}}
+    for fmt in ("table", "csv", "json"):
+        results["city_list_ms"][fmt] = timed(lambda: render_text(cities, fmt))
+
+    # 写入文件：分块写出，峰值内存与行数无关
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "cities.txt")
+        writers = {"逐行拼接": lambda f: f.write(legacy(cities))}
+        for fmt in ("table", "csv", "json"):
+            writers[fmt] = lambda f, fmt=fmt: render(cities, f, fmt)
+        for name, write in writers.items():
+            with open(path, "w", encoding="utf-8") as f:
+                results["file_ms"][name] = timed(lambda: write(f))
+            with open(path, "w", encoding="utf-8") as f:
+                tracemalloc.start()
+                write(f)
+                results["file_peak_kb"][name] = tracemalloc.get_traced_memory()[1] / 1024
+                tracemalloc.stop()
+
+    with open("weather.json", 'r', encoding='utf-8') as f:
+        weather = Observation.from_response(json.load(f))
+    results["weather_report_ms"] = timed(lambda: render(
+        (weather_row(weather, city) for city in cities), io.StringIO(),
+        columns=WEATHER_COLUMNS))
+    return results
+
+
+def bench_spatial_index(devices: int = 1_000_000, count: int = 3500):
+    """最近城市空间索引：批量解析设备坐标的耗时（秒）"""
+    index = SpatialIndex(synthetic_cities(count))
+    rng = random.Random(3)
+    coords = [(rng.uniform(18, 53), rng.uniform(73, 135)) for _ in range(devices)]
+    start = time.perf_counter()
+    index.nearest_many(coords, k=1)
+    return time.perf_counter() - start
+
+
+class _StaticToken:
+    def get_token(self):
+        return "benchmark-token"
+
+
+async def _gateway_load(upstream_url: str, clients: int, requests_total: int, cities: int):
+    toolkit = AsyncWeatherToolkit(upstream_url, "jwt_token.txt", token_provider=_StaticToken())
+    runner = await start_gateway(toolkit)
+    host, port = runner.addresses[0][:2]
+    url = f"http://{host}:{port}/weather/now"
+    rng = random.Random(4)
+    ids = [str(101000000 + rng.randrange(cities)) for _ in range(requests_total)]
+    latencies = []
+
+    async def client(session, my_ids):
+        for city_id in my_ids:
+            start = time.perf_counter()
+            async with session.get(url, params={"location": city_id}) as response:
+                await response.read()
+            latencies.append(time.perf_counter() - start)
+
+    connector = aiohttp.TCPConnector(limit=clients)
+    try:
+        async with aiohttp.ClientSession(connector=connector) as session:
+            start = time.perf_counter()
+            await asyncio.gather(*(client(session, ids[i::clients]) for i in range(clients)))
+            elapsed = time.perf_counter() - start
+    finally:
+        await runner.cleanup()
+    latencies.sort()
+    return {
+        "rps": requests_total / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+def bench_gateway(clients: int = 50, requests_total: int = 5000, cities: int = 200):
+    """
+    网关负载测试：clients 个并发客户端随机查询 cities 个城市
+
+    :return: 每秒请求数、p50/p99 延迟（毫秒）和上游实际收到的请求数
+    """
+    with MockQWeatherServer() as server:
+        result = asyncio.run(_gateway_load(server.url, clients, requests_total, cities))
+        result["upstream_requests"] = server.request_count
+    return result
+
+
+def _latency_summary(latencies, scale: float = 1000.0) -> dict:
+    """延迟分位数（默认换算为毫秒）"""
+    latencies = sorted(latencies)
+    return {f"p{p}": percentile(latencies, p) * scale for p in (50, 95, 99)}
+
+
+def _toolkit(server_url: str, **kwargs) -> WeatherToolkit:
+    return WeatherToolkit(server_url, "jwt_token.txt", transport=HttpTransport(pool_maxsize=32),
+                          token_provider=_StaticToken(), **kwargs)
+
+
+def _city_ids(count: int, offset: int = 0):
+    return [str(101000000 + offset + i) for i in range(count)]
+
+
+def bench_cache_warmth(cities: int = 200, latency: float = 0.005):
+    """
+    冷/热缓存：同一批城市第一次（需请求上游）和第二次（命中缓存）的单次耗时
+
+    :return: {"cold_ms": 分位数, "warm_us": 分位数}
+    """
+    with MockQWeatherServer(latency=latency) as server:
+        toolkit = _toolkit(server.url)
+        passes = []
+        for _ in range(2):
+            latencies = []
+            for city_id in _city_ids(cities):
+                start = time.perf_counter()
+                toolkit.get_weather_now(city_id)
+                latencies.append(time.perf_counter() - start)
+            passes.append(latencies)
+        toolkit.transport.close()
+    return {"cold_ms": _latency_summary(passes[0]),
+            "warm_us": _latency_summary(passes[1], scale=1e6)}
+
+
+def bench_client_modes(cities: int = 200, latency: float = 0.01, workers: int = 16):
+    """
+    逐个查询、线程池批量查询（get_weather_many）、异步并发查询的吞吐量（城市/秒，缓存均为冷）
+    """
+    results = {}
+    with MockQWeatherServer(latency=latency) as server:
+        toolkit = _toolkit(server.url)
+        start = time.perf_counter()
+        for city_id in _city_ids(cities):
+            toolkit.get_weather_now(city_id)
+        results["sequential"] = cities / (time.perf_counter() - start)
+
+        toolkit = _toolkit(server.url)
+        start = time.perf_counter()
+        toolkit.get_weather_many(_city_ids(cities), max_workers=workers)
+        results["batch"] = cities / (time.perf_counter() - start)
+
+        async def run_async():
+            async with AsyncWeatherToolkit(server.url, "jwt_token.txt",
+                                           token_provider=_StaticToken(),
+                                           max_concurrency=workers) as async_toolkit:
+                start = time.perf_counter()
+                await asyncio.gather(*(async_toolkit.get_weather_now(city_id)
+                                       for city_id in _city_ids(cities)))
+                return cities / (time.perf_counter() - start)
+
+        results["async"] = asyncio.run(run_async())
+    return results
+
+
+def bench_tail_latency(requests_total: int = 2000, threads: int = 16,
+                       jitter: float = 0.02, error_rate: float = 0.02):
+    """
+    尾延迟：上游随机延迟（0~jitter 秒）并以 error_rate 的比例返回500时，
+    每次查询（含重试）的耗时分位数（毫秒）和最终失败数
+    """
+    with MockQWeatherServer(jitter=jitter, error_rate=error_rate, seed=5) as server:
+        toolkit = _toolkit(server.url)
+        toolkit.transport.retry_policy = RetryPolicy(max_attempts=3, base_delay=0.05)
+        latencies = []
+        failures = 0
+
+        def fetch(city_id):
+            start = time.perf_counter()
+            weather = toolkit.get_weather_now(city_id)
+            return time.perf_counter() - start, weather is None
+
+        with contextlib.redirect_stdout(io.StringIO()):  # 忽略失败提示
+            with ThreadPoolExecutor(max_workers=threads) as pool:
+                for elapsed, failed in pool.map(fetch, _city_ids(requests_total)):
+                    latencies.append(elapsed)
+                    failures += failed
+        toolkit.transport.close()
+    result = _latency_summary(latencies)
+    result["failures"] = failures
+    return result
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save_results(results: dict, path: str = None) -> str:
+    """保存结果（附带时间、提交、Python 版本），默认保存到 bench_results/<时间>-<提交>.json"""
+    commit = _git_commit()
+    if path is None:
+        name = time.strftime("%Y%m%d-%H%M%S") + (f"-{commit}" if commit else "")
+        path = os.path.join(RESULTS_DIR, name + ".json")
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    data = {"meta": {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "commit": commit,
+                     "python": platform.python_version(), "platform": platform.platform()},
+            "results": results}
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def _flatten(results: dict, prefix: str = "") -> dict:
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, name + "."))
+        elif isinstance(value, (int, float)):
+            flat[name] = value
+    return flat
+
+
+def compare_results(old: dict, new: dict) -> str:
+    """逐项对比两次结果（变化百分比），只列出两边都有的指标"""
+    before, after = _flatten(old), _flatten(new)
+    lines = [f"{'指标':<40}{'之前':>12}{'现在':>12}{'变化':>10}"]
+    for name in sorted(before.keys() & after.keys()):
+        old_value, new_value = before[name], after[name]
+        change = f"{(new_value - old_value) / old_value * 100:+.1f}%" if old_value else "-"
+        lines.append(f"{name:<40}{old_value:>12.2f}{new_value:>12.2f}{change:>10}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    """主函数：运行全部基准测试"""
+    parser = argparse.ArgumentParser(description="性能基准测试（本地模拟服务）")
+    parser.add_argument("--save", nargs="?", const="", metavar="PATH",
+                        help=f"保存结果（默认保存到 {RESULTS_DIR}/）")
+    parser.add_argument("--compare", metavar="PATH", help="与之前保存的结果对比")
+    args = parser.parse_args(argv)
+    results = {}
+
+    print("=" * 60)
+    print("HTTP传输层基准测试（本地模拟服务）")
+    print("=" * 60)
+
+    with MockQWeatherServer() as server:
+        for threads in (1, 8):
+            before, after = bench_transport(server.url, threads=threads)
+            results[f"transport_{threads}_threads"] = {"requests_get": before,
+                                                       "http_transport": after}
+            print(f"\n线程数: {threads}")
+            print(f"  requests.get : {before:8.1f} req/s")
+            print(f"  HttpTransport: {after:8.1f} req/s  ({after / before:.2f}x)")
+
+    results["cache_read_us"] = bench_cache_reads()
+    print("\n缓存读取耗时:")
+    for name, micros in results["cache_read_us"].items():
+        print(f"  {name:<12}: {micros:6.2f} µs")
+
+    build_ms, memory_kb, latencies = bench_city_index()
+    results["city_index"] = {"build_ms": build_ms, "memory_kb": memory_kb,
+                             "search_us": latencies}
+    print(f"\n离线城市索引（3500个城市）: 构建 {build_ms:.1f} ms, 内存 {memory_kb:.0f} KB")
+    for name, micros in latencies.items():
+        print(f"  {name}: {micros:8.2f} µs/次")
+
+    before, after = bench_observation_memory()
+    results["bytes_per_city"] = {"dict": before, "observation": after}
+    print(f"\n天气缓存（3500个城市）每个城市内存: 原始字典 {before:.0f} B,"
+          f" Observation {after:.0f} B ({before / after:.1f}x)")
+
+    decoding = results["decoding"] = bench_decoding()
+    print("\n响应解码（城市搜索20个城市 / 实时天气）:")
+    for payload in ("lookup_us", "now_us"):
+        for name, micros in decoding[payload].items():
+            print(f"  {payload[:-3]:<6} {name:<30}: {micros:7.2f} µs/次")
+    print(f"  城市列表内存: 完整 {decoding['lookup_bytes']['完整'] / 1024:.1f} KB,"
+          f" 投影 {decoding['lookup_bytes']['投影'] / 1024:.1f} KB")
+
+    rendering = results["render"] = bench_render()
+    print("\n结果渲染（10000行）:")
+    for name, ms in rendering["city_list_ms"].items():
+        print(f"  城市列表 {name:<8}: {ms:8.1f} ms")
+    for name, ms in rendering["file_ms"].items():
+        print(f"  写入文件 {name:<8}: {ms:8.1f} ms, 峰值内存 {rendering['file_peak_kb'][name]:8.0f} KB")
+    print(f"  天气报表 table   : {rendering['weather_report_ms']:8.1f} ms")
+
+    seconds = bench_spatial_index()
+    results["spatial_index_1m_s"] = seconds
+    print(f"\n最近城市空间索引: 100万个坐标批量解析 {seconds:.2f} s")
+
+    warmth = results["cache_warmth"] = bench_cache_warmth()
+    print(f"\n冷/热缓存（上游延迟5 ms）: 冷 p50 {warmth['cold_ms']['p50']:.2f} ms,"
+          f" p99 {warmth['cold_ms']['p99']:.2f} ms; 热 p50 {warmth['warm_us']['p50']:.2f} µs,"
+          f" p99 {warmth['warm_us']['p99']:.2f} µs")
+
+    modes = results["client_modes_per_s"] = bench_client_modes()
+    print(f"\n查询方式（200个城市，上游延迟10 ms，并发16）: 逐个 {modes['sequential']:.0f}/s,"
+          f" 批量 {modes['batch']:.0f}/s, 异步 {modes['async']:.0f}/s")
+
+    tail = results["tail_latency_ms"] = bench_tail_latency()
+    print(f"\n尾延迟（上游延迟0~20 ms，2%返回500，重试3次）: p50 {tail['p50']:.2f} ms,"
+          f" p95 {tail['p95']:.2f} ms, p99 {tail['p99']:.2f} ms, 最终失败 {tail['failures']} 次")
+
+    result = results["gateway"] = bench_gateway()
+    print(f"\n缓存网关（50个客户端，5000次请求，200个城市）: {result['rps']:.0f} req/s,"
+          f" p50 {result['p50_ms']:.2f} ms, p99 {result['p99_ms']:.2f} ms,"
+          f" 上游请求 {result['upstream_requests']} 次")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            previous = json.load(f)
+        print(f"\n与 {args.compare} 对比:")
+        print(compare_results(previous["results"], results))
+    if args.save is not None:
+        print(f"\n结果已保存到: {save_results(results, args.save or None)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+有界 LRU + TTL 缓存
+按命名空间设置过期时间（城市搜索 / 实时天气），限制条目数和内存占用
+"""
+
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+# 各命名空间的默认过期时间（秒）
+DEFAULT_TTLS = {
+    "search": 3600,   # 城市搜索：1小时
+    "weather": 300,   # 实时天气：5分钟
+    "resolve": 30 * 86400,  # 城市名称解析：30天（城市ID几乎不变）
+    "search_not_found": 60,  # 城市搜索无结果（负缓存）：1分钟
+}
+DEFAULT_TTL = 300
+DEFAULT_MAX_ENTRIES = 4096
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+
+
+def estimate_size(value: Any, _seen: Optional[set] = None) -> int:
+    """粗略估算对象占用的字节数（递归统计容器和 __slots__ 对象）"""
+    if _seen is None:
+        _seen = set()
+    if id(value) in _seen:
+        return 0
+    _seen.add(id(value))
+
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        for k, v in value.items():
+            size += estimate_size(k, _seen) + estimate_size(v, _seen)
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        for item in value:
+            size += estimate_size(item, _seen)
+    elif hasattr(value, "__dict__"):
+        size += estimate_size(vars(value), _seen)
+    elif hasattr(value, "__slots__"):
+        for slot in value.__slots__:
+            if hasattr(value, slot):
+                size += estimate_size(getattr(value, slot), _seen)
+    return size
+
+
+class LRUCache:
+    """线程安全的 LRU + TTL 缓存"""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 max_bytes: int = DEFAULT_MAX_BYTES,
+                 ttls: Optional[Dict[str, float]] = None,
+                 default_ttl: float = DEFAULT_TTL,
+                 sizeof: Callable[[Any], int] = estimate_size,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        :param max_entries: 最大条目数
+        :param max_bytes: 最大字节预算（按 sizeof 估算）
+        :param ttls: 各命名空间的过期时间（秒），未配置的使用 default_ttl
+        :param default_ttl: 默认过期时间（秒）
+        :param sizeof: 条目大小估算函数
+        :param clock: 时钟函数（便于测试）
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttls = dict(DEFAULT_TTLS)
+        if ttls:
+            self.ttls.update(ttls)
+        self.default_ttl = default_ttl
+        self.sizeof = sizeof
+        self.clock = clock
+
+        self._data = OrderedDict()  # (namespace, key) -> [value, expires_at, size, stored_at, retain_until]
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def ttl_for(self, namespace: str) -> float:
+        """获取命名空间的过期时间"""
+        return self.ttls.get(namespace, self.default_ttl)
+
+    def get(self, namespace: str, key: Hashable, default: Any = None) -> Any:
+        """
+        读取缓存
+
+        :param namespace: 命名空间，如 "search"、"weather"
+        :param key: 缓存键
+        :param default: 未命中时的返回值
+        :return: 缓存值
+        """
+        full_key = (namespace, key)
+        with self._lock:
+            entry = self._data.get(full_key)
+            if entry is None:
+                self.misses += 1
+                return default
+            now = self.clock()
+            if now >= entry[1]:
+                if now >= entry[4]:  # 超过过期宽限期才真正删除
+                    self._remove(full_key)
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(full_key)
+            self.hits += 1
+            return entry[0]
+
+    def get_stale(self, namespace: str, key: Hashable):
+        """
+        读取缓存，已过期但仍在宽限期内的条目也会返回
+
+        :return: (缓存值, 已缓存秒数, 是否过期)，不存在时返回 (None, None, None)
+        """
+        with self._lock:
+            entry = self._data.get((namespace, key))
+            now = self.clock()
+            if entry is None or now >= max(entry[1], entry[4]):
+                return None, None, None
+            return entry[0], now - entry[3], now >= entry[1]
+
+    def set(self, namespace: str, key: Hashable, value: Any,
+            ttl: Optional[float] = None, stale_ttl: float = 0,
+            stored_at: Optional[float] = None):
+        """
+        写入缓存
+
+        :param namespace: 命名空间
+        :param key: 缓存键
+        :param value: 缓存值
+        :param ttl: 过期时间（秒，从现在算起），默认按命名空间配置
+        :param stale_ttl: 过期后继续保留的宽限期（秒），期间可通过 get_stale 读取
+        :param stored_at: 数据的原始写入时间（按本缓存的 clock），默认为现在；
+                          从其他缓存回填时传入，get_stale 的已缓存秒数从该时间算起
+        """
+        full_key = (namespace, key)
+        ttl = self.ttl_for(namespace) if ttl is None else ttl
+        size = self.sizeof(value)
+
+        with self._lock:
+            if full_key in self._data:
+                self._remove(full_key)  # 旧值已被取代，即使新值不缓存也不能再返回
+            if size > self.max_bytes:
+                return  # 单个条目超出预算，不缓存
+            now = self.clock()
+            stored_at = now if stored_at is None else stored_at
+            self._data[full_key] = [value, now + ttl, size, stored_at, now + ttl + stale_ttl]
+            self.current_bytes += size
+            while (len(self._data) > self.max_entries
+                   or self.current_bytes > self.max_bytes):
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def delete(self, namespace: str, key: Hashable):
+        """删除缓存条目"""
+        with self._lock:
+            if (namespace, key) in self._data:
+                self._remove((namespace, key))
+
+    def purge_expired(self) -> int:
+        """清理所有已过期（且超过宽限期）的条目，返回清理数量"""
+        now = self.clock()
+        with self._lock:
+            expired = [k for k, entry in self._data.items() if now >= max(entry[1], entry[4])]
+            for k in expired:
+                self._remove(k)
+            self.expirations += len(expired)
+        return len(expired)
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._data.clear()
+            self.current_bytes = 0
+
+    def _remove(self, full_key):
+        entry = self._data.pop(full_key)
+        self.current_bytes -= entry[2]
+
+    def stats(self) -> Dict[str, int]:
+        """缓存统计"""
+        with self._lock:
+            return {
+                "entries": len(self._data),
+                "bytes": self.current_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+    def __len__(self):
+        return len(self._data)
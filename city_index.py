@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+离线城市索引
+基于城市搜索结果导出文件（city_search.json 格式）在本地完成前缀、子串、拼音/首字母搜索
+"""
+
+import heapq
+import json
+import re
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional
+
+try:
+    from pypinyin import Style, lazy_pinyin
+except ImportError:  # 可选依赖：未安装时从 fxLink 中提取全拼，不支持首字母搜索
+    Style = lazy_pinyin = None
+
+_SLUG_RE = re.compile(r"/([a-z0-9-]+)-\d+\.html$")
+
+# 匹配程度（越小越靠前）
+MATCH_EXACT = 0
+MATCH_PREFIX = 1
+MATCH_SUBSTRING = 2
+
+
+def _normalize(text: str) -> str:
+    return "".join(text.split()).casefold()
+
+
+def _city_rank(city: Dict) -> int:
+    try:
+        return int(city.get("rank", 99))
+    except (TypeError, ValueError):
+        return 99
+
+
+def pinyin_terms(city: Dict) -> List[str]:
+    """
+    生成城市名称的拼音检索词（全拼、首字母）
+
+    安装了 pypinyin 时由汉字转换；否则从 fxLink（如 .../beijing-101010100.html）中提取全拼
+    """
+    name = city.get("name", "")
+    if lazy_pinyin is not None:
+        syllables = lazy_pinyin(name)
+        initials = lazy_pinyin(name, style=Style.FIRST_LETTER)
+        return [_normalize("".join(syllables)), _normalize("".join(initials))]
+
+    match = _SLUG_RE.search(city.get("fxLink", ""))
+    if match:
+        return [match.group(1).replace("-", "")]
+    return []
+
+
+class CityIndex:
+    """本地城市索引"""
+
+    def __init__(self, cities: Iterable[Dict] = ()):
+        """
+        :param cities: 城市列表（城市搜索接口返回的 location 条目）
+        """
+        self.cities: List[Dict] = []
+        self._ranks: List[int] = []
+        self._by_id: Dict[str, int] = {}
+        self._sorted = ([], [])              # (已排序的检索词, 对应的城市下标)，整体替换保证读方一致
+        self._pending = []                   # 尚未合并进有序表的 (检索词, 城市下标)
+        self._ngrams = defaultdict(set)      # 名称的单字/双字 -> 城市下标集合
+        self._lock = threading.Lock()
+        self.add_many(cities)
+
+    @classmethod
+    def from_file(cls, filename: str) -> "CityIndex":
+        """
+        从导出文件构建索引
+
+        支持 {"cities": [...]}（city_search.json）、接口原始响应 {"location": [...]} 或城市列表
+        """
+        with open(filename, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            data = data.get("cities") or data.get("location") or []
+        return cls(data)
+
+    def add(self, city: Dict):
+        """添加单个城市（重复ID会被忽略）"""
+        city_id = city.get("id")
+        if not city_id or city_id in self._by_id:
+            return
+        name = _normalize(city.get("name", ""))
+        terms = {name, *pinyin_terms(city)}
+
+        with self._lock:
+            idx = len(self.cities)
+            self.cities.append(city)
+            self._ranks.append(_city_rank(city))
+            self._by_id[city_id] = idx
+            self._pending.extend((term, idx) for term in terms if term)
+            for i in range(len(name)):
+                self._ngrams[name[i]].add(idx)
+                if i + 1 < len(name):
+                    self._ngrams[name[i:i + 2]].add(idx)
+
+    def add_many(self, cities: Iterable[Dict]):
+        """批量添加城市"""
+        for city in cities:
+            self.add(city)
+
+    def _merge_pending(self):
+        if not self._pending:
+            return
+        with self._lock:
+            pairs = sorted(list(zip(*self._sorted)) + self._pending)
+            self._pending = []
+            self._sorted = ([term for term, _ in pairs], [idx for _, idx in pairs])
+
+    def get(self, city_id: str) -> Optional[Dict]:
+        """按城市ID获取城市信息"""
+        idx = self._by_id.get(city_id)
+        return self.cities[idx] if idx is not None else None
+
+    def _candidates(self, query: str) -> Dict[int, int]:
+        """返回 {城市下标: 匹配程度}"""
+        self._merge_pending()
+        matches = {}
+
+        # 前缀（含精确匹配）：名称、全拼、首字母
+        terms, owners = self._sorted
+        for i in range(bisect_left(terms, query), len(terms)):
+            term = terms[i]
+            if not term.startswith(query):
+                break
+            level = MATCH_EXACT if term == query else MATCH_PREFIX
+            idx = owners[i]
+            if level < matches.get(idx, MATCH_SUBSTRING + 1):
+                matches[idx] = level
+
+        # 名称子串：用双字（或单字）倒排表求交集，超过两个字时再校验
+        grams = [query[i:i + 2] for i in range(0, max(len(query) - 1, 1))]
+        postings = [self._ngrams.get(gram) for gram in grams]
+        if all(postings):
+            verify = len(query) > 2
+            for idx in set.intersection(*postings):
+                if idx in matches:
+                    continue
+                if not verify or query in _normalize(self.cities[idx].get("name", "")):
+                    matches[idx] = MATCH_SUBSTRING
+        return matches
+
+    def search(self, query: str, adm: Optional[str] = None,
+               range_code: Optional[str] = None, number: int = 10) -> List[Dict]:
+        """
+        搜索城市
+
+        :param query: 城市名称、名称前缀/片段、拼音、拼音首字母或城市ID
+        :param adm: 上级行政区划（匹配 adm1 或 adm2）
+        :param range_code: 搜索范围（国家代码，仅 cn 可在本地判断，其他范围视为未命中）
+        :param number: 返回结果数量
+        :return: 城市列表（按匹配程度和 rank 排序），未找到返回空列表
+        """
+        query = _normalize(query)
+        if not query or (range_code and range_code.lower() != "cn"):
+            return []
+        city = self.get(query)
+        if city is not None:
+            return [city]
+
+        matches = self._candidates(query)
+        if adm:
+            matches = {idx: level for idx, level in matches.items()
+                       if adm in self.cities[idx].get("adm1", "")
+                       or adm in self.cities[idx].get("adm2", "")}
+        if range_code:
+            matches = {idx: level for idx, level in matches.items()
+                       if self.cities[idx].get("country") == "中国"}
+
+        ranks = self._ranks
+        best = heapq.nsmallest(number, matches.items(),
+                               key=lambda item: (item[1], ranks[item[0]], item[0]))
+        return [self.cities[idx] for idx, _ in best]
+
+    def __len__(self):
+        return len(self.cities)
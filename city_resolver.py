@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+城市名称解析
+把城市名称（可带上级行政区划）解析为城市信息并长期缓存，城市ID几乎不会变化；
+输入已是城市ID或经纬度时直接用于天气查询，不再请求城市搜索接口
+"""
+
+import re
+import threading
+import unicodedata
+from typing import Callable, Dict, List, Optional
+
+from cache import LRUCache
+
+CITY_ID_RE = re.compile(r"^\d{9}$")
+# "经度,纬度"（与和风天气接口的 location 参数格式相同）
+COORDINATE_RE = re.compile(r"^(-?\d{1,3}(?:\.\d+)?)\s*,\s*(-?\d{1,2}(?:\.\d+)?)$")
+
+KIND_ID = "id"
+KIND_COORDINATE = "coordinate"
+KIND_NAME = "name"
+
+
+def normalize(text: Optional[str]) -> str:
+    """规范化名称：全角转半角、去掉首尾空白、合并连续空白、大小写折叠"""
+    if not text:
+        return ""
+    text = unicodedata.normalize("NFKC", text)
+    return " ".join(text.split()).casefold()
+
+
+def resolve_key(city_name: str, adm: Optional[str] = None) -> str:
+    """解析缓存键，如 "朝阳|北京"、"beijing|" """
+    return f"{normalize(city_name)}|{normalize(adm)}"
+
+
+def search_cache_key(city_name: str, adm: Optional[str] = None,
+                     range_code: Optional[str] = None, lang: str = "zh") -> str:
+    """
+    城市搜索的缓存键（各客户端共用）
+
+    名称和行政区划经过规范化，不包含返回数量：数量较多的结果可以回答数量较少的请求
+    """
+    return f"{normalize(city_name)}|{normalize(adm)}|{normalize(range_code)}|{lang}"
+
+
+def cached_search(cache, key: str, number: int) -> Optional[List[Dict]]:
+    """
+    从缓存读取城市搜索结果
+
+    缓存的结果请求数量不少于 number，或结果少于其请求数量（已是全部结果）时可以使用
+
+    :return: 前 number 个城市（无结果时为空列表），缓存不能回答时返回 None
+    """
+    entry = cache.get("search", key)
+    if entry is None:
+        return None
+    if entry["number"] >= number or len(entry["location"]) < entry["number"]:
+        return entry["location"][:number]
+    return None
+
+
+def store_search(cache, key: str, number: int, locations: List[Dict]):
+    """保存城市搜索结果；无结果时按 "search_not_found" 命名空间的较短过期时间保存"""
+    ttl = None if locations else cache.ttl_for("search_not_found")
+    cache.set("search", key, {"number": number, "location": locations}, ttl=ttl)
+
+
+def classify(query: str) -> str:
+    """
+    判断查询类型
+
+    :return: KIND_ID（9位城市ID）、KIND_COORDINATE（"经度,纬度"）或 KIND_NAME
+    """
+    query = unicodedata.normalize("NFKC", query).strip()
+    if CITY_ID_RE.match(query):
+        return KIND_ID
+    match = COORDINATE_RE.match(query)
+    if match and abs(float(match.group(1))) <= 180 and abs(float(match.group(2))) <= 90:
+        return KIND_COORDINATE
+    return KIND_NAME
+
+
+class CityResolver:
+    """名称到城市信息的解析层（线程安全）"""
+
+    def __init__(self, lookup: Callable[[str, Optional[str]], Optional[Dict]],
+                 cache=None, ttl: Optional[float] = None):
+        """
+        :param lookup: 实际查询函数 lookup(城市名称, 上级行政区划) -> 城市信息或None，
+                       通常为客户端的城市搜索；使用 resolve_async() 时为协程函数
+        :param cache: 缓存（LRUCache / TieredCache，可与客户端共用），结果存放在 "resolve"
+                      命名空间；默认使用独立的内存缓存
+        :param ttl: 过期时间（秒），默认按缓存的 "resolve" 命名空间配置（30天）
+        """
+        self.lookup = lookup
+        self.cache = cache if cache is not None else LRUCache()
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.direct = 0
+
+    def _count(self, name: str):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def resolve(self, query: str, adm: Optional[str] = None) -> Optional[Dict]:
+        """
+        解析城市
+
+        :param query: 城市名称、9位城市ID或"经度,纬度"
+        :param adm: 上级行政区划（仅对名称有效）
+        :return: 城市信息（至少包含 id，可直接传给 get_weather_now），未找到返回 None
+        """
+        city, key = self._resolve_locally(query, adm)
+        if key is None:
+            return city
+
+        city = self.lookup(query.strip(), adm.strip() if adm else None)
+        if city:
+            self.remember(key, city)
+        return city
+
+    async def resolve_async(self, query: str, adm: Optional[str] = None) -> Optional[Dict]:
+        """resolve() 的异步版本（lookup 为协程函数，如异步客户端的城市搜索）"""
+        city, key = self._resolve_locally(query, adm)
+        if key is None:
+            return city
+
+        city = await self.lookup(query.strip(), adm.strip() if adm else None)
+        if city:
+            self.remember(key, city)
+        return city
+
+    def _resolve_locally(self, query: str, adm: Optional[str]):
+        """
+        不请求接口的解析：城市ID、经纬度和已缓存的名称
+
+        :return: (城市信息, None)；需要调用 lookup 时返回 (None, 解析缓存键)
+        """
+        kind = classify(query)
+        if kind != KIND_NAME:
+            self._count("direct")
+            location = unicodedata.normalize("NFKC", query).strip()
+            if kind == KIND_COORDINATE:
+                lon, lat = (part.strip() for part in location.split(","))
+                # 接口最多支持两位小数
+                location = f"{float(lon):.2f},{float(lat):.2f}"
+                return {"id": location, "name": location, "lon": lon, "lat": lat}, None
+            return self.describe(location) or {"id": location}, None
+
+        key = resolve_key(query, adm)
+        cached = self.cache.get("resolve", key)
+        if cached is not None:
+            self._count("hits")
+            return cached, None
+
+        self._count("misses")
+        return None, key
+
+    def remember(self, key: str, city: Dict):
+        """保存解析结果，同时按城市ID保存一份供 describe 使用"""
+        self.cache.set("resolve", key, city, ttl=self.ttl)
+        self.cache.set("resolve", f"id:{city['id']}", city, ttl=self.ttl)
+
+    def describe(self, city_id: str) -> Optional[Dict]:
+        """按城市ID读取之前解析过的城市信息（不请求接口），没有则返回 None"""
+        return self.cache.get("resolve", f"id:{city_id}")
+
+    def stats(self) -> Dict[str, int]:
+        """
+        解析统计
+
+        :return: {"hits": 缓存命中, "misses": 实际查询, "direct": 城市ID/经纬度直接使用,
+                  "geo_calls_saved": 省去的城市搜索请求数}
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "direct": self.direct,
+                    "geo_calls_saved": self.hits + self.direct}
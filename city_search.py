@@ -4,21 +4,42 @@
 支持模糊搜索、精确搜索、获取城市ID
 """
 
-import requests
 import json
 from typing import List, Dict, Optional
 
+from cache import LRUCache
+from city_index import CityIndex
+from city_resolver import cached_search, search_cache_key, store_search
+from http_transport import HttpTransport, build_url, get_default_transport
+from response_decoder import loads
+from token_manager import get_file_token_provider
+
 class CitySearcher:
     """城市搜索客户端"""
 
-    def __init__(self, api_host: str, jwt_token_file: str):
+    def __init__(self, api_host: str, jwt_token_file: str,
+                 transport: Optional[HttpTransport] = None,
+                 token_provider=None,
+                 cache: Optional[LRUCache] = None,
+                 city_index: Optional[CityIndex] = None):
+        """
+        :param api_host: API Host
+        :param jwt_token_file: JWT令牌文件（未指定 token_provider 时使用）
+        :param transport: HTTP传输层，默认使用共享连接池
+        :param token_provider: 令牌提供者（如 token_manager.TokenProvider），需实现 get_token()
+        :param cache: 缓存（可与其他客户端共用），默认不缓存
+        :param city_index: 离线城市索引（中文搜索命中时不再请求接口）
+        """
         self.api_host = api_host
         self.jwt_token_file = jwt_token_file
+        self.transport = transport or get_default_transport()  # 共享连接池
+        self.token_provider = token_provider or get_file_token_provider(jwt_token_file)
+        self.cache = cache
+        self.city_index = city_index
 
     def load_jwt_token(self):
-        """加载JWT令牌"""
-        with open(self.jwt_token_file, 'r') as f:
-            return f.read().strip()
+        """加载JWT令牌（内存缓存）"""
+        return self.token_provider.get_token()
 
     def search_cities(self,
                      location: str,
@@ -36,12 +57,24 @@ class CitySearcher:
         :param lang: 语言
         :return: 城市列表
         """
+        if self.city_index is not None and lang == "zh":
+            local = self.city_index.search(location, adm=adm, range_code=range_code, number=number)
+            if local:
+                return local
+
+        # 与 WeatherToolkit.search_city 使用相同的缓存键（规范化名称，不含数量）
+        cache_key = search_cache_key(location, adm, range_code, lang)
+        if self.cache is not None:
+            cached = cached_search(self.cache, cache_key, number)
+            if cached is not None:
+                return cached
+
         token = self.load_jwt_token()
-        url = f"https://{self.api_host}/geo/v2/city/lookup"
+        url = build_url(self.api_host, "/geo/v2/city/lookup")
 
         headers = {"Authorization": f"Bearer {token}"}
         params = {
-            "location": location,
+            "location": location.strip(),
             "number": number,
             "lang": lang
         }
@@ -53,15 +86,18 @@ class CitySearcher:
             params["range"] = range_code
 
         try:
-            response = requests.get(url, headers=headers, params=params, timeout=10)
+            response = self.transport.get(url, headers=headers, params=params, timeout=10)
             response.raise_for_status()
 
-            data = response.json()
+            data = loads(response.content)
 
             if data.get("code") != "200":
                 raise ValueError(f"API错误: {data.get('message', '未知错误')}")
 
-            return data.get("location", [])
+            locations = data.get("location", [])
+            if self.cache is not None:
+                store_search(self.cache, cache_key, number, locations)
+            return locations
 
         except Exception as e:
             raise Exception(f"城市搜索失败: {e}")
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""测试共用的 fixture"""
+
+import pytest
+
+
+class StaticToken:
+    """固定 token，测试时代替 TokenProvider，不需要私钥"""
+
+    def get_token(self):
+        return "test-token"
+
+
+class FakeClock:
+    """可手动拨动的时钟，传给各组件的 clock 参数"""
+
+    def __init__(self, now: float = 0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+@pytest.fixture
+def static_token():
+    """固定 token 的令牌提供者"""
+    return StaticToken()
+
+
+@pytest.fixture
+def fake_clock():
+    """从 0 开始的可拨动时钟（需要其他起点时直接设置 now）"""
+    return FakeClock()
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+持久化缓存（SQLite WAL 模式）
+多个进程（命令行、定时任务、工作进程）共用同一个缓存文件，过期语义与 LRUCache 一致
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from cache import DEFAULT_TTL, DEFAULT_TTLS, LRUCache
+from observation import Observation
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "qweather", "cache.sqlite3")
+PURGE_EVERY = 1000  # 每写入多少次清理一次过期条目
+OBSERVATION_TAG = "__observation__"
+
+
+def _dumps(value: Any) -> str:
+    """序列化缓存值（Observation 保存为接口格式并加标记）"""
+    if isinstance(value, Observation):
+        value = {OBSERVATION_TAG: value.to_dict()}
+    return json.dumps(value, ensure_ascii=False)
+
+
+def _loads(text: str) -> Any:
+    """反序列化缓存值"""
+    value = json.loads(text)
+    if isinstance(value, dict) and OBSERVATION_TAG in value:
+        return Observation.from_response(value[OBSERVATION_TAG])
+    return value
+
+
+class SQLiteCache:
+    """基于 SQLite 的跨进程缓存（接口与 LRUCache 相同）"""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH,
+                 ttls: Optional[Dict[str, float]] = None,
+                 default_ttl: float = DEFAULT_TTL,
+                 clock: Callable[[], float] = time.time):
+        """
+        :param path: 数据库文件路径
+        :param ttls: 各命名空间的过期时间（秒）
+        :param default_ttl: 默认过期时间（秒）
+        :param clock: 时钟函数（墙上时间，各进程共用；便于测试）
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.ttls = dict(DEFAULT_TTLS)
+        if ttls:
+            self.ttls.update(ttls)
+        self.default_ttl = default_ttl
+        self.clock = clock
+
+        self._local = threading.local()  # sqlite3 连接不能跨线程共用
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " namespace TEXT NOT NULL,"
+            " key TEXT NOT NULL,"
+            " value TEXT NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " stored_at REAL,"
+            " stale_until REAL,"
+            " PRIMARY KEY (namespace, key)"
+            ") WITHOUT ROWID"
+        )
+        # 兼容旧版本创建的缓存文件
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(cache)")}
+        for column in ("stored_at", "stale_until"):
+            if column not in columns:
+                conn.execute(f"ALTER TABLE cache ADD COLUMN {column} REAL")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")     # 读写互不阻塞
+            conn.execute("PRAGMA synchronous=NORMAL")   # WAL 下足够安全，写入更快
+            self._local.conn = conn
+        return conn
+
+    def ttl_for(self, namespace: str) -> float:
+        """获取命名空间的过期时间"""
+        return self.ttls.get(namespace, self.default_ttl)
+
+    def _count(self, hit: bool, expired: bool = False):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+                self.expirations += expired
+
+    def get_entry(self, namespace: str, key: Hashable):
+        """
+        读取未过期的缓存条目
+
+        :return: (缓存值, 过期时间戳, 宽限期结束时间戳, 写入时间戳)，
+                 未命中返回 (None, None, None, None)
+        """
+        row = self._conn().execute(
+            "SELECT value, expires_at, stale_until, stored_at FROM cache"
+            " WHERE namespace = ? AND key = ?",
+            (namespace, str(key))
+        ).fetchone()
+        if row is None:
+            self._count(hit=False)
+            return None, None, None, None
+        if self.clock() >= row[1]:
+            self._count(hit=False, expired=True)
+            return None, None, None, None
+        self._count(hit=True)
+        stale_until = row[2] if row[2] is not None else row[1]
+        stored_at = row[3] if row[3] is not None else row[1] - self.ttl_for(namespace)
+        return _loads(row[0]), row[1], stale_until, stored_at
+
+    def get_with_expiry(self, namespace: str, key: Hashable):
+        """读取缓存值及其过期时间戳，未命中返回 (None, None)"""
+        value, expires_at, _, _ = self.get_entry(namespace, key)
+        return value, expires_at
+
+    def get(self, namespace: str, key: Hashable, default: Any = None) -> Any:
+        """读取缓存"""
+        value, expires_at = self.get_with_expiry(namespace, key)
+        return default if expires_at is None else value
+
+    def get_stale(self, namespace: str, key: Hashable):
+        """
+        读取缓存，已过期但仍在宽限期内的条目也会返回
+
+        :return: (缓存值, 已缓存秒数, 是否过期)，不存在时返回 (None, None, None)
+        """
+        row = self._conn().execute(
+            "SELECT value, expires_at, stored_at, stale_until FROM cache"
+            " WHERE namespace = ? AND key = ?",
+            (namespace, str(key))
+        ).fetchone()
+        now = self.clock()
+        if row is None or now >= max(row[1], row[3] or 0):
+            return None, None, None
+        stored_at = row[2] if row[2] is not None else row[1] - self.ttl_for(namespace)
+        return _loads(row[0]), now - stored_at, now >= row[1]
+
+    def set(self, namespace: str, key: Hashable, value: Any,
+            ttl: Optional[float] = None, stale_ttl: float = 0):
+        """
+        写入缓存（值需可序列化为JSON，或为 Observation）
+
+        :param stale_ttl: 过期后继续保留的宽限期（秒），期间可通过 get_stale 读取
+        """
+        ttl = self.ttl_for(namespace) if ttl is None else ttl
+        now = self.clock()
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache"
+            " (namespace, key, value, expires_at, stored_at, stale_until)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (namespace, str(key), _dumps(value),
+             now + ttl, now, now + ttl + stale_ttl)
+        )
+        with self._lock:
+            self._writes += 1
+            purge = self._writes % PURGE_EVERY == 0
+        if purge:
+            self.purge_expired()
+
+    def delete(self, namespace: str, key: Hashable):
+        """删除缓存条目"""
+        self._conn().execute("DELETE FROM cache WHERE namespace = ? AND key = ?",
+                             (namespace, str(key)))
+
+    def purge_expired(self) -> int:
+        """清理已过期条目，返回清理数量"""
+        now = self.clock()
+        cursor = self._conn().execute(
+            "DELETE FROM cache WHERE expires_at <= ? AND (stale_until IS NULL OR stale_until <= ?)",
+            (now, now))
+        return cursor.rowcount
+
+    def clear(self):
+        """清空缓存"""
+        self._conn().execute("DELETE FROM cache")
+
+    def stats(self) -> Dict[str, int]:
+        """缓存统计（命中计数为本进程内的统计）"""
+        entries = self._conn().execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        with self._lock:
+            return {
+                "entries": entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "expirations": self.expirations,
+            }
+
+    def close(self):
+        """关闭当前线程的连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class TieredCache:
+    """两级缓存：进程内 LRUCache 在前，SQLiteCache 在后"""
+
+    def __init__(self, disk: SQLiteCache, memory: Optional[LRUCache] = None):
+        """
+        :param disk: 持久化缓存
+        :param memory: 进程内缓存，默认按 disk 的过期配置新建
+        """
+        self.disk = disk
+        self.memory = memory if memory is not None else LRUCache(ttls=disk.ttls,
+                                                                 default_ttl=disk.default_ttl)
+
+    def ttl_for(self, namespace: str) -> float:
+        """获取命名空间的过期时间"""
+        return self.disk.ttl_for(namespace)
+
+    def get(self, namespace: str, key: Hashable, default: Any = None) -> Any:
+        """
+        先查内存，未命中再查磁盘，并按剩余有效期和宽限期回填内存
+
+        回填的条目保留磁盘上的写入时间，get_stale 的已缓存秒数从上游数据的获取时间算起
+        """
+        value = self.memory.get(namespace, key)
+        if value is not None:
+            return value
+        value, expires_at, stale_until, stored_at = self.disk.get_entry(namespace, key)
+        if expires_at is None:
+            return default
+        # 两级缓存的时钟不同（内存默认单调时钟，磁盘为墙上时间），按时间差换算
+        now = self.disk.clock()
+        self.memory.set(namespace, key, value, ttl=expires_at - now,
+                        stale_ttl=stale_until - expires_at,
+                        stored_at=self.memory.clock() - (now - stored_at))
+        return value
+
+    def get_stale(self, namespace: str, key: Hashable):
+        """读取缓存（含宽限期内的过期条目），先查内存再查磁盘"""
+        value, age, expired = self.memory.get_stale(namespace, key)
+        if value is not None:
+            return value, age, expired
+        return self.disk.get_stale(namespace, key)
+
+    def set(self, namespace: str, key: Hashable, value: Any,
+            ttl: Optional[float] = None, stale_ttl: float = 0):
+        """同时写入内存和磁盘"""
+        self.memory.set(namespace, key, value, ttl, stale_ttl)
+        self.disk.set(namespace, key, value, ttl, stale_ttl)
+
+    def delete(self, namespace: str, key: Hashable):
+        """删除缓存条目"""
+        self.memory.delete(namespace, key)
+        self.disk.delete(namespace, key)
+
+    def clear(self):
+        """清空缓存"""
+        self.memory.clear()
+        self.disk.clear()
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """两级缓存的统计"""
+        return {"memory": self.memory.stats(), "disk": self.disk.stats()}
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+本地缓存网关
+基于 aiohttp 的 HTTP 服务，多个客户端共用一个工具箱（缓存、上游连接池、请求合并、令牌），
+同一城市在缓存有效期内只请求一次上游
+
+接口:
+    GET /weather/now?location=101010100
+    GET /city/lookup?q=北京&adm=&range=&number=10
+    GET /stats
+    GET /metrics（Prometheus 文本格式）
+同时提供与和风天气相同路径的 /v7/weather/now 和 /geo/v2/city/lookup，
+现有客户端把 api_host 指向网关即可
+"""
+
+import argparse
+from typing import Optional
+
+from aiohttp import web
+
+from async_toolkit import AsyncWeatherToolkit
+from metrics import get_default_metrics
+from weather_toolkit import SEARCH_PATH, WEATHER_PATH
+
+DEFAULT_PORT = 8900
+TOOLKIT_KEY = web.AppKey("toolkit", AsyncWeatherToolkit)
+
+
+def _int_param(request: web.Request, name: str, default: int) -> int:
+    try:
+        return int(request.query.get(name, default))
+    except ValueError:
+        raise web.HTTPBadRequest(text=f"参数 {name} 应为整数")
+
+
+async def weather_now(request: web.Request) -> web.Response:
+    """实时天气"""
+    city_id = request.query.get("location")
+    if not city_id:
+        return web.json_response({"code": "400", "error": "缺少参数 location"}, status=400)
+
+    weather = await request.app[TOOLKIT_KEY].get_weather_now(city_id)
+    if weather is None:
+        return web.json_response({"code": "502", "error": "上游查询失败"}, status=502)
+    return web.json_response(weather.to_dict())
+
+
+async def city_lookup(request: web.Request) -> web.Response:
+    """城市搜索（q 与上游的 location 参数等价）"""
+    query = request.query.get("q") or request.query.get("location")
+    if not query:
+        return web.json_response({"code": "400", "error": "缺少参数 q"}, status=400)
+
+    cities = await request.app[TOOLKIT_KEY].search_city(
+        query, adm=request.query.get("adm") or None,
+        range_code=request.query.get("range") or None,
+        number=_int_param(request, "number", 10))
+    if not cities:
+        return web.json_response({"code": "404"})
+    return web.json_response({"code": "200", "location": cities})
+
+
+async def stats(request: web.Request) -> web.Response:
+    """缓存、请求合并和熔断统计"""
+    toolkit = request.app[TOOLKIT_KEY]
+    return web.json_response({
+        "cache": toolkit.cache.stats(),
+        "singleflight": toolkit.singleflight.stats(),
+        "breakers": toolkit.breakers.stats(),
+    })
+
+
+async def metrics(request: web.Request) -> web.Response:
+    """Prometheus 指标（工具箱的指标注册表未开启时只有已登记的缓存统计）"""
+    text = request.app[TOOLKIT_KEY].metrics.to_prometheus()
+    return web.Response(text=text, content_type="text/plain", charset="utf-8")
+
+
+def create_app(toolkit: AsyncWeatherToolkit) -> web.Application:
+    """
+    创建网关应用
+
+    :param toolkit: 共用的异步工具箱（应用关闭时一并关闭）
+    """
+    app = web.Application()
+    app[TOOLKIT_KEY] = toolkit
+    app.router.add_get("/weather/now", weather_now)
+    app.router.add_get("/city/lookup", city_lookup)
+    app.router.add_get(WEATHER_PATH, weather_now)
+    app.router.add_get(SEARCH_PATH, city_lookup)
+    app.router.add_get("/stats", stats)
+    app.router.add_get("/metrics", metrics)
+
+    async def close_toolkit(app):
+        await app[TOOLKIT_KEY].close()
+
+    app.on_cleanup.append(close_toolkit)
+    return app
+
+
+async def start_gateway(toolkit: AsyncWeatherToolkit, host: str = "127.0.0.1",
+                        port: int = 0) -> web.AppRunner:
+    """
+    在当前事件循环中启动网关（测试和基准测试用）
+
+    :param port: 端口，0 表示随机
+    :return: AppRunner，调用 await runner.cleanup() 停止；runner.addresses 为监听地址
+    """
+    runner = web.AppRunner(create_app(toolkit), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+
+def main(argv: Optional[list] = None):
+    """主函数：启动网关"""
+    parser = argparse.ArgumentParser(description="和风天气本地缓存网关")
+    parser.add_argument("--api-host", default="kh3dn95ne6.re.qweatherapi.com", help="上游 API Host")
+    parser.add_argument("--token-file", default="jwt_token.txt", help="JWT令牌文件")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="监听端口")
+    parser.add_argument("--max-concurrency", type=int, default=100, help="上游最大并发数")
+    parser.add_argument("--stale-while-revalidate", type=float, default=0,
+                        help="天气缓存过期后多少秒内直接返回旧数据并在后台刷新")
+    parser.add_argument("--stale-if-error", type=float, default=0,
+                        help="天气缓存过期后多少秒内，上游出错时返回旧数据")
+    parser.add_argument("--no-metrics", action="store_true", help="不记录 /metrics 的请求指标")
+    args = parser.parse_args(argv)
+    if not args.no_metrics:
+        get_default_metrics().enable()
+
+    async def make_app():
+        toolkit = AsyncWeatherToolkit(args.api_host, args.token_file,
+                                      max_concurrency=args.max_concurrency,
+                                      stale_while_revalidate=args.stale_while_revalidate,
+                                      stale_if_error=args.stale_if_error)
+        toolkit.metrics.register_cache(toolkit.cache, "gateway")
+        return create_app(toolkit)
+
+    print(f"网关已启动: http://{args.host}:{args.port}")
+    web.run_app(make_app(), host=args.host, port=args.port, access_log=None, print=None)
+
+
+if __name__ == "__main__":
+    main()
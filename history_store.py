@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+观测历史存储
+按城市追加保存每次获取到的观测，每个字段一个定长数组文件（列式），读取时内存映射，
+支持按时间范围扫描和降采样；同一观测时间只保存一次。
+多个实例或进程可共用同一目录：追加时持有城市的文件锁（flock，仅 POSIX）
+"""
+
+import math
+import mmap
+import os
+import re
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+from urllib.parse import quote, unquote
+
+from observation import Observation
+
+try:
+    import fcntl
+except ImportError:  # Windows：只有同一实例内的写入互斥
+    fcntl = None
+
+DEFAULT_HISTORY_DIR = os.path.join(os.path.expanduser("~"), ".cache", "qweather", "history")
+
+# 时间列：观测时间的 Unix 时间戳（int64），按追加顺序严格递增
+TIME_COLUMN = "time"
+# 城市目录中的写锁文件
+LOCK_FILE = ".lock"
+# 数值列：(列名, Observation 属性)，float64，缺失值为 NaN
+COLUMNS = (
+    ("temp", "temp"),
+    ("feelsLike", "feels_like"),
+    ("humidity", "humidity"),
+    ("pressure", "pressure"),
+    ("windSpeed", "wind_speed"),
+    ("wind360", "wind360"),
+    ("precip", "precip"),
+    ("vis", "vis"),
+    ("cloud", "cloud"),
+    ("dew", "dew"),
+)
+COLUMN_NAMES = tuple(name for name, _ in COLUMNS)
+AGGREGATES = ("mean", "min", "max", "last")
+
+# 城市ID中可以直接用作目录名的字符，其他字符（如经纬度中的逗号）按 UTF-8 百分号编码
+_UNSAFE = re.compile(r"[^\w.-]")
+
+Moment = Union[datetime, float, int, None]
+
+
+def _timestamp(moment: Moment) -> Optional[float]:
+    if isinstance(moment, datetime):
+        return moment.timestamp()
+    return moment
+
+
+class _Column:
+    """一个列文件的只读内存映射（文件变长后重新映射）"""
+
+    __slots__ = ("size", "mmap", "view")
+
+    def __init__(self, path: str, typecode: str):
+        with open(path, 'rb') as f:
+            self.size = os.fstat(f.fileno()).st_size
+            if self.size:
+                self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                self.view = memoryview(self.mmap).cast(typecode)
+            else:
+                self.mmap = None
+                self.view = memoryview(array(typecode))
+
+    def close(self):
+        self.view.release()
+        if self.mmap is not None:
+            self.mmap.close()
+
+
+class HistoryStore:
+    """按城市ID和观测时间组织的列式追加存储"""
+
+    def __init__(self, root: str = DEFAULT_HISTORY_DIR):
+        """
+        :param root: 存储目录，每个城市一个子目录，每列一个文件
+        """
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._columns: Dict[Tuple[str, str], _Column] = {}
+        self._repaired = set()
+        self.appended = 0
+        self.duplicates = 0
+        self.out_of_order = 0
+
+    def _city_dir(self, city_id: str) -> str:
+        name = _UNSAFE.sub(lambda m: quote(m.group(), safe=""), city_id)
+        if name in ("", ".", ".."):
+            raise ValueError(f"无效的城市ID: {city_id!r}")
+        return os.path.join(self.root, name)
+
+    def _path(self, city_id: str, column: str) -> str:
+        return os.path.join(self._city_dir(city_id), column)
+
+    @contextmanager
+    def _write_lock(self, directory: str):
+        """城市目录的写锁（同一目录的多个实例和进程之间互斥）"""
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(directory, LOCK_FILE), 'ab') as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def _last_time(self, directory: str) -> int:
+        """
+        最后一条的观测时间（没有数据时为 -1），调用方须持有写锁
+
+        每次都从时间列读取，其他实例或进程追加的数据也能看到；
+        本实例第一次打开城市时先修复各列长度
+        """
+        if directory not in self._repaired:
+            self._repair(directory)
+            self._repaired.add(directory)
+
+        itemsize = array('q').itemsize
+        with open(os.path.join(directory, TIME_COLUMN), 'rb') as f:
+            rows = os.fstat(f.fileno()).st_size // itemsize
+            if not rows:
+                return -1
+            f.seek((rows - 1) * itemsize)
+            return array('q', f.read(itemsize)).pop()
+
+    def _repair(self, directory: str):
+        """各列长度不一致（写入中途进程退出）时截断到最短的一列"""
+        itemsizes = {TIME_COLUMN: array('q').itemsize}
+        itemsizes.update((name, array('d').itemsize) for name in COLUMN_NAMES)
+        lengths = {}
+        for column, itemsize in itemsizes.items():
+            path = os.path.join(directory, column)
+            lengths[column] = os.path.getsize(path) // itemsize if os.path.exists(path) else 0
+        rows = min(lengths.values())
+        for column, itemsize in itemsizes.items():
+            path = os.path.join(directory, column)
+            with open(path, 'ab') as f:
+                if os.fstat(f.fileno()).st_size != rows * itemsize:
+                    f.truncate(rows * itemsize)
+
+    def append(self, city_id: str, observation: Observation) -> bool:
+        """
+        追加一条观测
+
+        时间列必须严格递增（按时间范围读取依赖二分查找），因此只保存晚于最后一条的观测：
+        观测时间相同的计入 duplicates，更早的（如其他进程已先写入更新的观测）计入 out_of_order，
+        两者都不写入
+
+        :return: 是否写入；没有观测时间、重复或早于最后一条时返回 False
+        """
+        if observation.obs_time is None:
+            return False
+        obs_time = int(observation.obs_time.timestamp())
+
+        with self._lock:
+            directory = self._city_dir(city_id)
+            os.makedirs(directory, exist_ok=True)
+            with self._write_lock(directory):
+                last = self._last_time(directory)
+                if obs_time <= last:
+                    if obs_time == last:
+                        self.duplicates += 1
+                    else:
+                        self.out_of_order += 1
+                    return False
+
+                # 先写数值列，最后写时间列：时间列决定可见的行数
+                for name, attr in COLUMNS:
+                    value = getattr(observation, attr)
+                    with open(os.path.join(directory, name), 'ab') as f:
+                        array('d', [math.nan if value is None else value]).tofile(f)
+                with open(os.path.join(directory, TIME_COLUMN), 'ab') as f:
+                    array('q', [obs_time]).tofile(f)
+
+            self.appended += 1
+            return True
+
+    def append_many(self, observations: Iterable[Tuple[str, Observation]]) -> int:
+        """批量追加 (城市ID, 观测)，返回实际写入的条数"""
+        return sum(self.append(city_id, observation) for city_id, observation in observations)
+
+    def _view(self, city_id: str, column: str) -> memoryview:
+        """列数据的只读视图（内存映射）"""
+        path = self._path(city_id, column)
+        if not os.path.exists(path):
+            return memoryview(array('q' if column == TIME_COLUMN else 'd'))
+        key = (city_id, column)
+        cached = self._columns.get(key)
+        if cached is None or cached.size != os.path.getsize(path):
+            if cached is not None:
+                cached.close()
+            cached = self._columns[key] = _Column(path, 'q' if column == TIME_COLUMN else 'd')
+        return cached.view
+
+    def _bounds(self, times: memoryview, start: Moment, end: Moment) -> Tuple[int, int]:
+        start, end = _timestamp(start), _timestamp(end)
+        lo = 0 if start is None else bisect_left(times, math.ceil(start))
+        hi = len(times) if end is None else bisect_right(times, math.floor(end))
+        return lo, max(lo, hi)
+
+    def range(self, city_id: str, start: Moment = None, end: Moment = None,
+              fields: Optional[Iterable[str]] = None) -> Dict[str, List]:
+        """
+        读取时间范围内的观测（含两端）
+
+        :param start: 开始时间（datetime 或 Unix 时间戳），None 表示最早
+        :param end: 结束时间，None 表示最新
+        :param fields: 需要的列（默认全部），见 COLUMN_NAMES
+        :return: {"time": [时间戳...], 列名: [数值...]}，缺失值为 NaN
+        """
+        fields = COLUMN_NAMES if fields is None else tuple(fields)
+        unknown = set(fields) - set(COLUMN_NAMES)
+        if unknown:
+            raise ValueError(f"未知字段: {', '.join(sorted(unknown))}")
+
+        with self._lock:
+            times = self._view(city_id, TIME_COLUMN)
+            lo, hi = self._bounds(times, start, end)
+            result = {TIME_COLUMN: times[lo:hi].tolist()}
+            for name in fields:
+                result[name] = self._view(city_id, name)[lo:hi].tolist()
+            return result
+
+    def downsample(self, city_id: str, field: str, bucket: float,
+                   start: Moment = None, end: Moment = None,
+                   agg: str = "mean") -> List[Tuple[int, float]]:
+        """
+        按固定时间桶降采样一个字段（跳过缺失值和空桶）
+
+        :param field: 列名，如 "temp"
+        :param bucket: 桶宽（秒），如 3600 为每小时
+        :param agg: 聚合方式：mean / min / max / last
+        :return: [(桶开始时间戳, 聚合值)]
+        """
+        if agg not in AGGREGATES:
+            raise ValueError(f"未知聚合方式: {agg}（可选 {', '.join(AGGREGATES)}）")
+        data = self.range(city_id, start, end, fields=(field,))
+
+        buckets = []
+        current = None
+        values = []
+        for timestamp, value in zip(data[TIME_COLUMN], data[field]):
+            if value != value:  # NaN
+                continue
+            key = int(timestamp // bucket * bucket)
+            if key != current:
+                if values:
+                    buckets.append((current, _aggregate(values, agg)))
+                current, values = key, []
+            values.append(value)
+        if values:
+            buckets.append((current, _aggregate(values, agg)))
+        return buckets
+
+    def count(self, city_id: str) -> int:
+        """城市已保存的观测条数"""
+        with self._lock:
+            return len(self._view(city_id, TIME_COLUMN))
+
+    def cities(self) -> List[str]:
+        """有历史数据的城市ID"""
+        return sorted(unquote(name) for name in os.listdir(self.root)
+                      if os.path.isdir(os.path.join(self.root, name)))
+
+    def close(self):
+        """释放内存映射"""
+        with self._lock:
+            for column in self._columns.values():
+                column.close()
+            self._columns.clear()
+
+
+def _aggregate(values: List[float], agg: str) -> float:
+    if agg == "mean":
+        return sum(values) / len(values)
+    if agg == "min":
+        return min(values)
+    if agg == "max":
+        return max(values)
+    return values[-1]
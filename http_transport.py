@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+和风天气共享HTTP传输层
+基于 requests.Session 的长连接池，所有客户端共用一个入口
+"""
+
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import Metrics, get_default_metrics
+from rate_limiter import PRIORITY_INTERACTIVE, QuotaExceeded, RateLimiter
+from resilience import CircuitBreaker, CircuitBreakerRegistry, CircuitOpenError, RetryPolicy
+
+# 默认连接池参数
+DEFAULT_POOL_CONNECTIONS = 4   # 缓存的主机连接池数量
+DEFAULT_POOL_MAXSIZE = 16      # 每个主机保持的最大长连接数
+DEFAULT_TIMEOUT = 10
+
+
+def build_url(api_host: str, path: str) -> str:
+    """
+    拼接API地址
+
+    api_host 可以是纯主机名（默认使用 https），
+    也可以带协议前缀（如本地测试服务 http://127.0.0.1:8080）
+
+    :param api_host: API Host
+    :param path: 接口路径，如 /v7/weather/now
+    :return: 完整URL
+    """
+    if api_host.startswith(("http://", "https://")):
+        return f"{api_host.rstrip('/')}{path}"
+    return f"https://{api_host}{path}"
+
+
+class UpstreamCall:
+    """
+    一次上游调用（含重试）的熔断、重试和指标记录，同步和异步传输层共用
+
+    传输层只负责限流、发送请求和等待；每次尝试前调用 before_attempt()，
+    之后按结果调用 on_response()、on_error() 或 on_interrupt()。
+    on_response() / on_error() 返回下次重试前的等待秒数，None 表示不再重试：
+    on_response() 之后直接返回这次的响应（包括 4xx 和重试用尽的 429/5xx），
+    on_error() 之后重新抛出异常
+    """
+
+    def __init__(self, endpoint: str, policy: RetryPolicy, breaker: CircuitBreaker,
+                 metrics: Metrics):
+        """
+        :param endpoint: 接口路径（指标标签）
+        :param policy: 重试策略
+        :param breaker: 该接口的熔断器
+        :param metrics: 指标注册表
+        """
+        self.endpoint = endpoint
+        self.policy = policy
+        self.breaker = breaker
+        self.metrics = metrics
+        self.attempt = 0
+
+    def _next_delay(self, retry_after: Optional[str] = None) -> Optional[float]:
+        if self.attempt >= self.policy.max_attempts - 1:
+            return None
+        delay = self.policy.delay(self.attempt, retry_after)
+        self.attempt += 1
+        return delay
+
+    def before_attempt(self):
+        """占用熔断器（取得限流许可之后调用，熔断中抛出 CircuitOpenError）"""
+        self.breaker.before_call()
+
+    def on_rejected(self, error: Exception):
+        """请求未发出（熔断或额度用完）"""
+        if self.metrics.enabled:
+            self.metrics.inc("qweather_upstream_errors_total", endpoint=self.endpoint,
+                             error=type(error).__name__)
+
+    def on_response(self, status: int, headers, body: bytes, elapsed: float) -> Optional[float]:
+        """
+        收到响应
+
+        :param headers: 响应头（大小写不敏感的映射）
+        :param body: 响应体（Content-Length 缺失时用其长度统计字节数）
+        :param elapsed: 请求耗时（秒）
+        :return: 重试前的等待秒数，None 表示返回这次的响应
+        """
+        metrics = self.metrics
+        endpoint = self.endpoint
+        if metrics.enabled:
+            # 优先按 Content-Length 统计实际传输的（可能是压缩后的）字节数
+            size = headers.get("Content-Length")
+            size = int(size) if size and size.isdigit() else len(body)
+            metrics.observe("qweather_upstream_request_seconds", elapsed, endpoint=endpoint)
+            metrics.inc("qweather_upstream_requests_total", endpoint=endpoint)
+            metrics.inc("qweather_upstream_responses_total", endpoint=endpoint, status=status)
+            metrics.inc("qweather_upstream_response_bytes_total", size, endpoint=endpoint)
+
+        if status >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()  # 429 说明上游仍可用，不计入熔断
+        if status not in self.policy.retry_statuses:
+            return None
+        return self._next_delay(headers.get("Retry-After"))
+
+    def on_error(self, error: Exception) -> Optional[float]:
+        """
+        连接错误或超时
+
+        :return: 重试前的等待秒数，None 表示重试已用尽，调用方应重新抛出异常
+        """
+        if self.metrics.enabled:
+            self.metrics.inc("qweather_upstream_requests_total", endpoint=self.endpoint)
+            self.metrics.inc("qweather_upstream_errors_total", endpoint=self.endpoint,
+                             error=type(error).__name__)
+        self.breaker.record_failure()
+        return self._next_delay()
+
+    def on_interrupt(self):
+        """其他异常（如读取响应体出错、调用被取消）：归还熔断器的探测名额"""
+        self.breaker.release()
+
+
+class HttpTransport:
+    """线程安全的HTTP传输层（keep-alive 连接池）"""
+
+    def __init__(self, pool_connections: int = DEFAULT_POOL_CONNECTIONS,
+                 pool_maxsize: int = DEFAULT_POOL_MAXSIZE,
+                 timeout: float = DEFAULT_TIMEOUT,
+                 rate_limiter: Optional[RateLimiter] = None,
+                 retry_policy: Optional[RetryPolicy] = None,
+                 breakers: Optional[CircuitBreakerRegistry] = None,
+                 metrics: Optional[Metrics] = None):
+        """
+        :param pool_connections: 缓存的主机连接池数量
+        :param pool_maxsize: 每个主机的最大连接数（并发线程数不应超过此值，否则多出的连接用完即关）
+        :param timeout: 默认超时时间（秒）
+        :param rate_limiter: 限流器，所有经过本传输层的请求共用
+        :param retry_policy: 重试策略，默认最多尝试3次（resilience.NO_RETRY 关闭重试）
+        :param breakers: 按接口路径的熔断器，默认连续失败5次后熔断30秒
+        :param metrics: 指标注册表，默认使用进程内共享的 metrics.get_default_metrics()
+        """
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy if retry_policy is not None else RetryPolicy()
+        self.breakers = breakers if breakers is not None else CircuitBreakerRegistry()
+        self.metrics = metrics if metrics is not None else get_default_metrics()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_connections,
+                              pool_maxsize=pool_maxsize)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def get(self, url: str, params: Optional[Dict] = None,
+            headers: Optional[Dict] = None,
+            timeout: Optional[float] = None,
+            priority: int = PRIORITY_INTERACTIVE) -> requests.Response:
+        """
+        发送GET请求（复用连接池中的长连接）
+
+        连接错误、超时和 429/5xx 响应按重试策略退避重试；
+        同一接口连续失败后熔断，熔断期间直接抛出 CircuitOpenError
+
+        :param url: 请求地址
+        :param params: 查询参数
+        :param headers: 请求头
+        :param timeout: 超时时间，默认使用传输层配置
+        :param priority: 限流优先级（rate_limiter.PRIORITY_*），后台刷新应使用 PRIORITY_BACKGROUND
+        :return: 响应对象（重试用尽时为最后一次的响应）
+        :raises rate_limiter.QuotaExceeded: 当日额度已用完
+        :raises resilience.CircuitOpenError: 接口熔断中
+        """
+        timeout = timeout if timeout is not None else self.timeout
+        endpoint = urlparse(url).path
+        call = UpstreamCall(endpoint, self.retry_policy, self.breakers.get(endpoint),
+                            self.metrics)
+
+        while True:
+            try:
+                # 先取得限流许可再占用熔断器的探测名额，限流失败时不会占住名额
+                if self.rate_limiter is not None:
+                    self.rate_limiter.acquire(priority)
+                call.before_attempt()
+            except (CircuitOpenError, QuotaExceeded) as e:
+                call.on_rejected(e)
+                raise
+
+            start = time.perf_counter()
+            try:
+                response = self.session.get(url, params=params, headers=headers, timeout=timeout)
+                body = response.content
+            except (requests.ConnectionError, requests.Timeout) as e:
+                delay = call.on_error(e)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+            except BaseException:
+                # 其他异常（如 ChunkedEncodingError、KeyboardInterrupt）
+                call.on_interrupt()
+                raise
+
+            delay = call.on_response(response.status_code, response.headers, body,
+                                     time.perf_counter() - start)
+            if delay is None:
+                return response
+            response.close()
+            time.sleep(delay)
+
+    def close(self):
+        """关闭所有连接"""
+        self.session.close()
+
+
+_default_transport: Optional[HttpTransport] = None
+_default_lock = threading.Lock()
+
+
+def get_default_transport() -> HttpTransport:
+    """获取进程内共享的默认传输层"""
+    global _default_transport
+    if _default_transport is None:
+        with _default_lock:
+            if _default_transport is None:
+                _default_transport = HttpTransport()
+    return _default_transport
+
+
+def set_default_transport(transport: HttpTransport):
+    """替换默认传输层（例如调整连接池大小）"""
+    global _default_transport
+    with _default_lock:
+        _default_transport = transport
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+运行指标
+按接口统计延迟直方图、状态码和错误计数、传输字节数和额度消耗，汇总缓存和限流器的统计；
+可在进程内读取，也可导出为 Prometheus 文本格式。默认关闭，关闭时热路径只多一次属性判断
+"""
+
+import math
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# 延迟直方图的桶上界（秒）
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# 指标说明（导出时作为 # HELP）
+METRIC_HELP = {
+    "qweather_upstream_request_seconds": "上游请求耗时（每次尝试）",
+    "qweather_upstream_responses_total": "上游响应数（按状态码）",
+    "qweather_upstream_errors_total": "上游请求错误数（连接错误、超时、熔断、额度）",
+    "qweather_upstream_response_bytes_total": "上游响应体字节数",
+    "qweather_upstream_requests_total": "实际发出的上游请求数（消耗额度）",
+    "qweather_stage_seconds": "客户端各阶段耗时（token / request / parse）",
+    "qweather_client_errors_total": "客户端返回空结果的失败次数（按操作）",
+    "qweather_cache_hits_total": "缓存命中次数",
+    "qweather_cache_misses_total": "缓存未命中次数",
+    "qweather_cache_evictions_total": "缓存淘汰次数",
+    "qweather_cache_expirations_total": "缓存过期次数",
+    "qweather_cache_entries": "缓存条目数",
+    "qweather_quota_used": "当日已用额度",
+    "qweather_quota_remaining": "当日剩余额度",
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+# 收集器返回 (指标名, 标签, 数值, 类型)，类型为 counter 或 gauge
+Sample = Tuple[str, Dict[str, str], float, str]
+
+
+def _labels(labels: Dict) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    """格式化样本值：整数原样输出，浮点数保留全部精度（:g 只有 6 位有效数字）"""
+    if isinstance(value, int):
+        return str(value)
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if math.isnan(value):
+        return "NaN"
+    return repr(float(value))
+
+
+class Histogram:
+    """固定桶直方图"""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[int]:
+        """各桶的累计计数（不含 +Inf）"""
+        total, result = 0, []
+        for count in self.counts:
+            total += count
+            result.append(total)
+        return result
+
+    def quantile(self, q: float) -> Optional[float]:
+        """按桶上界估算分位数，超出最大桶时返回 None"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        for bound, total in zip(self.buckets, self.cumulative()):
+            if total >= rank:
+                return bound
+        return None
+
+
+class _Timer:
+    __slots__ = ("metrics", "name", "labels", "start")
+
+    def __init__(self, metrics, name, labels):
+        self.metrics, self.name, self.labels = metrics, name, labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.name, time.perf_counter() - self.start, **self.labels)
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Metrics:
+    """线程安全的指标注册表"""
+
+    def __init__(self, enabled: bool = True, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        """
+        :param enabled: 是否记录（关闭时 inc / observe / time 直接返回）
+        :param buckets: 直方图的桶上界（秒）
+        """
+        self.enabled = enabled
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self._collectors: List[Callable[[], Iterable[Sample]]] = []
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        """计数器加 amount"""
+        if not self.enabled:
+            return
+        key = (name, _labels(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, **labels):
+        """直方图记录一个值（秒）"""
+        if not self.enabled:
+            return
+        key = (name, _labels(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    def time(self, name: str, **labels):
+        """计时上下文管理器：with metrics.time("qweather_stage_seconds", stage="parse"): ..."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name, labels)
+
+    def register_collector(self, collector: Callable[[], Iterable[Sample]]):
+        """注册导出时调用的收集器（用于缓存、限流器等已有统计，热路径无额外开销）"""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def register_cache(self, cache, name: str = "default"):
+        """导出缓存的 stats()（命中、未命中、淘汰、过期、条目数）"""
+        def collect():
+            stats = cache.stats()
+            for key in ("hits", "misses", "evictions", "expirations"):
+                if key in stats:
+                    yield f"qweather_cache_{key}_total", {"cache": name}, stats[key], "counter"
+            if "entries" in stats:
+                yield "qweather_cache_entries", {"cache": name}, stats["entries"], "gauge"
+        self.register_collector(collect)
+
+    def register_rate_limiter(self, limiter):
+        """导出限流器的当日额度使用情况"""
+        def collect():
+            stats = limiter.stats()
+            yield "qweather_quota_used", {}, stats["daily_used"], "gauge"
+            if stats["daily_remaining"] is not None:
+                yield "qweather_quota_remaining", {}, stats["daily_remaining"], "gauge"
+        self.register_collector(collect)
+
+    def _collect(self) -> List[Sample]:
+        samples = []
+        for collector in list(self._collectors):
+            samples.extend(collector())
+        return samples
+
+    def snapshot(self) -> Dict:
+        """
+        当前所有指标
+
+        :return: {"counters": {名称: {标签字符串: 值}}, "histograms": {名称: {标签字符串:
+                 {"count", "sum", "p50", "p99"}}}, "gauges": {...}}
+        """
+        result = {"counters": {}, "histograms": {}, "gauges": {}}
+        with self._lock:
+            for (name, labels), value in self._counters.items():
+                result["counters"].setdefault(name, {})[_format_labels(labels)] = value
+            for (name, labels), histogram in self._histograms.items():
+                result["histograms"].setdefault(name, {})[_format_labels(labels)] = {
+                    "count": histogram.count, "sum": histogram.sum,
+                    "p50": histogram.quantile(0.5), "p99": histogram.quantile(0.99),
+                }
+        for name, labels, value, kind in self._collect():
+            section = "counters" if kind == "counter" else "gauges"
+            result[section].setdefault(name, {})[_format_labels(_labels(labels))] = value
+        return result
+
+    def to_prometheus(self) -> str:
+        """导出为 Prometheus 文本格式"""
+        families: Dict[str, Tuple[str, List[str]]] = {}
+
+        def family(name, kind):
+            if name not in families:
+                families[name] = (kind, [])
+            return families[name][1]
+
+        with self._lock:
+            for (name, labels), value in sorted(self._counters.items()):
+                family(name, "counter").append(
+                    f"{name}{_format_labels(labels)} {_format_value(value)}")
+            for (name, labels), histogram in sorted(self._histograms.items()):
+                lines = family(name, "histogram")
+                for bound, total in zip(histogram.buckets, histogram.cumulative()):
+                    lines.append(f"{name}_bucket{_format_labels(labels, ('le', f'{bound:g}'))}"
+                                 f" {total}")
+                lines.append(f"{name}_bucket{_format_labels(labels, ('le', '+Inf'))}"
+                             f" {histogram.count}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(histogram.sum)}")
+                lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+        for name, labels, value, kind in self._collect():
+            family(name, kind).append(
+                f"{name}{_format_labels(_labels(labels))} {_format_value(value)}")
+
+        output = []
+        for name, (kind, lines) in families.items():
+            if name in METRIC_HELP:
+                output.append(f"# HELP {name} {METRIC_HELP[name]}")
+            output.append(f"# TYPE {name} {kind}")
+            output.extend(lines)
+        return "\n".join(output) + "\n"
+
+    def reset(self):
+        """清空计数器和直方图（收集器保留）"""
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+_default_metrics = Metrics(enabled=False)
+
+
+def get_default_metrics() -> Metrics:
+    """进程内共享的指标注册表（默认关闭，调用 enable() 开启）"""
+    return _default_metrics
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+本地和风天气模拟服务
+使用 city_search.json / weather.json 作为响应数据，用于离线测试和基准测试；
+可注入延迟、错误和限流（429）
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+CITY_FIXTURE = "city_search.json"
+WEATHER_FIXTURE = "weather.json"
+
+
+def load_fixtures(city_file: str = CITY_FIXTURE,
+                  weather_file: str = WEATHER_FIXTURE):
+    """加载城市列表和实时天气样例数据"""
+    with open(city_file, 'r', encoding='utf-8') as f:
+        cities = json.load(f)["cities"]
+    with open(weather_file, 'r', encoding='utf-8') as f:
+        weather = json.load(f)
+    return cities, weather
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """模拟接口处理器"""
+
+    protocol_version = "HTTP/1.1"  # 支持 keep-alive
+    disable_nagle_algorithm = True  # 避免长连接上的延迟确认等待
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+        server = self.server
+
+        fault = server.mock.inject()
+        if fault is not None:
+            status, headers = fault
+            self._send(status, {"code": str(status)}, headers)
+            return
+
+        if parsed.path == "/geo/v2/city/lookup":
+            body = server.mock.city_lookup(params)
+        elif parsed.path == "/v7/weather/now":
+            body = server.mock.weather_now(params)
+        else:
+            self._send(404, {"code": "404"})
+            return
+        self._send(200, body)
+
+    def _send(self, status: int, body: Dict, headers: Optional[Dict] = None):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class MockQWeatherServer:
+    """本地模拟服务（在后台线程中运行）"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0,
+                 cities: Optional[List[Dict]] = None,
+                 weather: Optional[Dict] = None,
+                 latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, error_status: int = 500,
+                 rate_limit: Optional[float] = None,
+                 seed: Optional[int] = None):
+        """
+        :param host: 监听地址
+        :param port: 监听端口（0 表示随机端口）
+        :param cities: 城市数据，默认读取 city_search.json
+        :param weather: 天气数据，默认读取 weather.json
+        :param latency: 每个请求的固定延迟（秒）
+        :param jitter: 额外的随机延迟上限（秒），均匀分布
+        :param error_rate: 随机返回错误的比例（0~1）
+        :param error_status: 随机错误的状态码
+        :param rate_limit: 每秒允许的请求数，超出时返回 429（带 Retry-After），None 表示不限
+        :param seed: 随机数种子（延迟和错误可复现）
+
+        以上注入参数在运行中也可直接修改
+        """
+        if cities is None or weather is None:
+            default_cities, default_weather = load_fixtures()
+            cities = cities if cities is not None else default_cities
+            weather = weather if weather is not None else default_weather
+        self.cities = cities
+        self.weather = weather
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.rate_limit = rate_limit
+        self.request_count = 0
+        self.status_counts: Dict[int, int] = {}
+        self._count_lock = threading.Lock()
+        self._random = random.Random(seed)
+        self._forced = []          # fail_next 指定的状态码
+        self._tokens = float(rate_limit or 0)
+        self._refilled = time.monotonic()
+
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.mock = self
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        """服务地址，可直接作为客户端的 api_host"""
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _count(self):
+        with self._count_lock:
+            self.request_count += 1
+
+    def fail_next(self, count: int = 1, status: int = 503):
+        """接下来的 count 个请求返回 status"""
+        with self._count_lock:
+            self._forced.extend([status] * count)
+
+    def _throttled(self) -> bool:
+        """令牌桶限流（桶容量为一秒的请求数）"""
+        now = time.monotonic()
+        self._tokens = min(self.rate_limit,
+                           self._tokens + (now - self._refilled) * self.rate_limit)
+        self._refilled = now
+        if self._tokens < 1:
+            return True
+        self._tokens -= 1
+        return False
+
+    def inject(self):
+        """
+        按配置注入延迟和错误（每个请求调用一次）
+
+        :return: None 表示正常处理；否则为 (状态码, 响应头)
+        """
+        with self._count_lock:
+            delay = self.latency
+            if self.jitter:
+                delay += self._random.uniform(0, self.jitter)
+            if self._forced:
+                fault = (self._forced.pop(0), {})
+            elif self.rate_limit is not None and self._throttled():
+                fault = (429, {"Retry-After": "1"})
+            elif self.error_rate and self._random.random() < self.error_rate:
+                fault = (self.error_status, {})
+            else:
+                fault = None
+            status = fault[0] if fault else 200
+            self.status_counts[status] = self.status_counts.get(status, 0) + 1
+            if fault is not None:
+                self.request_count += 1
+        if delay:
+            time.sleep(delay)
+        return fault
+
+    def city_lookup(self, params: Dict) -> Dict:
+        """模拟 /geo/v2/city/lookup"""
+        self._count()
+        location = params.get("location", "")
+        number = int(params.get("number", 10))
+        adm = params.get("adm")
+
+        matches = [c for c in self.cities
+                   if location == c["id"] or location in c["name"]
+                   or location.lower() in c.get("fxLink", "")]
+        if adm:
+            matches = [c for c in matches
+                       if adm in c.get("adm1", "") or adm in c.get("adm2", "")]
+        if not matches:
+            return {"code": "404"}
+        return {"code": "200", "location": matches[:number],
+                "refer": self.weather.get("refer", {})}
+
+    def weather_now(self, params: Dict) -> Dict:
+        """模拟 /v7/weather/now"""
+        self._count()
+        return self.weather
+
+    def start(self):
+        """启动服务"""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """停止服务"""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    """主函数：启动本地模拟服务"""
+    parser = argparse.ArgumentParser(description="本地和风天气模拟服务")
+    parser.add_argument("--port", type=int, default=8080, help="监听端口")
+    parser.add_argument("--latency", type=float, default=0.0, help="每个请求的延迟（秒）")
+    parser.add_argument("--jitter", type=float, default=0.0, help="额外随机延迟上限（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="随机返回500的比例")
+    parser.add_argument("--rate-limit", type=float, default=None, help="每秒请求数上限（超出返回429）")
+    args = parser.parse_args()
+
+    server = MockQWeatherServer(port=args.port, latency=args.latency, jitter=args.jitter,
+                                error_rate=args.error_rate, rate_limit=args.rate_limit)
+    print(f"模拟服务已启动: {server.url}")
+    print("按 Ctrl+C 退出")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+实时天气观测数据模型
+解析一次接口返回，数值字段转为数字、观测时间转为 datetime；只保留 now 中的字段，
+缓存和批量接口存储该类型，比原始的嵌套字典更省内存
+"""
+
+from datetime import datetime
+from typing import Any, Dict, Optional, Union
+
+Number = Union[int, float]
+
+
+def parse_time(value: Optional[str]) -> Optional[datetime]:
+    """解析接口中的时间（如 2026-02-07T22:40+08:00），无法解析时返回 None"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def format_time(value: Optional[datetime]) -> Optional[str]:
+    """格式化为接口中的时间格式"""
+    return value.isoformat(timespec="minutes") if value is not None else None
+
+
+def parse_number(value: Optional[str]) -> Optional[Number]:
+    """解析数值字符串（整数保持为 int），无法解析时返回 None"""
+    if value is None or value == "":
+        return None
+    try:
+        return float(value) if "." in value else int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def format_number(value: Optional[Number]) -> Optional[str]:
+    """格式化为接口中的数值字符串"""
+    return str(value) if value is not None else None
+
+
+# now 中的字段：(接口字段, 属性名, 是否为数值)
+NOW_FIELDS = (
+    ("temp", "temp", True),
+    ("feelsLike", "feels_like", True),
+    ("icon", "icon", False),
+    ("text", "text", False),
+    ("wind360", "wind360", True),
+    ("windDir", "wind_dir", False),
+    ("windScale", "wind_scale", False),  # 可能是 "3-4" 这样的范围
+    ("windSpeed", "wind_speed", True),
+    ("humidity", "humidity", True),
+    ("precip", "precip", True),
+    ("pressure", "pressure", True),
+    ("vis", "vis", True),
+    ("cloud", "cloud", True),
+    ("dew", "dew", True),
+)
+
+
+class Observation:
+    """一次实时天气观测（不可变；stale / age / city 通过 replace 生成新对象）"""
+
+    __slots__ = ("obs_time", "update_time") + tuple(attr for _, attr, _ in NOW_FIELDS) + (
+        "stale", "age", "city")
+
+    def __init__(self, obs_time: Optional[datetime] = None,
+                 update_time: Optional[datetime] = None,
+                 stale: bool = False, age: Optional[int] = None,
+                 city: Optional[Dict] = None, **now: Any):
+        """
+        :param obs_time: 观测时间
+        :param update_time: 接口更新时间
+        :param stale: 是否为过期的缓存数据
+        :param age: 过期数据已缓存的秒数
+        :param city: 城市信息（按城市名称查询时附带）
+        :param now: NOW_FIELDS 中的属性（temp、humidity 等），缺失为 None
+        """
+        unknown = set(now) - {attr for _, attr, _ in NOW_FIELDS}
+        if unknown:
+            raise TypeError(f"未知字段: {', '.join(sorted(unknown))}")
+        set_attr = object.__setattr__
+        set_attr(self, "obs_time", obs_time)
+        set_attr(self, "update_time", update_time)
+        for _, attr, _ in NOW_FIELDS:
+            set_attr(self, attr, now.get(attr))
+        set_attr(self, "stale", stale)
+        set_attr(self, "age", age)
+        set_attr(self, "city", city)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Observation 不可修改，请使用 replace()")
+
+    @classmethod
+    def from_response(cls, data: Dict) -> "Observation":
+        """
+        由 /v7/weather/now 的返回（或 to_dict 的结果）构造
+
+        :param data: 接口返回的 JSON
+        """
+        now = data.get("now") or {}
+        fields = {}
+        for key, attr, numeric in NOW_FIELDS:
+            value = now.get(key)
+            fields[attr] = parse_number(value) if numeric else value
+        return cls(obs_time=parse_time(now.get("obsTime")),
+                   update_time=parse_time(data.get("updateTime")),
+                   stale=bool(data.get("stale", False)), age=data.get("age"),
+                   city=data.get("city_info"), **fields)
+
+    def to_dict(self) -> Dict:
+        """转换为接口格式的字典（用于保存为JSON）"""
+        now = {"obsTime": format_time(self.obs_time)}
+        for key, attr, numeric in NOW_FIELDS:
+            value = getattr(self, attr)
+            now[key] = format_number(value) if numeric else value
+        data = {"code": "200", "updateTime": format_time(self.update_time), "now": now}
+        if self.stale:
+            data["stale"] = True
+            data["age"] = self.age
+        if self.city is not None:
+            data["city_info"] = self.city
+        return data
+
+    def replace(self, **changes: Any) -> "Observation":
+        """返回修改了部分属性的副本"""
+        fields = {name: getattr(self, name) for name in self.__slots__}
+        fields.update(changes)
+        return Observation(**fields)
+
+    def __eq__(self, other):
+        if not isinstance(other, Observation):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self):
+        return (f"Observation(obs_time={format_time(self.obs_time)!r}, temp={self.temp!r}, "
+                f"text={self.text!r}, stale={self.stale!r})")
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+流式结果输出
+每条结果一行 JSON（NDJSON）追加写入，可选 gzip / zstd 压缩，带写缓冲、按大小或时间轮转；
+每次刷新写出完整的压缩帧，进程意外退出时最多丢失最后一个缓冲区
+"""
+
+import gzip
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from observation import Observation
+
+try:
+    import zstandard
+except ImportError:  # 可选依赖：仅 compression="zstd" 时需要
+    zstandard = None
+
+COMPRESSION_SUFFIXES = {None: "", "gzip": ".gz", "zstd": ".zst"}
+SINK_SUFFIXES = (".ndjson", ".jsonl") + tuple(s for s in COMPRESSION_SUFFIXES.values() if s)
+DEFAULT_BUFFER_SIZE = 256 * 1024
+DEFAULT_FLUSH_INTERVAL = 1.0
+
+
+def to_json_compatible(value: Any) -> Any:
+    """转换为可序列化为JSON的对象（Observation 转为接口格式）"""
+    if isinstance(value, Observation):
+        return value.to_dict()
+    raise TypeError(f"无法序列化 {type(value).__name__}")
+
+
+def compression_for(path: str) -> Optional[str]:
+    """根据文件扩展名推断压缩方式"""
+    for compression, suffix in COMPRESSION_SUFFIXES.items():
+        if suffix and path.endswith(suffix):
+            return compression
+    return None
+
+
+class NDJSONSink:
+    """线程安全的 NDJSON 追加写入器"""
+
+    def __init__(self, path: str, compression: Optional[str] = None,
+                 buffer_size: int = DEFAULT_BUFFER_SIZE,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+                 max_bytes: Optional[int] = None,
+                 max_age: Optional[float] = None,
+                 fsync: bool = False,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        :param path: 输出文件路径；启用轮转时作为文件名前缀，
+                     实际文件为 <前缀>-<时间>-<序号>.ndjson[.gz|.zst]
+        :param compression: None / "gzip" / "zstd"（zstd 需 pip install zstandard）
+        :param buffer_size: 缓冲区达到多少字节时写出
+        :param flush_interval: 距上次写出超过多少秒时写出（在下一次 write 时检查）
+        :param max_bytes: 单个文件达到多少字节后轮转，None 表示不按大小轮转
+        :param max_age: 单个文件写了多少秒后轮转，None 表示不按时间轮转
+        :param fsync: 每次写出后是否 fsync（更安全，但更慢）
+        :param clock: 时钟函数（便于测试）
+        """
+        if compression not in COMPRESSION_SUFFIXES:
+            raise ValueError(f"不支持的压缩方式: {compression}")
+        if compression == "zstd" and zstandard is None:
+            raise RuntimeError("zstd 压缩需要安装 zstandard: pip install zstandard")
+
+        self.path = path
+        self.compression = compression
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.fsync = fsync
+        self.clock = clock
+
+        self._lock = threading.Lock()
+        self._buffer = []
+        self._buffered = 0
+        self._file = None
+        self._file_bytes = 0
+        self._opened_at = 0.0
+        self._flushed_at = clock()
+        self._sequence = 0
+        self._compressor = (zstandard.ZstdCompressor()
+                            if compression == "zstd" else None)
+        self.records = 0
+        self.bytes_written = 0
+        self.files = []
+
+    @property
+    def rotating(self) -> bool:
+        return self.max_bytes is not None or self.max_age is not None
+
+    def _next_path(self) -> str:
+        suffix = COMPRESSION_SUFFIXES[self.compression]
+        if not self.rotating:
+            return self.path
+        self._sequence += 1
+        base = self.path
+        for ext in (suffix, ".ndjson"):
+            if ext and base.endswith(ext):
+                base = base[:-len(ext)]
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        return f"{base}-{stamp}-{self._sequence:04d}.ndjson{suffix}"
+
+    def _open(self):
+        path = self._next_path()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, 'ab')
+        self._file_bytes = self._file.tell()
+        self._opened_at = self.clock()
+        self.files.append(path)
+
+    def _encode(self, data: bytes) -> bytes:
+        # 每个块单独压缩为完整的 gzip 成员 / zstd 帧，多个块拼接后仍可直接解压
+        if self.compression == "gzip":
+            return gzip.compress(data, compresslevel=6)
+        if self.compression == "zstd":
+            return self._compressor.compress(data)
+        return data
+
+    def _flush_locked(self):
+        if not self._buffer:
+            return
+        if self._file is None:
+            self._open()
+        elif self.rotating and (
+                (self.max_bytes is not None and self._file_bytes >= self.max_bytes) or
+                (self.max_age is not None and self.clock() - self._opened_at >= self.max_age)):
+            self._file.close()
+            self._open()
+
+        data = self._encode(b"".join(self._buffer))
+        self._file.write(data)
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self._file_bytes += len(data)
+        self.bytes_written += len(data)
+        self._buffer = []
+        self._buffered = 0
+        self._flushed_at = self.clock()
+
+    def write(self, record: Dict):
+        """写入一条记录（可包含 Observation）"""
+        line = json.dumps(record, ensure_ascii=False, separators=(",", ":"),
+                          default=to_json_compatible).encode("utf-8") + b"\n"
+        with self._lock:
+            self._buffer.append(line)
+            self._buffered += len(line)
+            self.records += 1
+            if (self._buffered >= self.buffer_size or
+                    self.clock() - self._flushed_at >= self.flush_interval):
+                self._flush_locked()
+
+    def flush(self):
+        """立即写出缓冲区"""
+        with self._lock:
+            self._flush_locked()
+
+    def close(self):
+        """写出缓冲区并关闭文件"""
+        with self._lock:
+            self._flush_locked()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def stats(self) -> Dict:
+        """写入统计"""
+        with self._lock:
+            return {"records": self.records, "bytes_written": self.bytes_written,
+                    "buffered": self._buffered, "files": list(self.files)}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def is_sink_path(path: str) -> bool:
+    """文件名是否应按 NDJSON 流式追加（.ndjson / .jsonl / .gz / .zst）"""
+    return path.endswith(SINK_SUFFIXES)
+
+
+def open_sink(path: str, **kwargs) -> NDJSONSink:
+    """按扩展名选择压缩方式打开输出（如 results.ndjson.gz）"""
+    return NDJSONSink(path, compression=compression_for(path), **kwargs)
+
+
+def read_records(path: str) -> Iterator[Dict]:
+    """逐条读取 NDJSON 文件（按扩展名解压，跳过空行）"""
+    compression = compression_for(path)
+    if compression == "gzip":
+        f = gzip.open(path, 'rt', encoding='utf-8')
+    elif compression == "zstd":
+        if zstandard is None:
+            raise RuntimeError("读取 zstd 文件需要安装 zstandard: pip install zstandard")
+        f = zstandard.open(path, 'rt', encoding='utf-8')
+    else:
+        f = open(path, 'r', encoding='utf-8')
+    with f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
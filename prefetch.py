@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+热门城市预取
+统计各城市的访问频率，按观测时间（obsTime）的更新节奏在缓存过期前后台刷新最热门的城市
+"""
+
+import heapq
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from observation import Observation
+
+DEFAULT_TOP_N = 200
+DEFAULT_BUDGET = 60           # 每个预算周期内最多刷新的次数
+DEFAULT_BUDGET_WINDOW = 60.0  # 预算周期（秒）
+DEFAULT_LEAD_TIME = 30.0      # 提前多少秒刷新
+DEFAULT_HALF_LIFE = 600.0     # 访问热度的半衰期（秒）
+DEFAULT_OBS_INTERVAL = 1200.0  # 尚未观察到更新节奏时假定的观测间隔（秒）
+PUBLISH_DELAY = 60.0          # 新观测发布到接口的大致延迟（秒）
+MIN_SCORE = 0.05              # 热度低于此值的城市不再跟踪
+
+
+class _CityState:
+    __slots__ = ("score", "touched", "fetched_at", "obs_time", "obs_interval")
+
+    def __init__(self, now: float):
+        self.score = 0.0
+        self.touched = now
+        self.fetched_at = None
+        self.obs_time = None
+        self.obs_interval = None
+
+
+class PrefetchScheduler:
+    """按访问热度和观测节奏预取天气，刷新次数受预算限制"""
+
+    def __init__(self, toolkit, top_n: int = DEFAULT_TOP_N,
+                 budget: int = DEFAULT_BUDGET,
+                 budget_window: float = DEFAULT_BUDGET_WINDOW,
+                 lead_time: float = DEFAULT_LEAD_TIME,
+                 half_life: float = DEFAULT_HALF_LIFE,
+                 interval: float = 5.0,
+                 clock: Callable[[], float] = time.time):
+        """
+        :param toolkit: WeatherToolkit 或 AsyncWeatherToolkit（创建后自动登记到 toolkit.prefetcher）；
+                        异步工具箱不使用后台线程，在事件循环中定期 await tick_async()
+        :param top_n: 只预取最热门的前 N 个城市
+        :param budget: 每个预算周期内最多发出的刷新请求数
+        :param budget_window: 预算周期（秒）
+        :param lead_time: 缓存过期前多少秒刷新
+        :param half_life: 访问热度的半衰期（秒）
+        :param interval: 后台线程的检查间隔（秒）
+        :param clock: 返回 Unix 时间戳的时钟函数（观测时间为墙钟时间）
+        """
+        self.toolkit = toolkit
+        self.top_n = top_n
+        self.budget = budget
+        self.budget_window = budget_window
+        self.lead_time = lead_time
+        self.half_life = half_life
+        self.interval = interval
+        self.clock = clock
+
+        self._lock = threading.Lock()
+        self._cities: Dict[str, _CityState] = {}
+        self._window_start = clock()
+        self._spent = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self.refreshed = 0
+        self.errors = 0
+        self.deferred = 0  # 因预算不足推迟的刷新次数
+
+        toolkit.prefetcher = self
+
+    def _decayed(self, state: _CityState, now: float) -> float:
+        return state.score * 0.5 ** ((now - state.touched) / self.half_life)
+
+    def record_access(self, city_id: str):
+        """记录一次前台访问"""
+        now = self.clock()
+        with self._lock:
+            state = self._cities.get(city_id)
+            if state is None:
+                state = self._cities[city_id] = _CityState(now)
+            state.score = self._decayed(state, now) + 1
+            state.touched = now
+
+    def record_fetch(self, city_id: str, observation: Observation):
+        """记录一次上游返回（前台或预取），据观测时间推算更新节奏"""
+        now = self.clock()
+        # 观测时间缺失时用接口更新时间
+        moment = observation.obs_time or observation.update_time
+        obs_time = moment.timestamp() if moment is not None else None
+        with self._lock:
+            state = self._cities.get(city_id)
+            if state is None:
+                return
+            state.fetched_at = now
+            if obs_time is None:
+                return
+            if state.obs_time is not None and obs_time > state.obs_time:
+                gap = obs_time - state.obs_time
+                # 指数平滑，偶尔漏掉一次观测不会让间隔翻倍
+                state.obs_interval = (gap if state.obs_interval is None
+                                      else min(gap, 0.7 * state.obs_interval + 0.3 * gap))
+            state.obs_time = obs_time
+
+    def next_refresh(self, city_id: str) -> Optional[float]:
+        """城市下一次应刷新的时间戳，未跟踪或尚未获取过时返回 None"""
+        with self._lock:
+            state = self._cities.get(city_id)
+            if state is None or state.fetched_at is None:
+                return None
+            return self._due(state)
+
+    def _due(self, state: _CityState) -> float:
+        """
+        刷新时间：缓存过期前 lead_time 秒；
+        若预计下一次观测在此之前发布，则在发布后立即刷新，拿到最新数据
+        """
+        expires_at = state.fetched_at + self.toolkit.cache.ttl_for("weather")
+        due = expires_at - self.lead_time
+        if state.obs_time is not None:
+            interval = state.obs_interval or DEFAULT_OBS_INTERVAL
+            next_obs = state.obs_time + interval + PUBLISH_DELAY
+            if state.fetched_at < next_obs < due:
+                due = next_obs
+        return due
+
+    def _take_budget(self, now: float, wanted: int) -> int:
+        if now - self._window_start >= self.budget_window:
+            self._window_start = now
+            self._spent = 0
+        granted = max(0, min(wanted, self.budget - self._spent))
+        self._spent += granted
+        return granted
+
+    def due_cities(self) -> List[str]:
+        """当前需要刷新的热门城市（按热度从高到低，已扣除预算）"""
+        now = self.clock()
+        with self._lock:
+            scores = {}
+            for city_id, state in list(self._cities.items()):
+                score = self._decayed(state, now)
+                if score < MIN_SCORE:
+                    del self._cities[city_id]
+                else:
+                    scores[city_id] = score
+
+            hottest = heapq.nlargest(self.top_n, scores, key=scores.get)
+            due = [city_id for city_id in hottest
+                   if self._cities[city_id].fetched_at is not None
+                   and self._due(self._cities[city_id]) <= now]
+            granted = self._take_budget(now, len(due))
+            self.deferred += len(due) - granted
+            return due[:granted]
+
+    def tick(self) -> int:
+        """刷新一轮到期的热门城市，返回刷新成功的数量"""
+        city_ids = self.due_cities()
+        refreshed = 0
+        for city_id in city_ids:
+            try:
+                self.toolkit.refresh_weather_now(city_id)
+                refreshed += 1
+            except Exception as e:
+                self._failed(city_id, e)
+        self.refreshed += refreshed
+        return refreshed
+
+    async def tick_async(self) -> int:
+        """tick() 的异步版本（toolkit 为 AsyncWeatherToolkit），返回刷新成功的数量"""
+        city_ids = self.due_cities()
+        refreshed = 0
+        for city_id in city_ids:
+            try:
+                await self.toolkit.refresh_weather_now(city_id)
+                refreshed += 1
+            except Exception as e:
+                self._failed(city_id, e)
+        self.refreshed += refreshed
+        return refreshed
+
+    def _failed(self, city_id: str, error: Exception):
+        self.errors += 1
+        # 推迟到下一个周期，避免每轮都重试同一个失败的城市
+        with self._lock:
+            state = self._cities.get(city_id)
+            if state is not None:
+                state.fetched_at = self.clock()
+        print(f"预取失败: {city_id} {error}")
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.tick()
+
+    def start(self):
+        """启动后台预取线程"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """停止后台预取线程"""
+        self._stop.set()
+
+    def stats(self) -> Dict:
+        """预取统计"""
+        with self._lock:
+            return {
+                "tracked": len(self._cities),
+                "refreshed": self.refreshed,
+                "errors": self.errors,
+                "deferred": self.deferred,
+                "budget_remaining": max(self.budget - self._spent, 0),
+            }
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+客户端限流
+令牌桶控制每秒请求数，按天统计额度；交互请求优先于后台刷新
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Optional
+
+# 优先级通道（数值越小越优先）
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
+LANE_NAMES = {PRIORITY_INTERACTIVE: "interactive", PRIORITY_BACKGROUND: "background"}
+
+
+class QuotaExceeded(Exception):
+    """当日额度已用完"""
+
+
+class RateLimitTimeout(Exception):
+    """在等待时间内未获得请求许可"""
+
+
+def _today() -> str:
+    return time.strftime("%Y-%m-%d")
+
+
+class RateLimiter:
+    """线程安全的令牌桶限流器（带每日额度和优先级通道）"""
+
+    def __init__(self, rate: float, burst: Optional[int] = None,
+                 daily_limit: Optional[int] = None,
+                 background_reserve: int = 0,
+                 clock: Callable[[], float] = time.monotonic,
+                 day: Callable[[], str] = _today):
+        """
+        :param rate: 每秒允许的请求数
+        :param burst: 桶容量（允许的突发请求数），默认等于 rate
+        :param daily_limit: 每日请求额度，None 表示不限
+        :param background_reserve: 为交互请求保留的额度，剩余额度低于此值时拒绝后台请求
+        :param clock: 时钟函数（便于测试）
+        :param day: 返回当天日期字符串的函数（日期变化时额度清零）
+        :raises ValueError: rate 不大于0
+        """
+        if rate <= 0:
+            raise ValueError(f"rate 应大于0: {rate}")
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1, int(rate))
+        self.daily_limit = daily_limit
+        self.background_reserve = background_reserve
+        self.clock = clock
+        self.day = day
+
+        self._cond = threading.Condition()
+        self._tokens = float(self.burst)
+        self._updated = clock()
+        self._lanes = {lane: deque() for lane in LANE_NAMES}
+        self._day = day()
+        self.daily_used = 0
+        self.rejected = 0
+        self._waits = {lane: {"count": 0, "total": 0.0, "max": 0.0} for lane in LANE_NAMES}
+
+    def _refill(self):
+        now = self.clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _check_quota(self, priority: int):
+        today = self.day()
+        if today != self._day:
+            self._day = today
+            self.daily_used = 0
+        if self.daily_limit is None:
+            return
+        remaining = self.daily_limit - self.daily_used
+        reserve = self.background_reserve if priority != PRIORITY_INTERACTIVE else 0
+        if remaining <= reserve:
+            self.rejected += 1
+            raise QuotaExceeded(f"当日额度已用完（已用 {self.daily_used}/{self.daily_limit}）")
+
+    def _has_waiters(self, priority: int) -> bool:
+        """是否有同级或更优先的请求在排队"""
+        return any(self._lanes[lane] for lane in self._lanes if lane <= priority)
+
+    def _grant(self, priority: int, waited: float):
+        """扣除令牌和额度，记录等待时间"""
+        self._tokens -= 1
+        self.daily_used += 1
+        stats = self._waits[priority]
+        stats["count"] += 1
+        stats["total"] += waited
+        stats["max"] = max(stats["max"], waited)
+
+    def _is_next(self, ticket, priority: int) -> bool:
+        """ticket 是否排在所有等待者的最前面"""
+        for lane in sorted(self._lanes):
+            queue = self._lanes[lane]
+            if queue:
+                return lane == priority and queue[0] is ticket
+        return False
+
+    def acquire(self, priority: int = PRIORITY_INTERACTIVE,
+                timeout: Optional[float] = None) -> float:
+        """
+        获取一次请求许可（必要时阻塞等待）
+
+        :param priority: 优先级通道，PRIORITY_INTERACTIVE 或 PRIORITY_BACKGROUND
+        :param timeout: 最长等待时间（秒），None 表示一直等待
+        :return: 实际等待的秒数
+        :raises QuotaExceeded: 当日额度已用完
+        :raises RateLimitTimeout: 超过等待时间
+        """
+        ticket = object()
+        start = self.clock()
+        deadline = None if timeout is None else start + timeout
+        with self._cond:
+            self._check_quota(priority)
+            queue = self._lanes[priority]
+            queue.append(ticket)
+            try:
+                while True:
+                    self._refill()
+                    if self._tokens >= 1 and self._is_next(ticket, priority):
+                        break
+                    wait = max((1 - self._tokens) / self.rate, 0.001)
+                    if deadline is not None:
+                        remaining = deadline - self.clock()
+                        if remaining <= 0:
+                            raise RateLimitTimeout("等待请求许可超时")
+                        wait = min(wait, remaining)
+                    self._cond.wait(wait)
+                # 排队期间额度可能已被其他请求用完
+                self._check_quota(priority)
+                waited = self.clock() - start
+                self._grant(priority, waited)
+            finally:
+                queue.remove(ticket)
+                self._cond.notify_all()
+            return waited
+
+    def try_acquire(self, priority: int = PRIORITY_INTERACTIVE, waited: float = 0.0) -> float:
+        """
+        不阻塞地尝试获取一次请求许可
+
+        供异步代码使用：未获得许可时按返回的秒数 asyncio.sleep 后再次调用，
+        等待期间不占用线程，调用方被取消时也不会消耗令牌和额度。
+        有同级或更优先的 acquire() 在排队时不会插队
+
+        :param priority: 优先级通道
+        :param waited: 调用方此前已等待的秒数（计入等待统计）
+        :return: 0 表示已获得许可，否则为建议的等待秒数
+        :raises QuotaExceeded: 当日额度已用完
+        """
+        with self._cond:
+            self._check_quota(priority)
+            self._refill()
+            if self._tokens >= 1 and not self._has_waiters(priority):
+                self._grant(priority, waited)
+                return 0.0
+            if self._tokens >= 1:  # 令牌留给排队者，下一个令牌补充后再试
+                return 1 / self.rate
+            return max((1 - self._tokens) / self.rate, 0.001)
+
+    def stats(self) -> Dict:
+        """排队深度、等待时间和额度使用情况"""
+        with self._cond:
+            lanes = {}
+            for lane, name in LANE_NAMES.items():
+                waits = self._waits[lane]
+                lanes[name] = {
+                    "queue_depth": len(self._lanes[lane]),
+                    "granted": waits["count"],
+                    "avg_wait": waits["total"] / waits["count"] if waits["count"] else 0.0,
+                    "max_wait": waits["max"],
+                }
+            return {
+                "lanes": lanes,
+                "daily_used": self.daily_used,
+                "daily_remaining": (None if self.daily_limit is None
+                                    else max(self.daily_limit - self.daily_used, 0)),
+                "rejected": self.rejected,
+            }
@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+结果渲染
+城市列表、多城市天气报表按行渲染为文本表格、CSV、JSON 或 NDJSON，可选择列；
+一次遍历、分块写入文件对象，数千行也不拼接成一个大字符串。单个城市的天气详情见 weather_card
+"""
+
+import csv
+import io
+import json
+import unicodedata
+from operator import itemgetter
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, TextIO, Union
+
+from observation import Observation
+from response_decoder import orjson
+
+# 列名: (表头, 文本表格中的显示宽度)
+COLUMNS = {
+    "no": ("序号", 4),
+    "query": ("查询", 12),
+    "name": ("名称", 10),
+    "id": ("城市ID", 11),
+    "adm2": ("上级城市", 10),
+    "adm1": ("省份", 10),
+    "country": ("国家", 6),
+    "lat": ("纬度", 9),
+    "lon": ("经度", 10),
+    "rank": ("排名", 4),
+    "obs_time": ("观测时间", 22),
+    "temp": ("温度°C", 7),
+    "feels_like": ("体感°C", 7),
+    "text": ("天气", 8),
+    "wind_dir": ("风向", 8),
+    "wind_scale": ("风力级", 6),
+    "wind_speed": ("风速km/h", 9),
+    "humidity": ("湿度%", 6),
+    "precip": ("降水mm", 7),
+    "pressure": ("气压hPa", 8),
+    "vis": ("能见度km", 9),
+    "stale": ("缓存", 5),
+    "error": ("错误", 10),
+}
+CITY_COLUMNS = ("no", "name", "id", "adm1", "country", "lat", "lon", "rank")
+WEATHER_COLUMNS = ("name", "id", "obs_time", "temp", "feels_like", "text", "wind_dir",
+                   "wind_scale", "humidity", "pressure")
+FORMATS = ("table", "csv", "json", "ndjson")
+DEFAULT_CHUNK_ROWS = 1000
+# json.dumps 传入参数时每次都会新建编码器，这里复用一个
+_JSON_ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+# 天气详情的字段：(标签, Observation 属性, 单位)
+CARD_FIELDS = (
+    ("温度", "temp", "°C"),
+    ("天气状况", "text", ""),
+    ("体感温度", "feels_like", "°C"),
+    ("风向", "wind_dir", ""),
+    ("风力", "wind_scale", "级"),
+    ("湿度", "humidity", "%"),
+    ("气压", "pressure", " hPa"),
+)
+_WEATHER_FIELDS = ("temp", "feels_like", "text", "wind_dir", "wind_scale", "wind_speed",
+                   "humidity", "precip", "pressure", "vis", "stale")
+# 可能包含中文等全角字符的列，文本表格中按显示宽度补齐；其他列按字符数补齐
+_TEXT_COLUMNS = frozenset(("query", "name", "adm2", "adm1", "country", "text", "wind_dir",
+                           "error"))
+# 每个文本列缓存的单元格数量（省份、国家、天气状况等取值重复很多）
+_CELL_CACHE_SIZE = 1024
+
+
+class _WideChars(dict):
+    """字符 -> 是否为全角字符（1/0），按需查询 unicodedata"""
+
+    def __missing__(self, char: str) -> int:
+        wide = self[char] = 1 if unicodedata.east_asian_width(char) in "WF" else 0
+        return wide
+
+
+_WIDE_CHARS = _WideChars()
+
+
+def _pad(text: str, width: int) -> str:
+    """补齐到显示宽度 width（中文等全角字符占两列）"""
+    if text.isascii():
+        return text.ljust(width)
+    return text + " " * (width - len(text) - sum(map(_WIDE_CHARS.__getitem__, text)))
+
+
+class _PaddedCells(dict):
+    """文本列的取值 -> 补齐后的单元格"""
+
+    def __init__(self, width: int):
+        super().__init__()
+        self.width = width
+
+    def __missing__(self, value) -> str:
+        cell = _pad(str(value), self.width)
+        if value.__class__ is str and len(self) < _CELL_CACHE_SIZE:
+            self[value] = cell
+        return cell
+
+
+def _getter(keys: Sequence[str]) -> Callable[[Dict], tuple]:
+    """按 keys 取出一行的值（缺少的键抛出 KeyError）"""
+    if len(keys) == 1:
+        key = keys[0]
+        return lambda row: (row[key],)
+    if not keys:
+        return lambda row: ()
+    return itemgetter(*keys)
+
+
+def _dumps(rows: List[Dict], separator: str) -> str:
+    """把多行编码为 JSON 并用 separator 连接（安装 orjson 时使用 orjson）"""
+    if orjson is not None:
+        return separator.encode().join(map(orjson.dumps, rows)).decode()
+    return separator.join(map(_JSON_ENCODER.encode, rows))
+
+
+def weather_row(weather: Optional[Observation], city: Optional[Dict] = None,
+                error: Optional[str] = None) -> Dict[str, Any]:
+    """
+    一个城市的天气转为一行
+
+    :param weather: 天气数据，None 表示查询失败
+    :param city: 城市信息，默认使用 weather.city
+    :param error: 错误信息
+    """
+    if city is None:
+        city = (weather.city if weather is not None else None) or {}
+    row = dict(city)
+    if weather is not None:
+        row["obs_time"] = (weather.obs_time.isoformat(timespec="minutes")
+                           if weather.obs_time is not None else None)
+        for field in _WEATHER_FIELDS:
+            row[field] = getattr(weather, field)
+    row["error"] = error
+    return row
+
+
+def weather_rows(results: Dict[str, Dict],
+                 cities: Optional[Dict[str, Dict]] = None) -> Iterator[Dict[str, Any]]:
+    """
+    get_weather_many 的结果转为行
+
+    :param results: {城市ID: {"data": Observation或None, "error": ...}}
+    :param cities: {城市ID: 城市信息}（可选，用于显示名称）
+    """
+    for city_id, result in results.items():
+        city = (cities or {}).get(city_id) or {"id": city_id}
+        yield weather_row(result["data"], city, result["error"])
+
+
+class TableRenderer:
+    """按行写出表格（非线程安全）"""
+
+    def __init__(self, out: TextIO, fmt: str = "table",
+                 columns: Sequence[str] = CITY_COLUMNS,
+                 header: bool = True, chunk_rows: int = DEFAULT_CHUNK_ROWS):
+        """
+        :param out: 输出（文件对象、sys.stdout 或 io.StringIO）
+        :param fmt: table（对齐的文本表格）/ csv / json（数组）/ ndjson（每行一个对象）
+        :param columns: 输出的列，见 COLUMNS；"no" 为从1开始的行号，其他列从行（字典，
+                        如城市搜索结果或 weather_row 的返回值）中按列名读取，缺少的列为空
+        :param header: 表格和 CSV 是否输出表头（CSV 表头为列名，表格为中文标题）
+        :param chunk_rows: 每积累多少行写出一次
+        """
+        if fmt not in FORMATS:
+            raise ValueError(f"不支持的格式: {fmt}（可选 {', '.join(FORMATS)}）")
+        unknown = [column for column in columns if column not in COLUMNS]
+        if unknown:
+            raise ValueError(f"未知列: {', '.join(unknown)}")
+
+        self.out = out
+        self.fmt = fmt
+        self.columns = tuple(columns)
+        self.chunk_rows = chunk_rows
+        self.rows = 0
+        self._flushed = 0
+        self._chunk: list = []  # 待写出的表格行（json / ndjson 为字典）
+        self._no = self.columns.index("no") if "no" in self.columns else None
+        self._keys = tuple(column for column in self.columns if column != "no")
+        self._get = _getter(self._keys)
+
+        # 文本表格：数字、ID等列直接由格式串补齐，文本列查表得到补齐后的单元格
+        widths = [COLUMNS[column][1] for column in self.columns]
+        # 最后一列不补齐，行尾没有多余的空格
+        last = len(self.columns) - 1
+        self._template = " ".join(
+            "%s" if column in _TEXT_COLUMNS or i == last else f"%-{width}s"
+            for i, (column, width) in enumerate(zip(self.columns, widths)))
+        self._cells = [(i, _PaddedCells(width))
+                       for i, (column, width) in enumerate(zip(self.columns, widths))
+                       if column in _TEXT_COLUMNS and i != last]
+
+        # CSV 直接写入 out（由文件对象缓冲），不经过中间字符串
+        self._csv = csv.writer(out, lineterminator="\n") if fmt == "csv" else None
+        if header and fmt == "table":
+            self._chunk.append(" ".join(_pad(COLUMNS[column][0], width)
+                                        for column, width in zip(self.columns, widths)).rstrip())
+            self._chunk.append(" ".join("-" * width for width in widths))
+        elif header and fmt == "csv":
+            self._csv.writerow(self.columns)
+
+    def write(self, row: Dict[str, Any]):
+        """写入一行"""
+        self.write_many((row,))
+
+    def write_many(self, rows: Iterable[Dict[str, Any]]) -> int:
+        """写入多行，返回写入的行数"""
+        # 热循环：属性先取到局部变量，每行不再调用其他方法
+        fmt, columns, keys, get, no = self.fmt, self.columns, self._keys, self._get, self._no
+        template, text_cells, chunk_rows = self._template, self._cells, self.chunk_rows
+        append = self._chunk.append
+        writerow = self._csv.writerow if self._csv is not None else None
+        before = count = self.rows
+        for row in rows:
+            count += 1
+            try:
+                values = list(get(row))
+            except KeyError:  # 行中缺少某些列时逐个读取（较慢）
+                values = [row.get(key) for key in keys]
+            if no is not None:
+                values.insert(no, count)
+            if fmt == "table":
+                if None in values:
+                    values = ["" if value is None else value for value in values]
+                for i, cells in text_cells:
+                    values[i] = cells[values[i]]
+                append(template % tuple(values))
+            elif writerow is not None:
+                writerow(values)
+            else:
+                append(dict(zip(columns, values)))
+            if count % chunk_rows == 0:
+                self.rows = count
+                self.flush()
+        self.rows = count
+        return count - before
+
+    def flush(self):
+        """写出已缓冲的行"""
+        chunk = self._chunk
+        if not chunk:
+            return
+        if self.fmt == "table":
+            self.out.write("\n".join(chunk) + "\n")
+        elif self.fmt == "ndjson":
+            self.out.write(_dumps(chunk, "\n") + "\n")
+        else:
+            self.out.write(("[\n" if not self._flushed else ",\n") + _dumps(chunk, ",\n"))
+            self._flushed += len(chunk)
+        chunk.clear()
+
+    def close(self):
+        """写出剩余的行（JSON 补上结尾的 ]），不关闭 out"""
+        self.flush()
+        if self.fmt == "json":
+            self.out.write("\n]\n" if self.rows else "[]\n")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def render(rows: Iterable[Dict[str, Any]], out: TextIO, fmt: str = "table",
+           columns: Sequence[str] = CITY_COLUMNS, **options) -> int:
+    """把所有行渲染到 out，返回行数（options 见 TableRenderer）"""
+    with TableRenderer(out, fmt, columns, **options) as renderer:
+        return renderer.write_many(rows)
+
+
+def render_text(rows: Iterable[Dict[str, Any]], fmt: str = "table",
+                columns: Sequence[str] = CITY_COLUMNS, **options) -> str:
+    """渲染为字符串（行数较少时使用，大量数据请用 render 写入文件）"""
+    out = io.StringIO()
+    render(rows, out, fmt, columns, **options)
+    return out.getvalue()
+
+
+def weather_card(weather: Union[Observation, Dict, None], city_info: Optional[Dict] = None,
+                 width: int = 60) -> str:
+    """
+    单个城市的天气详情
+
+    :param weather: Observation，或接口返回的实时天气字典
+    :param city_info: 城市信息（包含 id 时显示城市信息部分），默认使用 weather.city
+    :param width: 分隔线宽度
+    """
+    if isinstance(weather, dict):
+        weather = Observation.from_response(weather) if "now" in weather else None
+    if weather is None:
+        return "未获取到天气数据"
+    city_info = city_info if city_info is not None else (weather.city or {})
+
+    def show(value):
+        return "N/A" if value is None else value
+
+    line = "=" * width
+    lines = ["", line, f"🌤️  {city_info.get('name', '未知城市')} 实时天气", line]
+    if "id" in city_info:
+        lines += [
+            "📍 城市信息:",
+            f"  名称: {city_info.get('name', '未知')}",
+            f"  ID: {city_info['id']}",
+            f"  位置: {city_info.get('adm1', '未知')}, {city_info.get('country', '未知')}",
+            f"  经纬度: {city_info.get('lat', '未知')}, {city_info.get('lon', '未知')}",
+            "",
+        ]
+
+    obs_time = (weather.obs_time.isoformat(sep=" ", timespec="minutes")
+                if weather.obs_time is not None else "未知时间")
+    lines += ["🌡️  天气数据:", f"  更新时间: {obs_time}"]
+    lines += [f"  {label}: {show(getattr(weather, attr))}{unit}"
+              for label, attr, unit in CARD_FIELDS]
+    if weather.stale:
+        lines.append(f"  （缓存数据，已缓存 {weather.age} 秒）")
+    lines += [line, ""]
+    return "\n".join(lines)
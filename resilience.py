@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+重试与熔断
+带随机抖动的指数退避重试；按接口熔断，上游故障期间快速失败，半开状态探测恢复
+"""
+
+import random
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class CircuitOpenError(Exception):
+    """熔断器处于打开状态，请求未发出"""
+
+
+class RetryPolicy:
+    """重试策略（指数退避 + 完全随机抖动）"""
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.2,
+                 max_delay: float = 5.0,
+                 retry_statuses: Iterable[int] = RETRY_STATUSES):
+        """
+        :param max_attempts: 最多尝试次数（含第一次）
+        :param base_delay: 退避基数（秒）
+        :param max_delay: 单次退避上限（秒）
+        :param retry_statuses: 需要重试的HTTP状态码
+        """
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_statuses = frozenset(retry_statuses)
+
+    def delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """
+        第 attempt 次失败（从0开始）后的等待时间
+
+        :param retry_after: 响应头 Retry-After（秒数），存在时优先使用
+        """
+        if retry_after:
+            try:
+                return min(float(retry_after), self.max_delay)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+# 不重试
+NO_RETRY = RetryPolicy(max_attempts=1)
+
+
+class CircuitBreaker:
+    """熔断器：连续失败达到阈值后打开，冷却后进入半开状态放行探测请求"""
+
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 30.0,
+                 half_open_max_calls: int = 1,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        :param failure_threshold: 连续失败多少次后打开
+        :param recovery_timeout: 打开后多久进入半开状态（秒）
+        :param half_open_max_calls: 半开状态同时放行的探测请求数
+        :param clock: 时钟函数（便于测试）
+        """
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.clock = clock
+
+        self._lock = threading.Lock()
+        self._state = STATE_CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self.rejected = 0
+        self.opened = 0
+
+    @property
+    def state(self) -> str:
+        """当前状态"""
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def _maybe_half_open(self):
+        if self._state == STATE_OPEN and self.clock() - self._opened_at >= self.recovery_timeout:
+            self._state = STATE_HALF_OPEN
+            self._probes = 0
+
+    def before_call(self):
+        """请求前检查，熔断打开时抛出 CircuitOpenError"""
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == STATE_CLOSED:
+                return
+            if self._state == STATE_HALF_OPEN and self._probes < self.half_open_max_calls:
+                self._probes += 1
+                return
+            self.rejected += 1
+            raise CircuitOpenError("上游服务暂不可用（熔断中）")
+
+    def release(self):
+        """
+        归还 before_call 占用的探测名额，不计成功或失败
+
+        调用因限流、取消或其他非上游故障的异常中断时使用，否则半开状态的名额不会归还，
+        熔断器将一直拒绝请求
+        """
+        with self._lock:
+            if self._state == STATE_HALF_OPEN and self._probes > 0:
+                self._probes -= 1
+
+    def record_success(self):
+        """记录成功：关闭熔断器"""
+        with self._lock:
+            self._state = STATE_CLOSED
+            self._failures = 0
+            self._probes = 0
+
+    def record_failure(self):
+        """记录失败：达到阈值或探测失败时打开熔断器"""
+        with self._lock:
+            self._failures += 1
+            if self._state == STATE_HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != STATE_OPEN:
+                    self.opened += 1
+                self._state = STATE_OPEN
+                self._opened_at = self.clock()
+                self._probes = 0
+
+
+class CircuitBreakerRegistry:
+    """按接口路径管理熔断器"""
+
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 30.0,
+                 half_open_max_calls: int = 1):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def get(self, endpoint: str) -> CircuitBreaker:
+        """获取接口对应的熔断器（不存在时创建）"""
+        breaker = self._breakers.get(endpoint)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.get(endpoint)
+                if breaker is None:
+                    breaker = CircuitBreaker(self.failure_threshold, self.recovery_timeout,
+                                             self.half_open_max_calls)
+                    self._breakers[endpoint] = breaker
+        return breaker
+
+    def stats(self) -> Dict[str, Dict]:
+        """各接口熔断器的状态"""
+        return {endpoint: {"state": breaker.state, "opened": breaker.opened,
+                           "rejected": breaker.rejected}
+                for endpoint, breaker in list(self._breakers.items())}
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+接口响应解码
+安装 orjson 时使用 orjson 解析，否则使用标准库 json；解析后直接转为调用方需要的紧凑记录：
+实时天气转为 Observation，城市搜索结果只保留常用字段（去掉 fxLink、tz 等）
+"""
+
+import json
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from observation import Observation
+
+try:
+    import orjson
+except ImportError:  # 可选依赖：未安装时使用标准库 json
+    orjson = None
+
+BACKEND = "orjson" if orjson is not None else "json"
+
+# 城市搜索结果保留的字段（城市信息展示、过滤重名、坐标解析用到的字段）
+LOCATION_FIELDS = ("name", "id", "lat", "lon", "adm2", "adm1", "country", "rank")
+
+
+def loads(body: Union[bytes, str]) -> Any:
+    """解析 JSON（bytes 或 str）"""
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
+
+
+def project_locations(data: Dict,
+                      fields: Sequence[str] = LOCATION_FIELDS) -> List[Dict]:
+    """城市搜索结果中的城市列表，每个城市只保留 fields 中的字段"""
+    locations = data.get("location") or ()
+    try:
+        return [{field: location[field] for field in fields} for location in locations]
+    except KeyError:  # 个别城市缺少字段时逐个检查（较慢）
+        return [{field: location[field] for field in fields if field in location}
+                for location in locations]
+
+
+def decode_locations(body: Union[bytes, str],
+                     fields: Sequence[str] = LOCATION_FIELDS) -> Tuple[Optional[str], List[Dict]]:
+    """
+    解码城市搜索响应
+
+    :param body: 响应体（如 response.content）
+    :return: (code, 精简后的城市列表)
+    """
+    data = loads(body)
+    return data.get("code"), project_locations(data, fields)
+
+
+def decode_weather_now(body: Union[bytes, str]) -> Tuple[Optional[str], Optional[Observation]]:
+    """
+    解码实时天气响应
+
+    :param body: 响应体（如 response.content）
+    :return: (code, Observation)，code 不为 "200" 时 Observation 为 None
+    """
+    data = loads(body)
+    code = data.get("code")
+    return code, Observation.from_response(data) if code == "200" else None
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+相同请求合并（single-flight）
+同一个键同时只发出一次上游请求，其余调用方等待并共享结果或异常
+"""
+
+import asyncio
+import functools
+import threading
+from typing import Any, Callable, Dict, Hashable
+
+
+def request_key(path: str, params: Dict) -> Hashable:
+    """由接口路径和请求参数生成合并键"""
+    return (path, tuple(sorted((k, str(v)) for k, v in params.items())))
+
+
+class _Call:
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """线程版请求合并"""
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self.calls = 0       # 调用总数
+        self.executions = 0  # 实际执行次数
+        self.collapsed = 0   # 被合并（未实际执行）的次数
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        执行 fn，若相同 key 的调用正在进行则等待其结果
+
+        :param key: 合并键（如 request_key(path, params)）
+        :param fn: 实际执行的函数
+        :return: fn 的返回值；fn 抛出的异常会传给所有等待者
+        """
+        with self._lock:
+            self.calls += 1
+            call = self._calls.get(key)
+            if call is not None:
+                self.collapsed += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.executions += 1
+                leader = True
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+        return call.result
+
+    def stats(self) -> Dict[str, int]:
+        """合并统计"""
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "executions": self.executions,
+                "collapsed": self.collapsed,
+                "in_flight": len(self._calls),
+            }
+
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class AsyncSingleFlight:
+    """asyncio 版请求合并（在同一事件循环内使用）"""
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Flight] = {}
+        self.calls = 0
+        self.executions = 0
+        self.collapsed = 0
+
+    async def do(self, key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        等待协程函数 fn 的结果，相同 key 的并发调用只执行一次
+
+        fn 在单独的任务中运行：某个调用方被取消（如 asyncio.wait_for 超时）只结束它自己的等待，
+        其他调用方照常得到结果；所有调用方都放弃时才取消 fn
+
+        :param key: 合并键
+        :param fn: 协程函数
+        :return: fn 的返回值；fn 抛出的异常会传给所有等待者
+        """
+        self.calls += 1
+        flight = self._calls.get(key)
+        if flight is not None:
+            self.collapsed += 1
+        else:
+            self.executions += 1
+            flight = self._calls[key] = _Flight(asyncio.ensure_future(fn(*args, **kwargs)))
+            flight.task.add_done_callback(functools.partial(self._finish, key, flight))
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # 没有调用方在等待：取消上游请求，之后的调用重新执行
+                self._forget(key, flight)
+                flight.task.cancel()
+
+    def _forget(self, key: Hashable, flight: _Flight):
+        if self._calls.get(key) is flight:
+            del self._calls[key]
+
+    def _finish(self, key: Hashable, flight: _Flight, task: asyncio.Task):
+        self._forget(key, flight)
+        if not task.cancelled():
+            task.exception()  # 标记异常已读取，避免无人等待时输出警告
+
+    def stats(self) -> Dict[str, int]:
+        """合并统计"""
+        return {
+            "calls": self.calls,
+            "executions": self.executions,
+            "collapsed": self.collapsed,
+            "in_flight": len(self._calls),
+        }
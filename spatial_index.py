@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+最近城市空间索引
+按经纬度网格分桶，将设备坐标映射为最近的城市ID（支持批量查询）
+"""
+
+import json
+import math
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # 可选依赖：未安装时批量查询逐个计算
+    np = None
+
+EARTH_RADIUS_KM = 6371.0088
+DEFAULT_CELL_SIZE = 1.0   # 网格边长（度）
+BATCH_CHUNK = 4096        # 批量查询时每次向量化计算的坐标数
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """两点之间的球面距离（公里）"""
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+class SpatialIndex:
+    """
+    网格空间索引
+
+    按等距圆柱投影距离排序（城市尺度下与球面距离基本一致），不处理180度经线两侧的环绕
+    """
+
+    def __init__(self, cities: Iterable[Dict] = (), cell_size: float = DEFAULT_CELL_SIZE):
+        """
+        :param cities: 城市列表（需包含 id、lat、lon 字段）
+        :param cell_size: 网格边长（度），城市越密集可设得越小
+        """
+        self.cell_size = cell_size
+        self.cities: List[Dict] = []
+        self.ids: List[str] = []
+        self.lats: List[float] = []
+        self.lons: List[float] = []
+        self._cells: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+        self._by_id: Dict[str, int] = {}
+        self._bounds = None  # (最小行, 最大行, 最小列, 最大列)
+        self._arrays = None  # numpy 缓存：(lats, lons)
+        self.add_many(cities)
+
+    @classmethod
+    def from_file(cls, filename: str, cell_size: float = DEFAULT_CELL_SIZE) -> "SpatialIndex":
+        """从城市搜索导出文件（city_search.json 格式）构建索引"""
+        with open(filename, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            data = data.get("cities") or data.get("location") or []
+        return cls(data, cell_size=cell_size)
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return math.floor(lat / self.cell_size), math.floor(lon / self.cell_size)
+
+    def add(self, city: Dict):
+        """添加城市（缺少经纬度或重复ID的条目会被忽略）"""
+        city_id = city.get("id")
+        try:
+            lat, lon = float(city["lat"]), float(city["lon"])
+        except (KeyError, TypeError, ValueError):
+            return
+        if not city_id or city_id in self._by_id:
+            return
+
+        idx = len(self.ids)
+        self._by_id[city_id] = idx
+        self.cities.append(city)
+        self.ids.append(city_id)
+        self.lats.append(lat)
+        self.lons.append(lon)
+        row, col = self._cell(lat, lon)
+        self._cells[(row, col)].append(idx)
+        if self._bounds is None:
+            self._bounds = (row, row, col, col)
+        else:
+            r0, r1, c0, c1 = self._bounds
+            self._bounds = (min(r0, row), max(r1, row), min(c0, col), max(c1, col))
+        self._arrays = None
+
+    def add_many(self, cities: Iterable[Dict]):
+        """批量添加城市"""
+        for city in cities:
+            self.add(city)
+
+    def get(self, city_id: str) -> Optional[Dict]:
+        """按城市ID获取城市信息"""
+        idx = self._by_id.get(city_id)
+        return self.cities[idx] if idx is not None else None
+
+    def _ring(self, row: int, col: int, r: int) -> List[int]:
+        """与 (row, col) 切比雪夫距离恰为 r 的网格中的所有点"""
+        cells = self._cells
+        if r == 0:
+            return list(cells.get((row, col), ()))
+        points = []
+        for c in range(col - r, col + r + 1):
+            points.extend(cells.get((row - r, c), ()))
+            points.extend(cells.get((row + r, c), ()))
+        for rr in range(row - r + 1, row + r):
+            points.extend(cells.get((rr, col - r), ()))
+            points.extend(cells.get((rr, col + r), ()))
+        return points
+
+    def _max_ring(self, row: int, col: int) -> int:
+        r0, r1, c0, c1 = self._bounds
+        return max(abs(row - r0), abs(row - r1), abs(col - c0), abs(col - c1))
+
+    def nearest(self, lat: float, lon: float, k: int = 1) -> List[Tuple[str, float]]:
+        """
+        查询最近的 k 个城市
+
+        :param lat: 纬度
+        :param lon: 经度
+        :param k: 返回数量
+        :return: [(城市ID, 距离公里), ...]，按距离升序
+        """
+        if not self.ids:
+            return []
+        row, col = self._cell(lat, lon)
+        scale = max(math.cos(math.radians(lat)), 1e-6)  # 等距圆柱投影下经度方向的缩放
+        lats, lons = self.lats, self.lons
+        max_ring = self._max_ring(row, col)
+
+        scored = []
+        for r in range(max_ring + 1):
+            for idx in self._ring(row, col, r):
+                dy = lats[idx] - lat
+                dx = (lons[idx] - lon) * scale
+                scored.append((dy * dy + dx * dx, idx))
+            if len(scored) >= k:
+                scored.sort()
+                del scored[k:]
+                # 第 r+1 圈及以外的点，投影距离至少为 r 个网格边长
+                bound = r * self.cell_size * min(scale, 1.0)
+                if scored[-1][0] <= bound * bound:
+                    break
+
+        scored.sort()
+        return [(self.ids[idx], haversine_km(lat, lon, lats[idx], lons[idx]))
+                for _, idx in scored[:k]]
+
+    def nearest_many(self, coords: Sequence[Tuple[float, float]],
+                     k: int = 1) -> List[List[Tuple[str, float]]]:
+        """
+        批量查询最近城市
+
+        安装了 numpy 时按网格分组向量化计算，否则逐个调用 nearest
+
+        :param coords: [(纬度, 经度), ...]
+        :param k: 每个坐标返回的数量
+        :return: 与 coords 顺序一致的结果列表
+        """
+        if np is None or not self.ids:
+            return [self.nearest(lat, lon, k) for lat, lon in coords]
+
+        if self._arrays is None:
+            self._arrays = (np.asarray(self.lats), np.asarray(self.lons))
+        point_lats, point_lons = self._arrays
+        ids = self.ids
+
+        groups = defaultdict(list)
+        for i, (lat, lon) in enumerate(coords):
+            groups[self._cell(lat, lon)].append(i)
+
+        query = np.asarray(coords, dtype=float).reshape(-1, 2)
+        results: List[Optional[List[Tuple[str, float]]]] = [None] * len(query)
+        for (row, col), members in groups.items():
+            max_ring = self._max_ring(row, col)
+            for start in range(0, len(members), BATCH_CHUNK):
+                chunk = members[start:start + BATCH_CHUNK]
+                qlat = query[chunk, 0][:, None]
+                qlon = query[chunk, 1][:, None]
+                scale = np.maximum(np.cos(np.radians(qlat)), 1e-6)
+
+                candidates = []
+                for r in range(max_ring + 1):
+                    candidates.extend(self._ring(row, col, r))
+                    if len(candidates) < k and r < max_ring:
+                        continue
+                    cand = np.asarray(candidates)
+                    dy = point_lats[cand][None, :] - qlat
+                    dx = (point_lons[cand][None, :] - qlon) * scale
+                    dist2 = dy * dy + dx * dx
+                    kk = min(k, len(candidates))
+                    kth = np.partition(dist2, kk - 1, axis=1)[:, kk - 1:kk]
+                    bound = r * self.cell_size * np.minimum(scale, 1.0)
+                    if r == max_ring or np.all(kth <= bound * bound):
+                        break
+
+                kk = min(k, len(candidates))
+                top = np.argpartition(dist2, kk - 1, axis=1)[:, :kk]
+                top_dist = np.take_along_axis(dist2, top, axis=1)
+                order = np.argsort(top_dist, axis=1)
+                top = np.take_along_axis(top, order, axis=1)
+                chosen = cand[top]
+
+                p1 = np.radians(qlat)
+                p2 = np.radians(point_lats[chosen])
+                dl = np.radians(point_lons[chosen] - qlon)
+                a = np.sin((p2 - p1) / 2) ** 2 + np.cos(p1) * np.cos(p2) * np.sin(dl / 2) ** 2
+                km = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+                for row_i, qi in enumerate(chunk):
+                    results[qi] = [(ids[j], float(d))
+                                   for j, d in zip(chosen[row_i].tolist(), km[row_i].tolist())]
+        return results
+
+    def __len__(self):
+        return len(self.ids)
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""测试异步工具箱（使用本地 asyncio 模拟服务，不访问真实API）"""
+
+import asyncio
+
+from aiohttp import web
+
+from async_toolkit import AsyncWeatherToolkit
+from cache import LRUCache
+from history_store import HistoryStore
+from mock_server import load_fixtures
+from prefetch import PrefetchScheduler
+from rate_limiter import RateLimiter
+from resilience import CircuitBreakerRegistry, RetryPolicy
+
+CITIES, WEATHER = load_fixtures()
+
+
+class StandIn:
+    """本地 asyncio 模拟服务，记录请求数和最大并发数"""
+
+    def __init__(self, delay: float = 0.0, failures: int = 0):
+        self.delay = delay
+        self.failures = failures  # 前几次天气请求返回 503
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def _track(self):
+        self.requests += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(self.delay)
+        self.in_flight -= 1
+
+    async def city_lookup(self, request):
+        await self._track()
+        location = request.query.get("location", "")
+        matches = [c for c in CITIES if location in (c["id"], c["name"])]
+        if not matches:
+            return web.json_response({"code": "404"})
+        return web.json_response({"code": "200", "location": matches})
+
+    async def weather_now(self, request):
+        await self._track()
+        if request.query.get("location") == "500":
+            return web.Response(status=500)
+        if self.failures > 0:
+            self.failures -= 1
+            return web.Response(status=503)
+        return web.json_response(WEATHER)
+
+    async def start(self) -> str:
+        app = web.Application()
+        app.router.add_get("/geo/v2/city/lookup", self.city_lookup)
+        app.router.add_get("/v7/weather/now", self.weather_now)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = self.runner.addresses[0][1]
+        return f"http://127.0.0.1:{port}"
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+
+def run(coro_fn, delay: float = 0.0, failures: int = 0, **toolkit_kwargs):
+    async def runner():
+        stand_in = StandIn(delay, failures)
+        url = await stand_in.start()
+        try:
+            async with AsyncWeatherToolkit(url, "jwt_token.txt", **toolkit_kwargs) as toolkit:
+                return await coro_fn(toolkit, stand_in)
+        finally:
+            await stand_in.stop()
+    return asyncio.run(runner())
+
+
+def test_query_weather_by_city():
+    async def scenario(toolkit, stand_in):
+        weather = await toolkit.query_weather_by_city("朝阳")
+        assert weather.city["id"] == "101010300"
+        assert weather.temp == int(WEATHER["now"]["temp"])
+        assert await toolkit.query_weather_by_city("不存在的城市") is None
+    run(scenario)
+
+
+def test_ids_and_coordinates_skip_city_search():
+    async def scenario(toolkit, stand_in):
+        weather = await toolkit.query_weather_by_city("101010100")
+        assert weather.city == {"id": "101010100"}
+        weather = await toolkit.query_weather_by_city("116.405,39.904")
+        assert weather.city["id"] == "116.41,39.90"
+        assert stand_in.requests == 2  # 只有天气请求
+
+        await toolkit.query_weather_by_city("北京")
+        await toolkit.query_weather_by_city(" 北京 ")
+        assert stand_in.requests == 3  # 一次城市搜索，天气已缓存
+        assert (await toolkit.query_weather_by_city("101010100")).city["name"] == "北京"
+        assert toolkit.resolver.stats() == {"hits": 1, "misses": 1, "direct": 3,
+                                            "geo_calls_saved": 4}
+    run(scenario)
+
+
+def test_results_are_cached():
+    async def scenario(toolkit, stand_in):
+        await toolkit.search_city("北京", number=1)
+        await toolkit.get_weather_now("101010100")
+        await toolkit.search_city("北京", number=1)
+        await toolkit.get_weather_now("101010100")
+        assert stand_in.requests == 2
+        assert toolkit.cache.stats()["hits"] == 2
+    run(scenario)
+
+
+def test_upstream_error_returns_none():
+    async def scenario(toolkit, stand_in):
+        assert await toolkit.get_weather_now("500") is None
+    run(scenario)
+
+
+def test_concurrency_limit():
+    async def scenario(toolkit, stand_in):
+        ids = [str(101010100 + i) for i in range(20)]
+        results = await asyncio.gather(*(toolkit.get_weather_now(i) for i in ids))
+        assert all(results)
+        assert stand_in.requests == 20
+        assert stand_in.max_in_flight <= 4
+    run(scenario, delay=0.02, max_concurrency=4)
+
+
+def test_identical_requests_are_coalesced():
+    async def scenario(toolkit, stand_in):
+        results = await asyncio.gather(*(toolkit.get_weather_now("101010100") for _ in range(10)))
+        assert all(r is results[0] for r in results)
+        assert stand_in.requests == 1
+        assert toolkit.singleflight.stats()["collapsed"] == 9
+    run(scenario, delay=0.02)
+
+
+def test_transient_errors_are_retried():
+    async def scenario(toolkit, stand_in):
+        assert await toolkit.get_weather_now("101010100") is not None
+        assert stand_in.requests == 3
+    run(scenario, failures=2, retry_policy=RetryPolicy(max_attempts=3, base_delay=0.01))
+
+
+def test_circuit_breaker_fails_fast():
+    async def scenario(toolkit, stand_in):
+        for city_id in ("1", "2"):
+            assert await toolkit.get_weather_now(city_id) is None
+        assert toolkit.breakers.get("/v7/weather/now").state == "open"
+        assert await toolkit.get_weather_now("3") is None
+        assert stand_in.requests == 2
+    run(scenario, failures=10, retry_policy=RetryPolicy(max_attempts=1),
+        breakers=CircuitBreakerRegistry(failure_threshold=2))
+
+
+def test_stale_while_revalidate_and_hooks(fake_clock, tmp_path):
+    history = HistoryStore(str(tmp_path))
+
+    async def scenario(toolkit, stand_in):
+        scheduler = PrefetchScheduler(toolkit, clock=fake_clock)
+        assert (await toolkit.get_weather_now("101010100")).stale is False
+        assert history.count("101010100") == 1
+        assert scheduler.next_refresh("101010100") == 270
+
+        fake_clock.advance(320)
+        stand_in.delay = 0.05
+        results = await asyncio.gather(*(toolkit.get_weather_now("101010100") for _ in range(5)))
+        assert all(weather.stale and weather.age == 320 for weather in results)
+        while toolkit.cache.get("weather", "101010100") is None:
+            await asyncio.sleep(0.01)
+        assert stand_in.requests == 2  # 只有一次后台刷新
+        assert (await toolkit.get_weather_now("101010100")).stale is False
+
+        fake_clock.advance(270)
+        assert await scheduler.tick_async() == 1
+        assert stand_in.requests == 3
+    run(scenario, cache=LRUCache(clock=fake_clock), stale_while_revalidate=60, history=history)
+    history.close()
+
+
+def test_stale_if_error(fake_clock):
+    async def scenario(toolkit, stand_in):
+        await toolkit.get_weather_now("101010100")
+        fake_clock.advance(330)
+        stand_in.failures = 1
+        weather = await toolkit.get_weather_now("101010100")
+        assert weather.stale and weather.age == 330
+
+        fake_clock.advance(31)
+        stand_in.failures = 1
+        assert await toolkit.get_weather_now("101010100") is None
+        assert stand_in.requests == 3
+    run(scenario, cache=LRUCache(clock=fake_clock), stale_if_error=60,
+        retry_policy=RetryPolicy(max_attempts=1))
+
+
+def test_exhausted_retries_return_the_last_response():
+    async def scenario(toolkit, stand_in):
+        # 与 HttpTransport.get 相同：不在传输层抛出，由调用方检查状态码
+        response, _ = await toolkit._request("/v7/weather/now", {"location": "500"})
+        assert response.status == 500
+        assert stand_in.requests == 2
+    run(scenario, retry_policy=RetryPolicy(max_attempts=2, base_delay=0.01))
+
+
+def test_cancelled_lookup_does_not_take_a_permit():
+    limiter = RateLimiter(rate=20, burst=1)
+
+    async def scenario(toolkit, stand_in):
+        await toolkit.get_weather_now("101010100")
+        task = asyncio.ensure_future(toolkit.get_weather_now("101020100"))
+        await asyncio.sleep(0.01)  # 等待下一个令牌（0.05秒）时取消
+        task.cancel()
+        await asyncio.sleep(0.1)
+        assert task.cancelled()
+        assert limiter.stats()["daily_used"] == 1
+        assert stand_in.requests == 1
+    run(scenario, rate_limiter=limiter)
+
+
+def test_stream_weather():
+    class ListSink:
+        def __init__(self):
+            self.records = []
+
+        def write(self, record):
+            self.records.append(record)
+
+    async def scenario(toolkit, stand_in):
+        sink = ListSink()
+        ids = ["500"] + [str(101010100 + i) for i in range(20)]
+        stats = await toolkit.stream_weather(iter(ids), sink, window=4)
+        assert stats == {"written": 21, "errors": 1}
+        assert sorted(r["id"] for r in sink.records) == sorted(ids)
+        assert stand_in.max_in_flight <= 4
+    run(scenario, delay=0.01, retry_policy=RetryPolicy(max_attempts=1))
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""测试批量查询命令行（使用本地模拟服务）"""
+
+import csv
+import io
+import json
+
+from batch_cli import read_queries, run_batch
+from mock_server import MockQWeatherServer
+from weather_toolkit import WeatherToolkit
+
+INPUT = "北京\n# 注释\n\n101020100\n朝阳,北京\n不存在的城市\n"
+
+
+def run(token, fmt: str, order: str = "input"):
+    out = io.StringIO()
+    with MockQWeatherServer() as server:
+        toolkit = WeatherToolkit(server.url, "jwt_token.txt", token_provider=token)
+        stats = run_batch(toolkit, read_queries(io.StringIO(INPUT)), out,
+                          fmt=fmt, order=order, workers=2)
+    return out.getvalue(), stats
+
+
+def test_ndjson_in_input_order(static_token):
+    output, stats = run(static_token, "ndjson")
+    records = [json.loads(line) for line in output.splitlines()]
+    assert [r["query"] for r in records] == ["北京", "101020100", "朝阳,北京", "不存在的城市"]
+    assert records[0]["city"]["id"] == "101010100"
+    assert records[2]["city"]["id"] == "101010300"
+    assert records[1]["weather"]["now"]["temp"] == "-5"
+    assert records[3]["error"] == "未找到城市"
+    assert stats["ok"] == 3 and stats["errors"] == 1
+
+
+def test_csv_in_completion_order(static_token):
+    output, stats = run(static_token, "csv", order="completion")
+    rows = list(csv.DictReader(io.StringIO(output)))
+    assert sorted(row["query"] for row in rows) == sorted(["北京", "101020100", "朝阳,北京", "不存在的城市"])
+    assert {row["temp"] for row in rows if not row["error"]} == {"-5"}
+    assert stats["total"] == 4
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""测试有界 LRU + TTL 缓存"""
+
+from cache import LRUCache
+from mock_server import MockQWeatherServer
+from weather_toolkit import WeatherToolkit
+
+
+def test_namespace_ttl(fake_clock):
+    cache = LRUCache(clock=fake_clock)
+    cache.set("search", "北京", [{"id": "101010100"}])
+    cache.set("weather", "101010100", {"code": "200"})
+
+    fake_clock.now = 301
+    assert cache.get("weather", "101010100") is None
+    assert cache.get("search", "北京") == [{"id": "101010100"}]
+
+    fake_clock.now = 3601
+    assert cache.get("search", "北京") is None
+    assert cache.stats()["expirations"] == 2
+
+
+def test_lru_eviction_by_entries():
+    cache = LRUCache(max_entries=2)
+    cache.set("weather", "a", 1)
+    cache.set("weather", "b", 2)
+    cache.get("weather", "a")          # a 变为最近使用
+    cache.set("weather", "c", 3)
+
+    assert cache.get("weather", "b") is None
+    assert cache.get("weather", "a") == 1
+    assert cache.get("weather", "c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_byte_budget():
+    cache = LRUCache(max_bytes=100, sizeof=lambda value: 40)
+    for key in "abcd":
+        cache.set("weather", key, key)
+
+    stats = cache.stats()
+    assert stats["entries"] == 2
+    assert stats["bytes"] == 80
+    assert cache.get("weather", "d") == "d"
+
+
+
+def test_oversized_value_replaces_old_entry():
+    cache = LRUCache(max_bytes=100, sizeof=lambda value: len(value) * 10)
+    cache.set("weather", "a", "x")
+    cache.set("weather", "a", "y" * 20)  # 超出预算：不缓存，旧值也不再返回
+
+    assert cache.get("weather", "a") is None
+    assert cache.stats()["entries"] == 0
+    assert cache.stats()["bytes"] == 0
+
+def test_hit_miss_counters():
+    cache = LRUCache()
+    cache.get("weather", "x")
+    cache.set("weather", "x", {"code": "200"})
+    cache.get("weather", "x")
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+
+
+def test_stale_entries_are_retained(fake_clock):
+    cache = LRUCache(clock=fake_clock)
+    cache.set("weather", "101010100", {"code": "200"}, stale_ttl=600)
+
+    fake_clock.now = 400
+    assert cache.get("weather", "101010100") is None
+    assert cache.get_stale("weather", "101010100") == ({"code": "200"}, 400, True)
+
+    fake_clock.now = 901
+    assert cache.get_stale("weather", "101010100") == (None, None, None)
+
+
+def test_search_cache_subsumption_and_negative_ttl(fake_clock, static_token):
+    with MockQWeatherServer() as server:
+        toolkit = WeatherToolkit(server.url, "jwt_token.txt", token_provider=static_token,
+                                 cache=LRUCache(clock=fake_clock))
+        assert len(toolkit.search_city("weather", number=5)) == 5
+        assert len(toolkit.search_city(" WEATHER ", number=2)) == 2
+        assert len(toolkit.search_city("weather", number=10)) == 10
+        assert server.request_count == 2  # 数量更多的请求无法由已缓存的结果回答
+
+        assert toolkit.search_city("不存在的城市") == []
+        assert toolkit.search_city("不存在的城市 ", number=1) == []
+        assert server.request_count == 3
+        fake_clock.now += 61  # 负缓存过期后重新请求
+        assert toolkit.search_city("不存在的城市") == []
+        assert server.request_count == 4
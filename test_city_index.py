@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""测试离线城市索引"""
+
+import pytest
+
+import city_index
+from city_index import CityIndex
+
+
+def city(name, city_id, adm1, adm2, rank, slug, country="中国"):
+    return {"name": name, "id": city_id, "adm1": adm1, "adm2": adm2, "country": country,
+            "rank": str(rank), "fxLink": f"https://www.qweather.com/weather/{slug}-{city_id}.html"}
+
+
+CITIES = [
+    city("北京", "101010100", "北京市", "北京", 10, "beijing"),
+    city("朝阳", "101010300", "北京市", "北京", 15, "chaoyang"),
+    city("朝阳", "101071201", "辽宁省", "朝阳", 25, "chaoyang"),
+    city("北辰", "101030600", "天津市", "天津", 35, "beichen"),
+    city("南京", "101190101", "江苏省", "南京", 11, "nanjing"),
+    city("京山", "101201404", "湖北省", "荆门", 45, "jingshan"),
+    city("首尔", "101300101", "首尔", "首尔", 10, "seoul", country="韩国"),
+]
+
+
+def ids(cities):
+    return [c["id"] for c in cities]
+
+
+def test_name_matching_filters_and_rank():
+    index = CityIndex(CITIES + [CITIES[0]])  # 重复ID被忽略
+    assert len(index) == 7
+    # 精确匹配在前，其次前缀，最后子串；同一级别按 rank 排序
+    assert ids(index.search("北")) == ["101010100", "101030600"]
+    assert ids(index.search("京")) == ["101201404", "101010100", "101190101"]
+    assert ids(index.search("朝阳")) == ["101010300", "101071201"]
+    assert ids(index.search("朝阳", adm="辽宁")) == ["101071201"]
+    assert ids(index.search("朝阳", number=1)) == ["101010300"]
+    assert ids(index.search("首尔")) == ["101300101"]
+    assert index.search("首尔", range_code="cn") == []
+    assert index.search("北京", range_code="us") == []  # 其他范围本地无法判断
+    assert ids(index.search(" 101190101 ")) == ["101190101"]
+    assert index.search("上海") == []
+
+
+@pytest.mark.parametrize("pinyin", [True, False])
+def test_pinyin_and_initials(monkeypatch, pinyin):
+    if pinyin:
+        pytest.importorskip("pypinyin")
+    else:  # 未安装 pypinyin：从 fxLink 中提取全拼，不支持首字母
+        monkeypatch.setattr(city_index, "lazy_pinyin", None)
+    index = CityIndex(CITIES)
+    assert ids(index.search("BeiJing")) == ["101010100"]
+    assert ids(index.search("bei")) == ["101010100", "101030600"]
+    assert ids(index.search("nanjing", adm="江苏")) == ["101190101"]
+    assert index.search("nanjing", adm="湖北") == []
+    assert ids(index.search("bj")) == (["101010100"] if pinyin else [])
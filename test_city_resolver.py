@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""测试城市名称解析层"""
+
+from city_resolver import (KIND_COORDINATE, KIND_ID, KIND_NAME, CityResolver, classify,
+                           resolve_key)
+from mock_server import MockQWeatherServer
+from weather_query import WeatherQuery
+
+
+def test_classify_and_normalize():
+    assert classify("101010100") == KIND_ID
+    assert classify("116.41,39.92") == KIND_COORDINATE
+    assert classify("116.41, 39.92") == KIND_COORDINATE
+    assert classify("200,100") == KIND_NAME  # 超出经纬度范围
+    assert classify("朝阳,北京") == KIND_NAME
+    assert resolve_key("  BeiJing ") == resolve_key("beijing") == "beijing|"
+    assert resolve_key("朝阳", " 北京") == "朝阳|北京"
+
+    calls = []
+    resolver = CityResolver(lambda name, adm: calls.append((name, adm)) or {"id": "101010300"})
+    assert resolver.resolve(" 朝阳", "北京")["id"] == "101010300"
+    assert resolver.resolve("朝阳 ", "北京 ")["id"] == "101010300"
+    assert resolver.describe("101010300") == {"id": "101010300"}
+    assert calls == [("朝阳", "北京")]
+
+
+def test_repeat_queries_skip_geo_lookup(static_token):
+    with MockQWeatherServer() as server:
+        querier = WeatherQuery(server.url, "jwt_token.txt", token_provider=static_token)
+        results = [querier.query_weather_by_city(query)
+                   for query in ("北京", " 北京 ", "101010100", "116.41,39.92")]
+        assert server.request_count == 5  # 一次城市搜索 + 四次天气
+    assert all(result["now"]["temp"] == "-5" for result in results)
+    assert results[1]["city_info"]["id"] == "101010100"
+    assert results[2]["city_info"]["name"] == "北京"  # 按ID读取之前解析的城市信息
+    assert results[3]["city_info"]["id"] == "116.41,39.92"
+    assert querier.resolver.stats() == {"hits": 1, "misses": 1, "direct": 2,
+                                        "geo_calls_saved": 3}
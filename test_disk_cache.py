@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""测试持久化缓存与两级缓存"""
+
+import threading
+
+from cache import LRUCache
+from disk_cache import SQLiteCache, TieredCache
+
+
+def test_shared_file_and_ttl(tmp_path, fake_clock):
+    path = str(tmp_path / "cache.sqlite3")
+    writer = SQLiteCache(path, clock=fake_clock)
+    reader = SQLiteCache(path, clock=fake_clock)  # 相当于另一个进程
+    writer.set("search", "北京", [{"id": "101010100"}], ttl=10, stale_ttl=20)
+    assert reader.get("search", "北京") == [{"id": "101010100"}]
+
+    fake_clock.advance(10)
+    assert reader.get("search", "北京") is None
+    value, age, expired = reader.get_stale("search", "北京")  # 宽限期内
+    assert value == [{"id": "101010100"}] and age == 10 and expired
+    fake_clock.advance(20)
+    assert reader.get_stale("search", "北京") == (None, None, None)
+    assert reader.purge_expired() == 1
+    assert reader.stats() == {"entries": 0, "hits": 1, "misses": 1, "expirations": 1}
+
+    writer.set("weather", "101010100", {"temp": 1})
+    reader.delete("weather", "101010100")
+    assert writer.get("weather", "101010100") is None
+
+
+def test_tiered_backfill_and_thread_safe_counters(tmp_path, fake_clock):
+    path = str(tmp_path / "cache.sqlite3")
+    SQLiteCache(path, clock=fake_clock).set("weather", "101010100", {"temp": 1},
+                                            ttl=10, stale_ttl=60)
+    disk = SQLiteCache(path, clock=fake_clock)
+    tiered = TieredCache(disk, memory=LRUCache(clock=fake_clock))
+    assert tiered.get("weather", "101010100") == {"temp": 1}
+    assert tiered.memory.get("weather", "101010100") == {"temp": 1}  # 已回填内存
+
+    # 回填时保留剩余有效期和宽限期
+    fake_clock.advance(10)
+    assert tiered.memory.get("weather", "101010100") is None
+    value, _, expired = tiered.memory.get_stale("weather", "101010100")
+    assert value == {"temp": 1} and expired
+
+    disk.set("search", "k", [1], ttl=100)
+
+    def read():
+        for _ in range(200):
+            disk.get("search", "k")
+            disk.get("search", "missing")
+    threads = [threading.Thread(target=read) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = disk.stats()
+    assert stats["hits"] == 1 + 1600 and stats["misses"] == 1600
+
+
+def test_tiered_backfill_keeps_stored_at(tmp_path, fake_clock):
+    path = str(tmp_path / "cache.sqlite3")
+    disk = SQLiteCache(path, clock=fake_clock)
+    disk.set("weather", "101010100", {"temp": 1}, ttl=10, stale_ttl=60)
+    fake_clock.advance(5)
+    tiered = TieredCache(disk, memory=LRUCache(clock=fake_clock))
+    assert tiered.get("weather", "101010100") == {"temp": 1}
+
+    # 已缓存秒数从写入磁盘的时间算起，而不是回填内存的时间
+    fake_clock.advance(10)
+    value, age, expired = tiered.memory.get_stale("weather", "101010100")
+    assert value == {"temp": 1} and age == 15 and expired
+    assert tiered.get_stale("weather", "101010100")[1] == 15
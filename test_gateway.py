@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""测试本地缓存网关（上游为本地模拟服务）"""
+
+import asyncio
+
+import aiohttp
+
+from async_toolkit import AsyncWeatherToolkit
+from gateway import start_gateway
+from mock_server import MockQWeatherServer
+from weather_toolkit import WeatherToolkit
+
+
+def test_gateway_shares_cache_between_clients(static_token):
+    async def scenario(upstream_url):
+        toolkit = AsyncWeatherToolkit(upstream_url, "jwt_token.txt", token_provider=static_token)
+        runner = await start_gateway(toolkit)
+        host, port = runner.addresses[0][:2]
+        base = f"http://{host}:{port}"
+        try:
+            async with aiohttp.ClientSession() as session:
+                async def get(path, **params):
+                    async with session.get(base + path, params=params) as response:
+                        return response.status, await response.json()
+
+                results = await asyncio.gather(
+                    *(get("/weather/now", location="101010100") for _ in range(20)))
+                assert all(status == 200 and body["now"]["temp"] == "-5"
+                           for status, body in results)
+
+                status, body = await get("/city/lookup", q="北京", number="1")
+                assert body["location"][0]["id"] == "101010100"
+                status, body = await get("/weather/now")
+                assert status == 400
+        finally:
+            await runner.cleanup()
+
+    with MockQWeatherServer() as upstream:
+        asyncio.run(scenario(upstream.url))
+        assert upstream.request_count == 2  # 一次天气、一次城市搜索
+
+
+def test_gateway_is_drop_in_for_existing_clients(static_token):
+    async def scenario(upstream_url):
+        toolkit = AsyncWeatherToolkit(upstream_url, "jwt_token.txt", token_provider=static_token)
+        runner = await start_gateway(toolkit)
+        host, port = runner.addresses[0][:2]
+        client = WeatherToolkit(f"http://{host}:{port}", "jwt_token.txt",
+                                token_provider=static_token)
+        try:
+            # 同步客户端在线程中运行，避免阻塞网关所在的事件循环
+            return await asyncio.to_thread(client.query_weather_by_city, "朝阳")
+        finally:
+            await runner.cleanup()
+
+    with MockQWeatherServer() as upstream:
+        weather = asyncio.run(scenario(upstream.url))
+    assert weather.city["id"] == "101010300"
+    assert weather.temp == -5
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""测试观测历史存储"""
+
+import math
+import os
+import tempfile
+import threading
+from datetime import datetime, timedelta, timezone
+
+from history_store import HistoryStore
+from mock_server import MockQWeatherServer
+from observation import Observation
+from weather_toolkit import WeatherToolkit
+
+START = datetime(2026, 2, 7, 0, 0, tzinfo=timezone(timedelta(hours=8)))
+
+
+def observation(minutes: int, temp: float) -> Observation:
+    return Observation(obs_time=START + timedelta(minutes=minutes), temp=temp, humidity=50)
+
+
+def test_append_dedup_and_range():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = HistoryStore(tmp)
+        assert store.append("101200101", observation(0, -1))
+        assert store.append("101200101", observation(10, 0))
+        assert not store.append("101200101", observation(10, 0))  # 重复的观测时间
+        assert store.append("101200101", observation(20, 2.5))
+
+        data = store.range("101200101", START + timedelta(minutes=5), fields=("temp", "cloud"))
+        assert data["temp"] == [0, 2.5]
+        assert all(math.isnan(v) for v in data["cloud"])
+        assert store.count("101200101") == 3
+        assert store.duplicates == 1
+        store.close()
+
+        # 重新打开后继续去重
+        reopened = HistoryStore(tmp)
+        assert not reopened.append("101200101", observation(20, 2.5))
+        assert reopened.cities() == ["101200101"]
+        reopened.close()
+
+
+
+def test_writers_sharing_a_directory(tmp_path):
+    first, second = HistoryStore(str(tmp_path)), HistoryStore(str(tmp_path))
+    assert first.append("101200101", observation(0, 1))
+    assert second.append("101200101", observation(60, 2))
+    assert not first.append("101200101", observation(30, 3))  # 早于另一个实例写入的观测
+    assert first.out_of_order == 1 and first.duplicates == 0
+    assert first.range("101200101", fields=("temp",))["temp"] == [1, 2]
+
+    def write(store, offset):
+        for minutes in range(offset, 400, 4):
+            store.append("101010100", observation(minutes, minutes))
+
+    writers = [threading.Thread(target=write, args=(store, offset))
+               for offset, store in enumerate([first, second, first, second])]
+    for thread in writers:
+        thread.start()
+    for thread in writers:
+        thread.join()
+    data = first.range("101010100", fields=("temp",))
+    times = data["time"]
+    assert times == sorted(set(times))
+    assert data["temp"] == [(t - START.timestamp()) / 60 for t in times]  # 各列对齐
+    assert len(times) == first.appended + second.appended - 2
+    first.close()
+    second.close()
+
+def test_downsample():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = HistoryStore(tmp)
+        for i in range(12):  # 两小时，每10分钟一条
+            store.append("101010100", observation(i * 10, float(i)))
+
+        hourly = store.downsample("101010100", "temp", 3600)
+        assert [value for _, value in hourly] == [2.5, 8.5]
+        assert hourly[0][0] == int(START.timestamp())
+        assert store.downsample("101010100", "temp", 3600, agg="max")[1][1] == 11
+        store.close()
+
+
+def test_truncated_write_is_recovered():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = HistoryStore(tmp)
+        store.append("101010100", observation(0, 1))
+        store.close()
+        # 模拟写入中途退出：只写了部分数值列
+        with open(os.path.join(tmp, "101010100", "temp"), 'ab') as f:
+            f.write(b"\0" * 8)
+
+        store = HistoryStore(tmp)
+        assert store.append("101010100", observation(10, 2))
+        assert store.range("101010100")["temp"] == [1, 2]
+        store.close()
+
+
+def test_coordinate_locations_and_toolkit_errors(static_token):
+    with tempfile.TemporaryDirectory() as tmp:
+        store = HistoryStore(tmp)
+        assert store.append("116.41,39.92", observation(0, 3))
+        assert store.range("116.41,39.92")["temp"] == [3]
+        assert os.listdir(tmp) == ["116.41%2C39.92"]
+        assert store.cities() == ["116.41,39.92"]
+        store.close()
+
+    class BrokenHistory:
+        def append(self, city_id, observation):
+            raise RuntimeError("磁盘已满")
+
+    with MockQWeatherServer() as server:
+        toolkit = WeatherToolkit(server.url, "jwt_token.txt", token_provider=static_token,
+                                 history=BrokenHistory())
+        # 保存历史失败不影响查询结果
+        assert toolkit.get_weather_now("116.41,39.92").temp == -5
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""测试共享HTTP传输层"""
+
+import http_transport
+from http_transport import HttpTransport, build_url, get_default_transport, set_default_transport
+from mock_server import MockQWeatherServer
+from weather_toolkit import WeatherToolkit
+
+
+def test_build_url():
+    assert build_url("api.qweather.com", "/v7/weather/now") == \
+        "https://api.qweather.com/v7/weather/now"
+    assert build_url("http://127.0.0.1:8080", "/v7/weather/now") == \
+        "http://127.0.0.1:8080/v7/weather/now"
+    assert build_url("https://api.qweather.com/", "/v7/weather/now") == \
+        "https://api.qweather.com/v7/weather/now"
+
+
+def test_connection_reuse():
+    with MockQWeatherServer() as server:
+        transport = HttpTransport()
+        url = build_url(server.url, "/v7/weather/now")
+        for _ in range(5):
+            assert transport.get(url, params={"location": "101010100"}).status_code == 200
+
+        pools = transport.session.get_adapter(url).poolmanager.pools
+        assert [pools[key].num_connections for key in pools.keys()] == [1]  # 共用一条长连接
+        assert server.request_count == 5
+        transport.close()
+
+
+def test_toolkits_share_default_transport(monkeypatch, static_token):
+    monkeypatch.setattr(http_transport, "_default_transport", None)
+    with MockQWeatherServer() as server:
+        first = WeatherToolkit(server.url, "jwt_token.txt", token_provider=static_token)
+        second = WeatherToolkit(server.url, "jwt_token.txt", token_provider=static_token)
+        assert first.transport is second.transport is get_default_transport()
+        assert first.get_weather_now("101010100").temp == -5
+        assert second.search_city("北京", number=1)[0]["id"] == "101010100"
+
+        replacement = HttpTransport(pool_maxsize=4)
+        set_default_transport(replacement)
+        assert WeatherToolkit(server.url, "jwt_token.txt",
+                              token_provider=static_token).transport is replacement
+        first.transport.close()
+        replacement.close()
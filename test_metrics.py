@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""测试运行指标（上游为本地模拟服务）"""
+
+from http_transport import HttpTransport
+from metrics import Metrics
+from mock_server import MockQWeatherServer
+from resilience import RetryPolicy
+from weather_toolkit import WEATHER_PATH, WeatherToolkit
+
+
+def test_metrics_record_upstream_and_stages(static_token):
+    metrics = Metrics()
+    with MockQWeatherServer() as server:
+        server.fail_next(1, status=503)
+        transport = HttpTransport(retry_policy=RetryPolicy(max_attempts=2, base_delay=0.01),
+                                  metrics=metrics)
+        toolkit = WeatherToolkit(server.url, "jwt_token.txt", transport=transport,
+                                 token_provider=static_token, metrics=metrics)
+        metrics.register_cache(toolkit.cache)
+        assert toolkit.get_weather_now("101010100").temp == -5
+        assert toolkit.get_weather_now("101010100").temp == -5
+        transport.close()
+
+    snapshot = metrics.snapshot()
+    endpoint = f'{{endpoint="{WEATHER_PATH}"}}'
+    assert snapshot["counters"]["qweather_upstream_requests_total"][endpoint] == 2
+    responses = snapshot["counters"]["qweather_upstream_responses_total"]
+    assert responses[f'{{endpoint="{WEATHER_PATH}",status="503"}}'] == 1
+    assert responses[f'{{endpoint="{WEATHER_PATH}",status="200"}}'] == 1
+    assert snapshot["counters"]["qweather_cache_hits_total"]['{cache="default"}'] == 1
+    stages = snapshot["histograms"]["qweather_stage_seconds"]
+    assert stages[f'{{endpoint="{WEATHER_PATH}",stage="parse"}}']["count"] == 1
+
+    text = metrics.to_prometheus()
+    assert "# TYPE qweather_upstream_request_seconds histogram" in text
+    assert (f'qweather_upstream_request_seconds_bucket{{endpoint="{WEATHER_PATH}",le="+Inf"}} 2'
+            in text)
+
+
+def test_prometheus_keeps_full_precision():
+    metrics = Metrics()
+    metrics.inc("qweather_upstream_response_bytes_total", 123456789, endpoint=WEATHER_PATH)
+    metrics.observe("qweather_upstream_request_seconds", 1234567.25, endpoint=WEATHER_PATH)
+    text = metrics.to_prometheus()
+    assert (f'qweather_upstream_response_bytes_total{{endpoint="{WEATHER_PATH}"}} 123456789\n'
+            in text)
+    assert (f'qweather_upstream_request_seconds_sum{{endpoint="{WEATHER_PATH}"}} 1234567.25\n'
+            in text)
+
+
+def test_disabled_metrics_record_nothing(static_token):
+    metrics = Metrics(enabled=False)
+    with MockQWeatherServer() as server:
+        transport = HttpTransport(metrics=metrics)
+        toolkit = WeatherToolkit(server.url, "jwt_token.txt", transport=transport,
+                                 token_provider=static_token, metrics=metrics)
+        assert toolkit.get_weather_now("101010100") is not None
+        transport.close()
+    assert metrics.snapshot() == {"counters": {}, "histograms": {}, "gauges": {}}
@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""测试模拟服务的故障注入"""
+
+import requests
+
+from http_transport import HttpTransport
+from mock_server import MockQWeatherServer
+from resilience import RetryPolicy
+from weather_toolkit import WeatherToolkit
+
+
+def test_rate_limit_and_forced_errors():
+    with MockQWeatherServer(rate_limit=3) as server:
+        url = server.url + "/v7/weather/now"
+        statuses = [requests.get(url, timeout=5).status_code for _ in range(5)]
+        assert statuses == [200, 200, 200, 429, 429]
+
+        server.rate_limit = None
+        server.fail_next(2, status=503)
+        statuses = [requests.get(url, timeout=5).status_code for _ in range(3)]
+        assert statuses == [503, 503, 200]
+        assert server.status_counts == {200: 4, 429: 2, 503: 2}
+
+
+def test_toolkit_retries_injected_errors(static_token):
+    with MockQWeatherServer(latency=0.01) as server:
+        server.fail_next(2, status=500)
+        transport = HttpTransport(retry_policy=RetryPolicy(max_attempts=3, base_delay=0.01))
+        toolkit = WeatherToolkit(server.url, "jwt_token.txt", transport=transport,
+                                 token_provider=static_token)
+        assert toolkit.get_weather_now("101010100").temp == -5
+        assert server.request_count == 3
+        transport.close()
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""测试实时天气观测数据模型"""
+
+import os
+import tempfile
+
+from disk_cache import SQLiteCache
+from mock_server import load_fixtures
+from observation import Observation
+
+_, WEATHER = load_fixtures()
+
+
+def test_parse_and_round_trip():
+    observation = Observation.from_response(WEATHER)
+    assert observation.temp == -5
+    assert observation.precip == 0.0
+    assert observation.wind_dir == "东北风"
+    assert observation.obs_time.isoformat() == "2026-02-07T22:40:00+08:00"
+
+    data = observation.to_dict()
+    assert data["now"] == WEATHER["now"]
+    assert data["updateTime"] == WEATHER["updateTime"]
+    assert Observation.from_response(data) == observation
+
+
+def test_replace_keeps_original():
+    observation = Observation.from_response(WEATHER)
+    stale = observation.replace(stale=True, age=42)
+    assert stale.stale and stale.age == 42
+    assert not observation.stale
+    assert stale.temp == observation.temp
+
+
+def test_sqlite_cache_stores_observation():
+    observation = Observation.from_response(WEATHER)
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = SQLiteCache(os.path.join(tmp, "cache.sqlite3"))
+        cache.set("weather", "101010100", observation)
+        assert cache.get("weather", "101010100") == observation
+        cache.close()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""测试流式结果输出"""
+
+import gzip
+import json
+import os
+import tempfile
+
+from mock_server import MockQWeatherServer
+from output_sink import NDJSONSink, open_sink
+from weather_toolkit import WeatherToolkit
+
+
+def read_lines(path):
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def test_gzip_blocks_and_rotation():
+    with tempfile.TemporaryDirectory() as tmp:
+        sink = NDJSONSink(os.path.join(tmp, "weather.ndjson.gz"), compression="gzip",
+                          buffer_size=1, max_bytes=1)
+        for i in range(3):
+            sink.write({"id": str(i)})
+        sink.close()
+
+        assert len(sink.files) == 3
+        assert [read_lines(path)[0]["id"] for path in sink.files] == ["0", "1", "2"]
+
+
+def test_buffered_writes_are_appended():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "weather.ndjson.gz")
+        for batch in range(2):
+            with open_sink(path, flush_interval=60) as sink:
+                for i in range(100):
+                    sink.write({"batch": batch, "i": i})
+                assert sink.stats()["bytes_written"] == 0  # 仍在缓冲区
+        records = read_lines(path)
+        assert len(records) == 200
+        assert records[-1] == {"batch": 1, "i": 99}
+
+
+def test_stream_weather(static_token):
+    with tempfile.TemporaryDirectory() as tmp, MockQWeatherServer() as server:
+        toolkit = WeatherToolkit(server.url, "jwt_token.txt", token_provider=static_token)
+        path = os.path.join(tmp, "weather.ndjson")
+        ids = (str(101010100 + i) for i in range(50))
+        with open_sink(path) as sink:
+            stats = toolkit.stream_weather(ids, sink, max_workers=4)
+
+        assert stats == {"written": 50, "errors": 0}
+        records = read_lines(path)
+        assert sorted(r["id"] for r in records) == sorted(str(101010100 + i) for i in range(50))
+        assert records[0]["data"]["now"]["temp"] == "-5"
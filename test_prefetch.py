@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""测试热门城市预取调度"""
+
+from cache import LRUCache
+from observation import Observation, parse_time
+from prefetch import PrefetchScheduler
+
+
+class StubToolkit:
+    """只实现预取用到的接口，obs_time 为每次刷新返回的观测时间"""
+
+    def __init__(self):
+        self.cache = LRUCache()
+        self.prefetcher = None
+        self.refreshed = []
+        self.obs_time = "2026-02-07T22:40+08:00"
+
+    def fetch(self, city_id):
+        observation = Observation(obs_time=parse_time(self.obs_time))
+        self.prefetcher.record_fetch(city_id, observation)
+        return observation
+
+    def refresh_weather_now(self, city_id):
+        self.refreshed.append(city_id)
+        return self.fetch(city_id)
+
+
+def test_refreshes_hottest_before_expiry_within_budget(fake_clock):
+    fake_clock.now = 1000.0
+    toolkit = StubToolkit()
+    scheduler = PrefetchScheduler(toolkit, top_n=2, budget=1, lead_time=30, clock=fake_clock)
+    for city_id, hits in (("a", 5), ("b", 3), ("c", 1)):
+        for _ in range(hits):
+            scheduler.record_access(city_id)
+        toolkit.fetch(city_id)
+
+    fake_clock.now += 200
+    assert scheduler.tick() == 0
+
+    fake_clock.now += 80  # 距过期（300秒）不足30秒
+    assert scheduler.tick() == 1
+    assert toolkit.refreshed == ["a"]           # 预算只够最热门的一个
+    assert scheduler.stats()["deferred"] == 1   # b 被推迟，c 不在前2名
+
+    fake_clock.now += 60                        # 新的预算周期
+    scheduler.tick()
+    assert toolkit.refreshed == ["a", "b"]
+
+
+def test_refresh_follows_observation_cadence(fake_clock):
+    fake_clock.now = parse_time("2026-02-07T22:40+08:00").timestamp()
+    toolkit = StubToolkit()
+    scheduler = PrefetchScheduler(toolkit, clock=fake_clock)
+    scheduler.record_access("a")
+    toolkit.fetch("a")
+    toolkit.obs_time = "2026-02-07T22:42+08:00"
+    fake_clock.now += 120
+    toolkit.fetch("a")
+
+    # 观测间隔2分钟，下一次观测约在 22:44 发布，早于缓存过期前30秒
+    assert scheduler.next_refresh("a") == fake_clock.now + 120 + 60
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""测试客户端限流"""
+
+import threading
+import time
+
+import pytest
+
+from rate_limiter import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, QuotaExceeded, RateLimiter
+
+
+def wait_until(condition, timeout: float = 5.0):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, "等待超时"
+        time.sleep(0.01)
+
+
+def test_interactive_ahead_of_background(fake_clock):
+    # rate=10：等待者每 0.1 秒（真实时间）检查一次时钟
+    limiter = RateLimiter(rate=10, burst=1, clock=fake_clock)
+    assert limiter.acquire() == 0
+    granted = []
+
+    def request(priority):
+        limiter.acquire(priority)
+        granted.append(priority)
+
+    def queue_depth(lane):
+        return limiter.stats()["lanes"][lane]["queue_depth"]
+
+    background = threading.Thread(target=request, args=(PRIORITY_BACKGROUND,))
+    background.start()
+    wait_until(lambda: queue_depth("background") == 1)
+    interactive = threading.Thread(target=request, args=(PRIORITY_INTERACTIVE,))
+    interactive.start()
+    wait_until(lambda: queue_depth("interactive") == 1)
+
+    fake_clock.advance(0.1)  # 补充一个令牌：后到的交互请求先获得许可
+    wait_until(lambda: granted == [PRIORITY_INTERACTIVE])
+    fake_clock.advance(0.1)
+    wait_until(lambda: len(granted) == 2)
+    background.join()
+    interactive.join()
+    assert granted == [PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND]
+
+    lanes = limiter.stats()["lanes"]
+    assert lanes["interactive"]["granted"] == 2 and lanes["background"]["granted"] == 1
+    assert lanes["interactive"]["avg_wait"] == pytest.approx(0.05)  # 0 和 0.1
+    assert lanes["interactive"]["max_wait"] == pytest.approx(0.1)
+    assert lanes["background"]["max_wait"] == pytest.approx(0.2)
+    assert lanes["background"]["queue_depth"] == 0
+
+
+def test_daily_quota_and_background_reserve(fake_clock):
+    day = ["2026-02-07"]
+    limiter = RateLimiter(rate=100, burst=100, daily_limit=3, background_reserve=1,
+                          clock=fake_clock, day=lambda: day[0])
+    limiter.acquire(PRIORITY_BACKGROUND)
+    limiter.acquire(PRIORITY_INTERACTIVE)
+    # 剩余1次：保留给交互请求
+    with pytest.raises(QuotaExceeded):
+        limiter.acquire(PRIORITY_BACKGROUND)
+    limiter.acquire(PRIORITY_INTERACTIVE)
+    with pytest.raises(QuotaExceeded):
+        limiter.acquire(PRIORITY_INTERACTIVE)
+    stats = limiter.stats()
+    assert (stats["daily_used"], stats["daily_remaining"], stats["rejected"]) == (3, 0, 2)
+
+    day[0] = "2026-02-08"  # 日期变化：额度清零
+    limiter.acquire(PRIORITY_BACKGROUND)
+    assert limiter.stats()["daily_used"] == 1
+    assert limiter.stats()["daily_remaining"] == 2
+
+
+def test_try_acquire_does_not_block(fake_clock):
+    limiter = RateLimiter(rate=10, burst=1, clock=fake_clock)
+    assert limiter.try_acquire() == 0
+    assert limiter.try_acquire() == pytest.approx(0.1)
+    fake_clock.advance(0.1)
+    assert limiter.try_acquire(waited=0.1) == 0
+    assert limiter.stats()["lanes"]["interactive"]["max_wait"] == pytest.approx(0.1)
+
+    # 排队的后台请求先于之后的后台轮询，交互请求不受影响
+    waiter = threading.Thread(target=limiter.acquire, args=(PRIORITY_BACKGROUND,))
+    waiter.start()
+    wait_until(lambda: limiter.stats()["lanes"]["background"]["queue_depth"] == 1)
+    fake_clock.advance(0.1)
+    with limiter._cond:  # 在等待者醒来之前检查
+        assert limiter.try_acquire(PRIORITY_BACKGROUND) > 0
+        assert limiter.try_acquire(PRIORITY_INTERACTIVE) == 0
+    fake_clock.advance(0.1)
+    waiter.join()
+    assert limiter.stats()["lanes"]["background"]["granted"] == 1
+
+
+def test_rate_must_be_positive():
+    for rate in (0, -1):
+        with pytest.raises(ValueError):
+            RateLimiter(rate=rate)
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""测试结果渲染"""
+
+import csv
+import io
+import json
+
+import renderer
+from observation import Observation
+from renderer import TableRenderer, render, weather_card, weather_row
+
+CITIES = [
+    {"name": "北京", "id": "101010100", "adm1": "北京市", "country": "中国",
+     "lat": "39.90", "lon": "116.40", "rank": "10", "fxLink": "https://example.com"},
+    {"name": "Paris", "id": "2988507", "adm1": "Ile-de-France", "country": "France",
+     "lat": "48.85", "lon": "2.35", "rank": "10"},
+]
+
+
+def test_formats_and_column_selection(monkeypatch):
+    table = io.StringIO()
+    assert render(CITIES, table, columns=("no", "name", "id"), chunk_rows=1) == 2
+    # 中文按两列宽度对齐，各行的城市ID在同一列
+    assert table.getvalue().splitlines() == [
+        "序号 名称       城市ID",
+        "---- ---------- -----------",
+        "1    北京       101010100",
+        "2    Paris      2988507",
+    ]
+
+    out = io.StringIO()
+    render(CITIES, out, fmt="csv", columns=("name", "lat"))
+    assert list(csv.reader(io.StringIO(out.getvalue()))) == [
+        ["name", "lat"], ["北京", "39.90"], ["Paris", "48.85"]]
+
+    for backend in (renderer.orjson, None):  # 安装与未安装 orjson
+        monkeypatch.setattr(renderer, "orjson", backend)
+        out = io.StringIO()
+        render(CITIES, out, fmt="json", columns=("no", "id"), chunk_rows=1)
+        assert json.loads(out.getvalue()) == [{"no": 1, "id": "101010100"},
+                                              {"no": 2, "id": "2988507"}]
+
+    out = io.StringIO()
+    with TableRenderer(out, fmt="ndjson", columns=("id", "error")) as writer:
+        assert out.getvalue() == ""  # 缓冲到 chunk_rows 或 close 时才写出
+        writer.write_many(CITIES)
+    assert [json.loads(line) for line in out.getvalue().splitlines()][1] == {
+        "id": "2988507", "error": None}
+
+
+def test_weather_row_and_card():
+    with open("weather.json", "r", encoding="utf-8") as f:
+        weather = Observation.from_response(json.load(f))
+
+    row = weather_row(weather, CITIES[0])
+    assert row["name"] == "北京" and row["temp"] == weather.temp
+    assert row["obs_time"] == weather.obs_time.isoformat(timespec="minutes")
+    assert weather_row(None, CITIES[0], "未找到城市")["error"] == "未找到城市"
+
+    card = weather_card(weather, CITIES[0])
+    assert "北京 实时天气" in card and "ID: 101010100" in card
+    assert f"温度: {weather.temp}°C" in card
+    assert "城市信息" not in weather_card(weather, {"name": "北京"})
+    assert weather_card(None) == "未获取到天气数据"
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""测试重试策略与熔断器"""
+
+import pytest
+import requests
+
+from http_transport import HttpTransport
+from mock_server import MockQWeatherServer
+from rate_limiter import QuotaExceeded
+from resilience import (STATE_CLOSED, STATE_HALF_OPEN, STATE_OPEN, CircuitBreaker,
+                        CircuitBreakerRegistry, CircuitOpenError, RetryPolicy)
+
+
+def test_retry_delay_and_breaker_recovery(fake_clock):
+    policy = RetryPolicy(max_attempts=3, base_delay=0.5, max_delay=2.0)
+    assert all(0 <= policy.delay(attempt) <= min(2.0, 0.5 * 2 ** attempt)
+               for attempt in range(6) for _ in range(20))
+    assert policy.delay(0, retry_after="1.5") == 1.5
+    assert policy.delay(0, retry_after="60") == 2.0  # 不超过上限
+    assert RetryPolicy(max_attempts=0).max_attempts == 1
+
+    breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=10, clock=fake_clock)
+    breaker.record_failure()
+    assert breaker.state == STATE_CLOSED
+    breaker.record_failure()
+    assert breaker.state == STATE_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    fake_clock.advance(10)
+    assert breaker.state == STATE_HALF_OPEN
+    breaker.before_call()  # 占用唯一的探测名额
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.release()      # 探测被中断：归还名额
+    breaker.before_call()
+    breaker.record_failure()  # 探测失败：重新打开
+    assert breaker.state == STATE_OPEN
+
+    fake_clock.advance(10)
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == STATE_CLOSED
+    assert breaker.opened == 2 and breaker.rejected == 2
+
+
+class FlakyLimiter:
+    """前 failures 次 acquire 抛出 QuotaExceeded"""
+
+    def __init__(self, failures: int):
+        self.failures = failures
+
+    def acquire(self, priority):
+        if self.failures > 0:
+            self.failures -= 1
+            raise QuotaExceeded("当日额度已用完")
+
+
+def test_transport_releases_probe_on_interrupted_call(monkeypatch):
+    with MockQWeatherServer() as server:
+        url = server.url + "/v7/weather/now"
+        breakers = CircuitBreakerRegistry(failure_threshold=1, recovery_timeout=0)
+        transport = HttpTransport(retry_policy=RetryPolicy(max_attempts=1), breakers=breakers)
+        breaker = breakers.get("/v7/weather/now")
+
+        server.fail_next(1, status=503)
+        assert transport.get(url).status_code == 503
+        assert breaker.state == STATE_HALF_OPEN  # recovery_timeout=0，立即半开
+
+        # 半开探测时限流失败、请求抛出其他异常，都不应占住探测名额
+        transport.rate_limiter = FlakyLimiter(1)
+        with pytest.raises(QuotaExceeded):
+            transport.get(url)
+
+        def broken(*args, **kwargs):
+            raise requests.exceptions.ChunkedEncodingError("连接中断")
+        monkeypatch.setattr(transport.session, "get", broken)
+        with pytest.raises(requests.exceptions.ChunkedEncodingError):
+            transport.get(url)
+        monkeypatch.undo()
+
+        assert transport.get(url).status_code == 200
+        assert breaker.state == STATE_CLOSED
+        transport.close()
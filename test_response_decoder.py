@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+"""测试接口响应解码"""
+
+import json
+
+import response_decoder
+from benchmark import decoding_payloads
+from response_decoder import LOCATION_FIELDS, decode_locations, decode_weather_now
+
+
+def test_decode_projects_locations_and_observation(monkeypatch):
+    lookup, now = decoding_payloads()
+    for backend in (response_decoder.orjson, None):
+        monkeypatch.setattr(response_decoder, "orjson", backend)
+        code, locations = decode_locations(lookup)
+        assert code == "200" and len(locations) == 20
+        assert set(locations[0]) == set(LOCATION_FIELDS)  # 去掉了 fxLink、tz 等
+        assert locations[0]["name"] == "北京"
+
+        code, observation = decode_weather_now(now)
+        assert code == "200" and observation.temp == -5
+
+    body = json.dumps({"code": "200", "location": [{"id": "1", "name": "甲"}]})
+    assert decode_locations(body)[1] == [{"id": "1", "name": "甲"}]  # 缺少的字段跳过
+    assert decode_weather_now(b'{"code": "404"}') == ("404", None)
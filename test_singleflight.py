@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""测试相同请求合并"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from singleflight import AsyncSingleFlight, SingleFlight
+
+
+def test_threads_share_result_and_error():
+    flight = SingleFlight()
+    executions = []
+    results = []
+    errors = []
+
+    def fetch(fail):
+        executions.append(fail)
+        time.sleep(0.2)  # 其余线程在此期间到达
+        if fail:
+            raise ValueError("上游错误")
+        return "晴"
+
+    def caller(key, fail):
+        try:
+            results.append(flight.do(key, fetch, fail))
+        except ValueError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=caller, args=(key, key == "bad"))
+               for key in ("ok", "bad") for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(executions) == [False, True]
+    assert results == ["晴"] * 5
+    assert len(errors) == 5 and len(set(map(id, errors))) == 1  # 同一个异常传给所有等待者
+    assert flight.stats() == {"calls": 10, "executions": 2, "collapsed": 8, "in_flight": 0}
+
+
+def test_cancelled_caller_does_not_cancel_others():
+    async def scenario():
+        flight = AsyncSingleFlight()
+        executions = []
+
+        async def fetch():
+            executions.append(1)
+            await asyncio.sleep(0.05)
+            return "晴"
+
+        async def impatient():
+            return await asyncio.wait_for(flight.do("k", fetch), timeout=0.01)
+
+        leader = asyncio.ensure_future(impatient())
+        await asyncio.sleep(0)
+        followers = [flight.do("k", fetch) for _ in range(3)]
+        results = await asyncio.gather(*followers)
+        with pytest.raises(asyncio.TimeoutError):
+            await leader
+        assert results == ["晴"] * 3 and executions == [1]
+
+        # 所有调用方都放弃时取消上游请求，之后的调用重新执行
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(flight.do("k", fetch), timeout=0.01)
+        assert flight.stats()["in_flight"] == 0
+        assert await flight.do("k", fetch) == "晴" and len(executions) == 3
+
+    asyncio.run(scenario())
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""测试最近城市空间索引"""
+
+import math
+import random
+
+import pytest
+
+import spatial_index
+from spatial_index import SpatialIndex, haversine_km
+
+
+def brute_force(cities, lat, lon, k):
+    """逐个计算所有城市的投影距离（与索引的排序依据相同）"""
+    scale = max(math.cos(math.radians(lat)), 1e-6)
+
+    def dist2(city):
+        dy = float(city["lat"]) - lat
+        dx = (float(city["lon"]) - lon) * scale
+        return dy * dy + dx * dx
+    return [city["id"] for city in sorted(cities, key=dist2)[:k]]
+
+
+@pytest.mark.parametrize("use_numpy", [True, False])
+def test_nearest_matches_brute_force(monkeypatch, use_numpy):
+    if use_numpy:
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(spatial_index, "np", None)
+    rng = random.Random(7)
+    cities = [{"id": str(101000000 + i), "lat": f"{rng.uniform(18, 53):.4f}",
+               "lon": f"{rng.uniform(73, 135):.4f}"} for i in range(500)]
+    index = SpatialIndex(cities + [{"id": "bad", "lat": "?"}], cell_size=2.0)
+    assert len(index) == 500
+
+    # 包含落在稀疏区域和索引范围之外的坐标
+    coords = [(rng.uniform(10, 60), rng.uniform(65, 145)) for _ in range(200)]
+    for k in (1, 3, 8):
+        batch = index.nearest_many(coords, k=k)
+        for (lat, lon), found in zip(coords, batch):
+            expected = brute_force(cities, lat, lon, k)
+            assert [city_id for city_id, _ in found] == expected
+            single = index.nearest(lat, lon, k)
+            assert [city_id for city_id, _ in single] == expected
+            assert [km for _, km in found] == pytest.approx([km for _, km in single])
+            city = index.get(found[0][0])
+            assert found[0][1] == pytest.approx(
+                haversine_km(lat, lon, float(city["lat"]), float(city["lon"])))
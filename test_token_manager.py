@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""测试令牌签发与缓存"""
+
+import threading
+import time
+
+import jwt
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+
+import token_manager
+from token_manager import (FILE_RECHECK_INTERVAL, FileTokenProvider, TokenProvider,
+                           sign_jwt_token, token_expiry)
+
+
+@pytest.fixture
+def key_pair(tmp_path):
+    """临时生成的 Ed25519 密钥（仓库中的 ed25519-private.pem 只是占位文件）"""
+    private_key = Ed25519PrivateKey.generate()
+    path = tmp_path / "ed25519-private.pem"
+    path.write_bytes(private_key.private_bytes(serialization.Encoding.PEM,
+                                               serialization.PrivateFormat.PKCS8,
+                                               serialization.NoEncryption()))
+    return str(path), private_key.public_key()
+
+
+def test_token_provider_expiry_and_single_refresh(key_pair, monkeypatch, fake_clock):
+    private_key_path, public_key = key_pair
+    fake_clock.now = time.time()
+    provider = TokenProvider(private_key_path, "project", "kid", expiry_minutes=15,
+                             background=False, clock=fake_clock)
+    token = provider.get_token()
+    payload = jwt.decode(token, public_key, algorithms=["EdDSA"])
+    assert payload["sub"] == "project" and token_expiry(token) == payload["exp"]
+    assert jwt.get_unverified_header(token)["kid"] == "kid"
+    assert provider.get_token() is token and provider.refresh_count == 1  # 命中内存缓存
+
+    # 过期后并发调用：只签发一次
+    fake_clock.advance(15 * 60)
+    sign = token_manager.sign_jwt_token
+
+    def slow_sign(*args, **kwargs):
+        time.sleep(0.05)
+        return sign(*args, **kwargs)
+    monkeypatch.setattr(token_manager, "sign_jwt_token", slow_sign)
+    tokens = []
+    threads = [threading.Thread(target=lambda: tokens.append(provider.get_token()))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert provider.refresh_count == 2
+    assert len(set(tokens)) == 1 and tokens[0] != token
+
+
+def test_background_refresh(key_pair):
+    # 有效期1分钟、提前60秒续签：后台线程约1秒后续签
+    provider = TokenProvider(key_pair[0], "project", "kid", expiry_minutes=1,
+                             refresh_margin=60)
+    deadline = time.time() + 5
+    while provider.refresh_count < 2 and time.time() < deadline:
+        time.sleep(0.05)
+    provider.stop()
+    assert provider.refresh_count >= 2
+
+
+def test_file_token_provider_reload(key_pair, tmp_path, fake_clock):
+    fake_clock.now = time.time()
+    private_key = token_manager.load_private_key(key_pair[0])
+    first = sign_jwt_token(private_key, "project", "kid", expiry_minutes=15, now=int(fake_clock()))
+    path = str(tmp_path / "jwt_token.txt")
+    with open(path, "w") as f:
+        f.write(first + "\n")
+    provider = FileTokenProvider(path, clock=fake_clock)
+    assert provider.get_token() == first
+
+    second = sign_jwt_token(private_key, "project", "kid", expiry_minutes=15,
+                            now=int(fake_clock()) + 900)
+    with open(path, "w") as f:
+        f.write(second)
+    assert provider.get_token() == first   # 未过期：不重新读取文件
+    fake_clock.advance(15 * 60)
+    assert provider.get_token() == second  # 过期后重新读取
+
+    # 无法解析的令牌：按固定间隔重新检查文件
+    with open(path, "w") as f:
+        f.write("not-a-jwt")
+    fake_clock.advance(15 * 60)
+    assert provider.get_token() == "not-a-jwt"
+    with open(path, "w") as f:
+        f.write(first)
+    fake_clock.advance(FILE_RECHECK_INTERVAL - 1)
+    assert provider.get_token() == "not-a-jwt"
+    fake_clock.advance(1)
+    assert provider.get_token() == first
+
+    assert token_expiry("not-a-jwt") is None
+    assert token_expiry("a.!!!.c") is None
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""测试链路追踪（上游为本地模拟服务）"""
+
+import os
+import tempfile
+
+from cache import LRUCache
+from mock_server import MockQWeatherServer
+from tracing import JSONLExporter, Tracer, summarize
+from weather_query import WeatherQuery
+from weather_toolkit import WeatherToolkit
+
+
+class ListExporter:
+    def __init__(self):
+        self.spans = []
+
+    def export(self, span):
+        self.spans.append(span.to_dict())
+
+
+def test_query_chain_spans_are_nested_and_exported(static_token):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "traces.ndjson")
+        tracer = Tracer(JSONLExporter(path))
+        with MockQWeatherServer() as server:
+            querier = WeatherQuery(server.url, "jwt_token.txt", token_provider=static_token,
+                                   cache=LRUCache(), tracer=tracer)
+            results = []
+            for _ in range(2):
+                weather = querier.query_weather_by_city("北京")
+                querier.format_weather_result(weather)
+                results.append(weather)
+        tracer.close()
+        assert results[0] == results[1]  # 未命中与命中缓存返回同样格式的字典
+
+        rows = {row["name"]: row for row in summarize(path)}
+        assert rows["query_weather_by_city"]["count"] == 2
+        assert rows["request"]["count"] == 2  # 第二次两步都命中缓存
+        assert rows["format"]["count"] == 2
+
+    exporter = ListExporter()
+    with MockQWeatherServer() as server:
+        toolkit = WeatherToolkit(server.url, "jwt_token.txt", token_provider=static_token,
+                                 tracer=Tracer(exporter))
+        toolkit.query_weather_by_city("北京")
+    spans = {span["name"]: span for span in exporter.spans}
+    root = spans["query_weather_by_city"]
+    assert root["parent_id"] is None
+    assert spans["resolve"]["parent_id"] == root["span_id"]
+    assert spans["fetch"]["parent_id"] == root["span_id"]
+    assert spans["fetch"]["attributes"]["cache_hit"] is False
+    assert spans["parse"]["parent_id"] == spans["fetch"]["span_id"]
+    assert {span["trace_id"] for span in exporter.spans} == {root["trace_id"]}
+
+
+def test_sampling_is_decided_per_trace():
+    exporter = ListExporter()
+    draws = iter([0.9, 0.1])
+    tracer = Tracer(exporter, sample_rate=0.5, rng=lambda: next(draws))
+
+    for _ in range(2):
+        with tracer.span("root"):
+            with tracer.span("child") as child:
+                child.set("cache_hit", True)
+
+    assert [span["name"] for span in exporter.spans] == ["child", "root"]
+    assert exporter.spans[0]["attributes"] == {"cache_hit": True}
+
+    tracer.disable()
+    with tracer.span("root"):
+        pass
+    assert len(exporter.spans) == 2
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""测试天气工具箱的批量查询和过期数据策略"""
+
+import time
+
+from cache import LRUCache
+from http_transport import HttpTransport
+from mock_server import MockQWeatherServer
+from resilience import NO_RETRY
+from weather_toolkit import WeatherToolkit
+
+
+def make_toolkit(server, token, **kwargs):
+    transport = HttpTransport(retry_policy=NO_RETRY)
+    return WeatherToolkit(server.url, "jwt_token.txt", transport=transport,
+                          token_provider=token, **kwargs)
+
+
+def test_get_weather_many_dedup_and_order(static_token):
+    with MockQWeatherServer() as server:
+        toolkit = make_toolkit(server, static_token)
+        results = toolkit.get_weather_many(["101020100", "101010100", "101020100", "101280101"])
+
+        assert list(results) == ["101020100", "101010100", "101280101"]
+        assert all(r["error"] is None and r["data"].temp == -5 for r in results.values())
+        assert server.request_count == 3
+        toolkit.transport.close()
+
+
+def test_get_weather_many_uses_cache(static_token):
+    with MockQWeatherServer() as server:
+        cache = LRUCache()
+        toolkit = make_toolkit(server, static_token, cache=cache)
+        toolkit.get_weather_now("101010100")
+        assert server.request_count == 1
+
+        results = toolkit.get_weather_many(["101010100", "101020100"])
+        assert results["101010100"]["data"] is cache.get("weather", "101010100")
+        assert results["101020100"]["error"] is None
+        assert server.request_count == 2
+        toolkit.transport.close()
+
+
+def test_get_weather_many_per_city_errors(static_token):
+    with MockQWeatherServer() as server:
+        weather = server.weather
+        server.weather_now = lambda params: (
+            {"code": "400"} if params["location"] == "bad" else weather)
+        toolkit = make_toolkit(server, static_token)
+        results = toolkit.get_weather_many(["101010100", "bad", "101020100"])
+
+        assert list(results) == ["101010100", "bad", "101020100"]
+        assert results["bad"] == {"data": None, "error": "API错误: 400"}
+        assert results["101010100"]["data"].temp == -5
+        assert results["101020100"]["data"].temp == -5
+        toolkit.transport.close()
+
+
+def test_get_weather_many_batch_timeout(static_token):
+    with MockQWeatherServer() as server:
+        toolkit = make_toolkit(server, static_token)
+        toolkit.get_weather_now("101010100")
+
+        server.latency = 0.5
+        results = toolkit.get_weather_many(["101020100", "101010100", "101280101"],
+                                           timeout=0.1)
+        assert list(results) == ["101020100", "101010100", "101280101"]
+        assert results["101010100"]["data"].temp == -5
+        assert results["101020100"] == {"data": None, "error": "超时"}
+        assert results["101280101"] == {"data": None, "error": "超时"}
+        toolkit.transport.close()
+
+
+def wait_until(condition, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_stale_while_revalidate(fake_clock, static_token):
+    with MockQWeatherServer() as server:
+        cache = LRUCache(clock=fake_clock)
+        toolkit = make_toolkit(server, static_token, cache=cache, stale_while_revalidate=60)
+        assert toolkit.get_weather_now("101010100").stale is False
+
+        fake_clock.advance(320)
+        server.latency = 0.2
+        for _ in range(5):
+            weather = toolkit.get_weather_now("101010100")
+            assert weather.stale is True
+            assert weather.age == 320
+
+        wait_until(lambda: cache.get("weather", "101010100") is not None)
+        assert server.request_count == 2  # 同一城市只有一次后台刷新
+        assert toolkit.get_weather_now("101010100").stale is False
+
+
+def test_stale_while_revalidate_window_ends(fake_clock, static_token):
+    with MockQWeatherServer() as server:
+        toolkit = make_toolkit(server, static_token, cache=LRUCache(clock=fake_clock),
+                               stale_while_revalidate=60)
+        toolkit.get_weather_now("101010100")
+
+        fake_clock.advance(361)
+        assert toolkit.get_weather_now("101010100").stale is False  # 超过窗口，同步请求
+        assert server.request_count == 2
+
+
+def test_stale_if_error(fake_clock, static_token):
+    with MockQWeatherServer() as server:
+        toolkit = make_toolkit(server, static_token, cache=LRUCache(clock=fake_clock),
+                               stale_if_error=60)
+        toolkit.get_weather_now("101010100")
+
+        fake_clock.advance(330)
+        server.fail_next(1, status=500)
+        weather = toolkit.get_weather_now("101010100")
+        assert weather.stale is True
+        assert weather.age == 330
+
+        fake_clock.advance(31)
+        server.fail_next(1, status=500)
+        assert toolkit.get_weather_now("101010100") is None
+        assert server.request_count == 3
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+和风天气JWT令牌管理
+在内存中缓存令牌，并在过期前后台自动续签
+"""
+
+import base64
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+import jwt
+from cryptography.hazmat.primitives import serialization
+
+DEFAULT_EXPIRY_MINUTES = 15
+DEFAULT_REFRESH_MARGIN = 60     # 提前多少秒续签
+FILE_RECHECK_INTERVAL = 30      # 文件令牌过期后，重新读取文件的最小间隔（秒）
+
+
+def load_private_key(private_key_path: str):
+    """读取并解析Ed25519私钥（只需解析一次）"""
+    if not Path(private_key_path).exists():
+        raise FileNotFoundError(f"私钥文件不存在: {private_key_path}")
+    with open(private_key_path, 'rb') as f:
+        return serialization.load_pem_private_key(f.read(), password=None)
+
+
+def sign_jwt_token(private_key, project_id: str, key_id: str,
+                   expiry_minutes: int = DEFAULT_EXPIRY_MINUTES,
+                   now: Optional[int] = None) -> str:
+    """
+    签发JWT令牌
+
+    :param private_key: 私钥（PEM字符串或已解析的私钥对象）
+    :param project_id: 项目ID
+    :param key_id: 凭据ID
+    :param expiry_minutes: 过期时间（分钟）
+    :param now: 当前时间戳，默认取系统时间
+    :return: 令牌字符串
+    """
+    current_time = int(time.time()) if now is None else now
+    headers = {"alg": "EdDSA", "kid": key_id}
+    payload = {
+        "sub": project_id,
+        "iat": current_time - 30,   # 签发时间（当前时间前30秒）
+        "exp": current_time + expiry_minutes * 60
+    }
+    return jwt.encode(payload, private_key, algorithm="EdDSA", headers=headers)
+
+
+def token_expiry(token: str) -> Optional[int]:
+    """读取令牌中的 exp 字段（不校验签名），无法解析时返回 None"""
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        exp = json.loads(base64.urlsafe_b64decode(payload)).get("exp")
+        return int(exp) if exp is not None else None
+    except (IndexError, ValueError, TypeError):
+        return None
+
+
+class TokenProvider:
+    """进程内签发令牌，内存缓存，过期前后台续签"""
+
+    def __init__(self, private_key_path: str, project_id: str, key_id: str,
+                 expiry_minutes: int = DEFAULT_EXPIRY_MINUTES,
+                 refresh_margin: int = DEFAULT_REFRESH_MARGIN,
+                 background: bool = True,
+                 clock: Callable[[], float] = time.time):
+        """
+        :param private_key_path: 私钥文件路径
+        :param project_id: 项目ID
+        :param key_id: 凭据ID
+        :param expiry_minutes: 令牌有效期（分钟）
+        :param refresh_margin: 提前续签的秒数
+        :param background: 是否启动后台续签线程
+        :param clock: 时钟函数（便于测试）
+        """
+        self.private_key = load_private_key(private_key_path)
+        self.project_id = project_id
+        self.key_id = key_id
+        self.expiry_minutes = expiry_minutes
+        self.refresh_margin = refresh_margin
+        self.clock = clock
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._token = None
+        self._expires_at = 0
+        self.refresh_count = 0
+
+        self.refresh()
+        self._thread = None
+        if background:
+            self._thread = threading.Thread(target=self._refresh_loop, daemon=True)
+            self._thread.start()
+
+    def refresh(self) -> str:
+        """立即签发新令牌并替换缓存"""
+        with self._lock:
+            return self._sign()
+
+    def _sign(self) -> str:
+        # 调用方持有 self._lock
+        now = int(self.clock())
+        token = sign_jwt_token(self.private_key, self.project_id, self.key_id,
+                               self.expiry_minutes, now=now)
+        # 先写令牌再写过期时间，读方无需加锁
+        self._token = token
+        self._expires_at = now + self.expiry_minutes * 60
+        self.refresh_count += 1
+        return token
+
+    def get_token(self) -> str:
+        """获取当前令牌（热路径只读内存，不加锁、不做IO）"""
+        if self.clock() >= self._expires_at:
+            # 后台线程未及时续签（如进程刚从休眠中恢复），同步补签一次；
+            # 并发的调用方拿到锁后先检查是否已被其他线程续签，只签发一次
+            with self._lock:
+                if self.clock() >= self._expires_at:
+                    return self._sign()
+        return self._token
+
+    def _refresh_loop(self):
+        while True:
+            delay = self._expires_at - self.refresh_margin - self.clock()
+            if self._stop.wait(max(delay, 1)):
+                break
+            if self.clock() >= self._expires_at - self.refresh_margin:
+                try:
+                    self.refresh()
+                except Exception as e:
+                    print(f"令牌续签失败: {e}")
+
+    def stop(self):
+        """停止后台续签线程"""
+        self._stop.set()
+
+
+class FileTokenProvider:
+    """从文件读取令牌并缓存在内存中，令牌过期后才重新读取文件"""
+
+    def __init__(self, jwt_token_file: str, clock: Callable[[], float] = time.time):
+        """
+        :param jwt_token_file: 令牌文件路径
+        :param clock: 时钟函数（便于测试）
+        """
+        self.jwt_token_file = jwt_token_file
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._token = None
+        self._reload_at = 0.0
+
+    def get_token(self) -> str:
+        """获取令牌（命中缓存时不做IO）"""
+        if self._token is None or self.clock() >= self._reload_at:
+            with self._lock:
+                if self._token is None or self.clock() >= self._reload_at:
+                    self._reload()
+        return self._token
+
+    def _reload(self):
+        with open(self.jwt_token_file, 'r') as f:
+            token = f.read().strip()
+        exp = token_expiry(token)
+        now = self.clock()
+        if exp is None or exp <= now:
+            # 无法解析或已过期：稍后再检查文件是否被重新生成
+            self._reload_at = now + FILE_RECHECK_INTERVAL
+        else:
+            self._reload_at = exp
+        self._token = token
+
+
+_file_providers: Dict[str, FileTokenProvider] = {}
+_file_providers_lock = threading.Lock()
+
+
+def get_file_token_provider(jwt_token_file: str) -> FileTokenProvider:
+    """按文件路径共享 FileTokenProvider"""
+    with _file_providers_lock:
+        provider = _file_providers.get(jwt_token_file)
+        if provider is None:
+            provider = FileTokenProvider(jwt_token_file)
+            _file_providers[jwt_token_file] = provider
+        return provider
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+链路追踪
+按调用嵌套记录 span（resolve -> fetch -> request / parse -> format），每个 span 带耗时和
+缓存命中等标注；按链路采样，结束的 span 逐行写入本地 JSONL 文件。默认关闭
+
+用法:
+    get_default_tracer().enable(JSONLExporter("traces.ndjson"), sample_rate=0.1)
+    python tracing.py traces.ndjson      # 按 span 名称汇总耗时，找出最慢的阶段
+"""
+
+import argparse
+import contextvars
+import random
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from output_sink import open_sink, read_records
+
+_current_span = contextvars.ContextVar("qweather_span", default=None)
+# 未被采样的链路：子 span 不再单独采样
+_UNSAMPLED = object()
+
+
+class Span:
+    """一次计时的操作，with 块结束时导出"""
+
+    __slots__ = ("tracer", "name", "trace_id", "span_id", "parent_id", "start",
+                 "duration", "attributes", "error", "_started", "_token")
+
+    def __init__(self, tracer: "Tracer", name: str, trace_id: str,
+                 parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.error = None
+        self.duration = None
+
+    def set(self, key: str, value: Any):
+        """添加标注（如 cache_hit=True）"""
+        self.attributes[key] = value
+
+    def fail(self, message: str):
+        """记录已被捕获处理的错误（未捕获的异常在 with 块结束时自动记录）"""
+        self.error = message
+
+    def to_dict(self) -> Dict:
+        return {"trace_id": self.trace_id, "span_id": self.span_id,
+                "parent_id": self.parent_id, "name": self.name,
+                "start": round(self.start, 6), "duration_ms": round(self.duration * 1000, 3),
+                "attributes": self.attributes, "error": self.error}
+
+    def __enter__(self):
+        self.start = time.time()
+        self._started = time.perf_counter()
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self._started
+        _current_span.reset(self._token)
+        if exc_type is not None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        self.tracer._export(self)
+
+
+class _NullSpan:
+    """未采样或关闭时使用的空 span"""
+
+    __slots__ = ()
+
+    def set(self, key: str, value: Any):
+        pass
+
+    def fail(self, message: str):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _UnsampledSpan(_NullSpan):
+    """未被采样的根 span：在上下文中标记整条链路不采样"""
+
+    __slots__ = ("_token",)
+
+    def __enter__(self):
+        self._token = _current_span.set(_UNSAMPLED)
+        return self
+
+    def __exit__(self, *exc):
+        _current_span.reset(self._token)
+
+
+class JSONLExporter:
+    """把结束的 span 逐行写入 NDJSON 文件（可用 .gz / .zst 扩展名压缩）"""
+
+    def __init__(self, path: str, **sink_options):
+        """
+        :param path: 输出文件，如 traces.ndjson
+        :param sink_options: 传给 output_sink.NDJSONSink 的参数（缓冲、轮转等）
+        """
+        self.path = path
+        self.sink = open_sink(path, **sink_options)
+
+    def export(self, span: Span):
+        self.sink.write(span.to_dict())
+
+    def close(self):
+        self.sink.close()
+
+
+class Tracer:
+    """按链路采样的追踪器（线程和协程之间通过 contextvars 区分当前 span）"""
+
+    def __init__(self, exporter=None, sample_rate: float = 1.0,
+                 rng: Callable[[], float] = random.random):
+        """
+        :param exporter: span 导出器（需实现 export(span)），None 表示关闭
+        :param sample_rate: 链路采样率（0~1），在根 span 处决定，整条链路一起保留或丢弃
+        :param rng: 随机数函数（便于测试）
+        """
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+        self.rng = rng
+        self.exported = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None and self.sample_rate > 0
+
+    def enable(self, exporter, sample_rate: float = 1.0):
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+
+    def disable(self):
+        self.exporter = None
+
+    def span(self, name: str, **attributes):
+        """
+        开始一个 span：with tracer.span("fetch", city_id=...) as span: ...
+
+        当前没有 span 时作为根 span 按采样率决定是否记录，否则作为当前 span 的子 span
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        parent = _current_span.get()
+        if parent is _UNSAMPLED:
+            return _NULL_SPAN
+        if parent is None:
+            if self.rng() >= self.sample_rate:
+                return _UnsampledSpan()
+            return Span(self, name, f"{random.getrandbits(128):032x}", None, attributes)
+        return Span(self, name, parent.trace_id, parent.span_id, attributes)
+
+    def _export(self, span: Span):
+        exporter = self.exporter
+        if exporter is not None:
+            exporter.export(span)
+            self.exported += 1
+
+    def close(self):
+        """关闭导出器（写出缓冲区）"""
+        if self.exporter is not None and hasattr(self.exporter, "close"):
+            self.exporter.close()
+
+
+def current_span():
+    """当前 span（没有或未采样时返回空 span，可直接调用 set）"""
+    span = _current_span.get()
+    return span if isinstance(span, Span) else _NULL_SPAN
+
+
+_default_tracer = Tracer(sample_rate=0.0)
+
+
+def get_default_tracer() -> Tracer:
+    """进程内共享的追踪器（默认关闭，调用 enable(exporter, sample_rate) 开启）"""
+    return _default_tracer
+
+
+def summarize(path: str) -> List[Dict]:
+    """
+    按 span 名称汇总追踪文件中的耗时
+
+    :return: [{"name", "count", "errors", "p50_ms", "p99_ms", "max_ms", "total_ms"}]，
+             按总耗时从大到小排列
+    """
+    durations: Dict[str, List[float]] = {}
+    errors: Dict[str, int] = {}
+    for record in read_records(path):
+        durations.setdefault(record["name"], []).append(record["duration_ms"])
+        errors[record["name"]] = errors.get(record["name"], 0) + (record["error"] is not None)
+
+    def percentile(values, p):
+        return values[max(0, -(-len(values) * p // 100) - 1)]
+
+    rows = []
+    for name, values in durations.items():
+        values.sort()
+        rows.append({"name": name, "count": len(values), "errors": errors[name],
+                     "p50_ms": percentile(values, 50), "p99_ms": percentile(values, 99),
+                     "max_ms": values[-1], "total_ms": sum(values)})
+    rows.sort(key=lambda row: row["total_ms"], reverse=True)
+    return rows
+
+
+def main(argv: Optional[list] = None):
+    """主函数：汇总追踪文件"""
+    parser = argparse.ArgumentParser(description="按 span 名称汇总追踪文件中的耗时")
+    parser.add_argument("path", help="追踪文件（JSONLExporter 的输出）")
+    args = parser.parse_args(argv)
+
+    print(f"{'span':<24}{'次数':>8}{'错误':>6}{'p50(ms)':>10}{'p99(ms)':>10}"
+          f"{'最大(ms)':>10}{'合计(ms)':>12}")
+    for row in summarize(args.path):
+        print(f"{row['name']:<24}{row['count']:>8}{row['errors']:>6}{row['p50_ms']:>10.2f}"
+              f"{row['p99_ms']:>10.2f}{row['max_ms']:>10.2f}{row['total_ms']:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
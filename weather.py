@@ -4,9 +4,7 @@
 只需填空即可使用！
 """
 
-import time
-import jwt
-from pathlib import Path
+from token_manager import TokenProvider, load_private_key, sign_jwt_token
 
 # ==================== 🔴 填空区域开始 ====================
 # 请将以下三个值替换为您的实际信息：
@@ -28,40 +26,21 @@ TOKEN_EXPIRY_MINUTES = 15  # ← 默认15分钟，可修改
 
 def generate_jwt_token():
     """生成JWT令牌"""
+    # 检查并读取私钥
+    private_key = load_private_key(PRIVATE_KEY_PATH)
 
-    # 检查私钥文件是否存在
-    if not Path(PRIVATE_KEY_PATH).exists():
-        raise FileNotFoundError(f"私钥文件不存在: {PRIVATE_KEY_PATH}")
-
-    # 读取私钥
-    with open(PRIVATE_KEY_PATH, 'r') as f:
-        private_key = f.read()
-
-    # 计算时间戳
-    current_time = int(time.time())
-
-    # 构建JWT Header
-    headers = {
-        "alg": "EdDSA",
-        "kid": KEY_ID
-    }
-
-    # 构建JWT Payload
-    payload = {
-        "sub": PROJECT_ID,          # 项目ID
-        "iat": current_time - 30,   # 签发时间（当前时间前30秒）
-        "exp": current_time + (TOKEN_EXPIRY_MINUTES * 60)  # 过期时间
-    }
-
-    # 生成JWT令牌
-    token = jwt.encode(
-        payload,
-        private_key,
-        algorithm="EdDSA",
-        headers=headers
-    )
-
-    return token
+    # 签发令牌（项目ID为sub，凭据ID为kid）
+    return sign_jwt_token(private_key, PROJECT_ID, KEY_ID, TOKEN_EXPIRY_MINUTES)
+
+
+def create_token_provider():
+    """
+    创建进程内令牌提供者
+
+    令牌在内存中缓存，并在过期前自动后台续签，无需手动重新生成 jwt_token.txt。
+    可直接传给各客户端的 token_provider 参数。
+    """
+    return TokenProvider(PRIVATE_KEY_PATH, PROJECT_ID, KEY_ID, TOKEN_EXPIRY_MINUTES)
 
 
 def main():
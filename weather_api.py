@@ -7,6 +7,11 @@
 import requests
 import json
 
+from http_transport import build_url, get_default_transport
+from output_sink import open_sink
+from renderer import weather_card
+from token_manager import get_file_token_provider
+
 # ==================== 🔴 填空区域 ====================
 # 请将以下值替换为您的实际信息：
 
@@ -22,11 +27,9 @@ CITY_ID = "101010100"  # ← 可修改为其他城市ID
 
 
 def load_jwt_token():
-    """从文件加载JWT令牌"""
+    """从文件加载JWT令牌（读取后缓存在内存中，过期前不再读文件）"""
     try:
-        with open(JWT_TOKEN_FILE, 'r') as f:
-            token = f.read().strip()
-        return token
+        return get_file_token_provider(JWT_TOKEN_FILE).get_token()
     except FileNotFoundError:
         raise FileNotFoundError(f"JWT令牌文件不存在: {JWT_TOKEN_FILE}")
 
@@ -42,7 +45,7 @@ def get_weather_now(city_id):
     token = load_jwt_token()
 
     # 构建API URL
-    api_url = f"https://{API_HOST}/v7/weather/now"
+    api_url = build_url(API_HOST, "/v7/weather/now")
 
     # 设置请求头
     headers = {
@@ -57,8 +60,8 @@ def get_weather_now(city_id):
     }
 
     try:
-        # 发送请求
-        response = requests.get(
+        # 发送请求（复用共享连接池）
+        response = get_default_transport().get(
             api_url,
             headers=headers,
             params=params,
@@ -88,32 +91,8 @@ def format_weather_data(weather_data):
     if not weather_data or "now" not in weather_data:
         return "未获取到天气数据"
 
-    now = weather_data["now"]
     location = weather_data.get("location", {})
-
-    # 提取关键信息
-    info = {
-        "城市": location.get("name", "北京"),
-        "更新时间": now.get("obsTime", "未知时间").replace("T", " "),
-        "温度": f"{now.get('temp', 'N/A')}°C",
-        "天气状况": now.get("text", "N/A"),
-        "体感温度": f"{now.get('feelsLike', 'N/A')}°C",
-        "风向": now.get("windDir", "N/A"),
-        "风力": f"{now.get('windScale', 'N/A')}级",
-        "湿度": f"{now.get('humidity', 'N/A')}%",
-        "气压": f"{now.get('pressure', 'N/A')} hPa"
-    }
-
-    # 构建格式化字符串
-    result = f"\n{'='*50}\n"
-    result += f"🌤️  {info['城市']} 实时天气\n"
-    result += f"{'='*50}\n"
-
-    for key, value in info.items():
-        result += f"  {key}: {value}\n"
-
-    result += f"{'='*50}\n"
-    return result
+    return weather_card(weather_data, {"name": location.get("name", "北京")}, width=50)
 
 
 def main():
@@ -146,13 +125,13 @@ def main():
                 except Exception as e:
                     print(f"❌ 查询失败: {e}")
 
-        # 4. 保存结果到文件
+        # 4. 保存结果到文件（每次一行追加，.gz / .zst 结尾时压缩）
         print("\n是否保存结果到文件？ (y/n): ", end="")
         if input().strip().lower() == 'y':
-            filename = input("请输入文件名 (默认: weather_result.json): ").strip() or "weather_result.json"
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(weather_data, f, ensure_ascii=False, indent=2)
-            print(f"✅ 结果已保存到: {filename}")
+            filename = input("请输入文件名 (默认: weather_result.ndjson): ").strip() or "weather_result.ndjson"
+            with open_sink(filename) as sink:
+                sink.write(weather_data)
+            print(f"✅ 结果已追加到: {filename}")
 
         print("\n" + "=" * 60)
         print("操作完成！")
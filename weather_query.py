@@ -4,21 +4,47 @@
 先搜索城市获取准确信息，再查询天气
 """
 
-import requests
 import json
 from typing import Dict, Optional
 
+from cache import LRUCache
+from city_resolver import CityResolver, cached_search, search_cache_key, store_search
+from http_transport import HttpTransport, build_url, get_default_transport
+from observation import Observation
+from renderer import weather_card
+from response_decoder import decode_locations, loads
+from token_manager import get_file_token_provider
+from tracing import Tracer, get_default_tracer
+
 class WeatherQuery:
     """天气查询客户端"""
 
-    def __init__(self, api_host: str, jwt_token_file: str):
+    def __init__(self, api_host: str, jwt_token_file: str,
+                 transport: Optional[HttpTransport] = None,
+                 token_provider=None,
+                 cache: Optional[LRUCache] = None,
+                 tracer: Optional[Tracer] = None,
+                 resolver: Optional[CityResolver] = None):
+        """
+        :param api_host: API Host
+        :param jwt_token_file: JWT令牌文件（未指定 token_provider 时使用）
+        :param transport: HTTP传输层，默认使用共享连接池
+        :param token_provider: 令牌提供者（如 token_manager.TokenProvider），需实现 get_token()
+        :param cache: 缓存（可与其他客户端共用），默认不缓存
+        :param tracer: 链路追踪器，默认使用进程内共享的追踪器（默认关闭）
+        :param resolver: 城市名称解析层，默认按名称长期缓存城市搜索结果（有 cache 时存放在其中）
+        """
         self.api_host = api_host
         self.jwt_token_file = jwt_token_file
+        self.transport = transport or get_default_transport()  # 共享连接池
+        self.token_provider = token_provider or get_file_token_provider(jwt_token_file)
+        self.cache = cache
+        self.tracer = tracer if tracer is not None else get_default_tracer()
+        self.resolver = resolver or CityResolver(self.search_city, cache=cache)
 
     def load_jwt_token(self):
-        """加载JWT令牌"""
-        with open(self.jwt_token_file, 'r') as f:
-            return f.read().strip()
+        """加载JWT令牌（内存缓存）"""
+        return self.token_provider.get_token()
 
     def search_city(self, city_name: str, adm: Optional[str] = None) -> Optional[Dict]:
         """
@@ -28,26 +54,44 @@ class WeatherQuery:
         :param adm: 上级行政区划（用于过滤重名）
         :return: 城市信息
         """
+        with self.tracer.span("resolve", query=city_name) as span:
+            return self._search_city(city_name, adm, span)
+
+    def _search_city(self, city_name: str, adm: Optional[str], span) -> Optional[Dict]:
+        # 与 WeatherToolkit.search_city 使用相同的缓存键，共用缓存时可互相命中
+        cache_key = search_cache_key(city_name, adm)
+        if self.cache is not None:
+            cached = cached_search(self.cache, cache_key, 1)
+            span.set("cache_hit", cached is not None)
+            if cached is not None:
+                return cached[0] if cached else None
+
         token = self.load_jwt_token()
-        url = f"https://{self.api_host}/geo/v2/city/lookup"
+        url = build_url(self.api_host, "/geo/v2/city/lookup")
 
         headers = {"Authorization": f"Bearer {token}"}
-        params = {"location": city_name, "number": 1}
+        params = {"location": city_name.strip(), "number": 1}
         if adm:
             params["adm"] = adm
 
         try:
-            response = requests.get(url, headers=headers, params=params, timeout=10)
-            response.raise_for_status()
-
-            data = response.json()
-            if data.get("code") != "200":
+            with self.tracer.span("request", endpoint="/geo/v2/city/lookup"):
+                response = self.transport.get(url, headers=headers, params=params, timeout=10)
+                response.raise_for_status()
+
+            with self.tracer.span("parse"):
+                code, locations = decode_locations(response.content)
+            if code == "404" and self.cache is not None:
+                store_search(self.cache, cache_key, 1, [])  # 负缓存
+            if code != "200":
                 return None
 
-            locations = data.get("location", [])
+            if self.cache is not None:
+                store_search(self.cache, cache_key, 1, locations)
             return locations[0] if locations else None
 
         except Exception as e:
+            span.fail(str(e))
             print(f"城市搜索失败: {e}")
             return None
 
@@ -58,24 +102,43 @@ class WeatherQuery:
         :param city_id: 城市ID
         :return: 天气数据
         """
+        with self.tracer.span("fetch", city_id=city_id) as span:
+            return self._get_weather_now(city_id, span)
+
+    def _get_weather_now(self, city_id: str, span) -> Optional[Dict]:
+        if self.cache is not None:
+            # 缓存中存放 Observation（与 WeatherToolkit 共用），本方法返回其接口格式的字典
+            cached = self.cache.get("weather", city_id)
+            span.set("cache_hit", cached is not None)
+            if cached is not None:
+                return cached.to_dict()
+
         token = self.load_jwt_token()
-        url = f"https://{self.api_host}/v7/weather/now"
+        url = build_url(self.api_host, "/v7/weather/now")
 
         headers = {"Authorization": f"Bearer {token}"}
         params = {"location": city_id, "lang": "zh"}
 
         try:
-            response = requests.get(url, headers=headers, params=params, timeout=10)
-            response.raise_for_status()
-
-            data = response.json()
-            if data.get("code") != "200":
-                print(f"API错误: {data.get('message', '未知错误')}")
-                return None
-
-            return data
+            with self.tracer.span("request", endpoint="/v7/weather/now"):
+                response = self.transport.get(url, headers=headers, params=params, timeout=10)
+                response.raise_for_status()
+
+            with self.tracer.span("parse"):
+                data = loads(response.content)
+                if data.get("code") != "200":
+                    print(f"API错误: {data.get('message', '未知错误')}")
+                    span.fail(f"API错误: {data.get('code')}")
+                    return None
+
+                observation = Observation.from_response(data)
+                if self.cache is not None:
+                    self.cache.set("weather", city_id, observation)
+            # 未命中时同样返回 to_dict 的结果，与命中缓存时的格式一致
+            return observation.to_dict()
 
         except Exception as e:
+            span.fail(str(e))
             print(f"天气查询失败: {e}")
             return None
 
@@ -83,27 +146,33 @@ class WeatherQuery:
         """
         通过城市名称查询天气
 
-        :param city_name: 城市名称
+        :param city_name: 城市名称，也可以是9位城市ID或"经度,纬度"（直接查询天气）
         :param adm: 上级行政区划（用于过滤重名）
         :return: 天气数据
         """
-        # 先搜索城市
+        with self.tracer.span("query_weather_by_city", query=city_name):
+            return self._query_weather_by_city(city_name, adm)
+
+    def _query_weather_by_city(self, city_name: str, adm: Optional[str]) -> Optional[Dict]:
+        # 先解析城市（之前解析过的名称、城市ID和经纬度不再请求搜索接口）
         print(f"🔍 搜索城市: {city_name}...")
-        city_info = self.search_city(city_name, adm)
+        city_info = self.resolver.resolve(city_name, adm)
 
         if not city_info:
             print(f"❌ 未找到城市: {city_name}")
             return None
 
-        print(f"✅ 找到城市: {city_info['name']} (ID: {city_info['id']})")
-        print(f"   位置: {city_info['adm1']}, {city_info['country']}")
+        print(f"✅ 找到城市: {city_info.get('name', city_info['id'])} (ID: {city_info['id']})")
+        if "adm1" in city_info:
+            print(f"   位置: {city_info['adm1']}, {city_info.get('country', '未知')}")
 
         # 再查询天气
         print(f"🔄 查询天气...")
         weather_data = self.get_weather_now(city_info["id"])
 
         if weather_data:
-            # 将城市信息添加到天气数据中
+            # 将城市信息添加到天气数据中（复制一份，避免修改缓存中的对象）
+            weather_data = dict(weather_data)
             weather_data["city_info"] = city_info
 
         return weather_data
@@ -113,35 +182,8 @@ class WeatherQuery:
         if not weather_data or "now" not in weather_data:
             return "未获取到天气数据"
 
-        now = weather_data["now"]
-        city_info = weather_data.get("city_info", {})
-
-        # 提取城市名称
-        city_name = city_info.get("name", "未知城市")
-
-        # 构建结果
-        result = f"\n{'='*60}\n"
-        result += f"🌤️  {city_name} 实时天气\n"
-        result += f"{'='*60}\n"
-
-        result += f"城市信息:\n"
-        result += f"  名称: {city_info.get('name', '未知')}\n"
-        result += f"  ID: {city_info.get('id', '未知')}\n"
-        result += f"  位置: {city_info.get('adm1', '未知')}, {city_info.get('country', '未知')}\n"
-        result += f"  经纬度: {city_info.get('lat', '未知')}, {city_info.get('lon', '未知')}\n"
-
-        result += f"\n天气数据:\n"
-        result += f"  更新时间: {now.get('obsTime', '未知时间').replace('T', ' ')}\n"
-        result += f"  温度: {now.get('temp', 'N/A')}°C\n"
-        result += f"  天气状况: {now.get('text', 'N/A')}\n"
-        result += f"  体感温度: {now.get('feelsLike', 'N/A')}°C\n"
-        result += f"  风向: {now.get('windDir', 'N/A')}\n"
-        result += f"  风力: {now.get('windScale', 'N/A')}级\n"
-        result += f"  湿度: {now.get('humidity', 'N/A')}%\n"
-        result += f"  气压: {now.get('pressure', 'N/A')} hPa\n"
-
-        result += f"{'='*60}\n"
-        return result
+        with self.tracer.span("format"):
+            return weather_card(weather_data, weather_data.get("city_info", {}))
 
 
 def main():
@@ -209,7 +251,7 @@ def main():
         except Exception as e:
             print(f"错误: {e}")
 
-    print("\n查询结束")
+    print(f"\n查询结束（省去城市搜索 {querier.resolver.stats()['geo_calls_saved']} 次）")
 
 
 if __name__ == "__main__":
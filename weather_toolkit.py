@@ -4,23 +4,107 @@
 集成城市搜索、天气查询、数据保存
 """
 
-import requests
 import json
-import time
-from typing import Dict, List, Optional
+import threading
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Iterable, List, Optional
+
+from cache import LRUCache
+from city_index import CityIndex
+from city_resolver import CityResolver, cached_search, search_cache_key, store_search
+from history_store import HistoryStore
+from http_transport import HttpTransport, build_url, get_default_transport
+from metrics import Metrics, get_default_metrics
+from observation import Observation
+from output_sink import NDJSONSink, is_sink_path, open_sink
+from rate_limiter import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE
+from renderer import render_text, weather_card
+from response_decoder import decode_locations, decode_weather_now
+from singleflight import SingleFlight, request_key
+from spatial_index import SpatialIndex
+from token_manager import get_file_token_provider
+from tracing import Tracer, get_default_tracer
+
+SEARCH_PATH = "/geo/v2/city/lookup"
+WEATHER_PATH = "/v7/weather/now"
+DEFAULT_MAX_WORKERS = 8
+
+
+def search_params(city_name: str, adm: Optional[str] = None,
+                  range_code: Optional[str] = None, number: int = 10) -> Dict:
+    """城市搜索的请求参数"""
+    params = {"location": city_name.strip(), "number": number}
+    if adm:
+        params["adm"] = adm
+    if range_code:
+        params["range"] = range_code
+    return params
+
+
+def weather_params(city_id: str) -> Dict:
+    """实时天气的请求参数"""
+    return {"location": city_id, "lang": "zh"}
+
+
+def mark_stale(weather: Observation, age: float) -> Observation:
+    """返回标记为过期数据的副本（stale=True，age 为已缓存秒数）"""
+    return weather.replace(stale=True, age=int(age))
+
 
 class WeatherToolkit:
     """天气工具箱"""
 
-    def __init__(self, api_host: str, jwt_token_file: str):
+    def __init__(self, api_host: str, jwt_token_file: str,
+                 transport: Optional[HttpTransport] = None,
+                 token_provider=None,
+                 cache: Optional[LRUCache] = None,
+                 city_index: Optional[CityIndex] = None,
+                 spatial_index: Optional[SpatialIndex] = None,
+                 singleflight: Optional[SingleFlight] = None,
+                 stale_while_revalidate: float = 0,
+                 stale_if_error: float = 0,
+                 history: Optional[HistoryStore] = None,
+                 metrics: Optional[Metrics] = None,
+                 tracer: Optional[Tracer] = None,
+                 resolver: Optional[CityResolver] = None):
+        """
+        :param api_host: API Host
+        :param jwt_token_file: JWT令牌文件（未指定 token_provider 时使用）
+        :param transport: HTTP传输层，默认使用共享连接池
+        :param token_provider: 令牌提供者（如 token_manager.TokenProvider），需实现 get_token()
+        :param cache: 缓存（命名空间 search / weather），默认新建一个有界 LRU 缓存；
+                      传入 disk_cache.TieredCache 可跨进程共享
+        :param city_index: 离线城市索引，命中时不再请求城市搜索接口
+        :param spatial_index: 最近城市空间索引，用于经纬度到城市ID的本地解析
+        :param singleflight: 请求合并器，相同接口和参数的并发请求只发出一次
+        :param stale_while_revalidate: 天气缓存过期后多少秒内直接返回旧数据并在后台刷新
+        :param stale_if_error: 天气缓存过期后多少秒内，上游出错时返回旧数据
+        :param history: 观测历史存储，每次从上游获取的观测都会追加保存
+        :param metrics: 指标注册表（记录令牌、请求、解析各阶段耗时），默认使用进程内共享的注册表
+        :param tracer: 链路追踪器（resolve / fetch / request / parse / format），默认使用进程内共享的追踪器
+        :param resolver: 城市名称解析层，默认把名称解析结果长期保存在 cache 的 "resolve" 命名空间
+        """
         self.api_host = api_host
         self.jwt_token_file = jwt_token_file
-        self.cache = {}  # 简单的缓存
+        self.transport = transport or get_default_transport()  # 共享连接池
+        self.token_provider = token_provider or get_file_token_provider(jwt_token_file)
+        self.cache = cache if cache is not None else LRUCache()
+        self.city_index = city_index
+        self.spatial_index = spatial_index
+        self.singleflight = singleflight if singleflight is not None else SingleFlight()
+        self.stale_while_revalidate = stale_while_revalidate
+        self.stale_if_error = stale_if_error
+        self.history = history
+        self.metrics = metrics if metrics is not None else get_default_metrics()
+        self.tracer = tracer if tracer is not None else get_default_tracer()
+        self.resolver = resolver or CityResolver(self._lookup_city, cache=self.cache)
+        self._refreshing = set()
+        self._refreshing_lock = threading.Lock()
+        self.prefetcher = None  # prefetch.PrefetchScheduler 创建时登记
 
     def load_jwt_token(self):
-        """加载JWT令牌"""
-        with open(self.jwt_token_file, 'r') as f:
-            return f.read().strip()
+        """加载JWT令牌（内存缓存）"""
+        return self.token_provider.get_token()
 
     def search_city(self, city_name: str, adm: Optional[str] = None,
                    range_code: Optional[str] = None, number: int = 10) -> List[Dict]:
@@ -33,79 +117,347 @@ class WeatherToolkit:
         :param number: 返回结果数量
         :return: 城市列表
         """
-        cache_key = f"search_{city_name}_{adm}_{range_code}_{number}"
-        if cache_key in self.cache:
-            # 检查缓存是否过期（1小时）
-            if time.time() - self.cache[cache_key]["timestamp"] < 3600:
-                return self.cache[cache_key]["data"]
+        with self.tracer.span("resolve", query=city_name) as span:
+            if self.city_index is not None:
+                local = self.city_index.search(city_name, adm=adm, range_code=range_code,
+                                               number=number)
+                if local:
+                    span.set("source", "index")
+                    return local
+
+            # 名称规范化后作为键；已缓存的较多结果可直接回答较少数量的请求
+            cache_key = search_cache_key(city_name, adm, range_code)
+            cached = cached_search(self.cache, cache_key, number)
+            span.set("cache_hit", cached is not None)
+            if cached is not None:
+                return cached
+
+            params = search_params(city_name, adm, range_code, number)
+            try:
+                return self.singleflight.do(request_key(SEARCH_PATH, params),
+                                            self._fetch_search, cache_key, params)
+            except Exception as e:
+                self.metrics.inc("qweather_client_errors_total", operation="search_city")
+                span.fail(str(e))
+                print(f"搜索失败: {e}")
+                return []
 
-        token = self.load_jwt_token()
-        url = f"https://{self.api_host}/geo/v2/city/lookup"
+    def _fetch_search(self, cache_key: str, params: Dict) -> List[Dict]:
+        """请求城市搜索并写入缓存（网络错误时抛出异常）"""
+        # 等待合并期间其他线程可能已写入缓存
+        number = params["number"]
+        cached = cached_search(self.cache, cache_key, number)
+        if cached is not None:
+            return cached
+
+        stage = self.metrics.time
+        with stage("qweather_stage_seconds", endpoint=SEARCH_PATH, stage="token"):
+            token = self.load_jwt_token()
+        url = build_url(self.api_host, SEARCH_PATH)
 
         headers = {"Authorization": f"Bearer {token}"}
-        params = {"location": city_name, "number": number}
-        if adm:
-            params["adm"] = adm
-        if range_code:
-            params["range"] = range_code
 
-        try:
-            response = requests.get(url, headers=headers, params=params, timeout=10)
+        span = self.tracer.span
+        with stage("qweather_stage_seconds", endpoint=SEARCH_PATH, stage="request"), \
+                span("request", endpoint=SEARCH_PATH):
+            response = self.transport.get(url, headers=headers, params=params, timeout=10)
             response.raise_for_status()
 
-            data = response.json()
-            if data.get("code") != "200":
-                return []
+        with stage("qweather_stage_seconds", endpoint=SEARCH_PATH, stage="parse"), \
+                span("parse"):
+            # 只保留常用字段，缓存和返回的城市信息更小
+            code, locations = decode_locations(response.content)
+        if code == "404":
+            # 未找到也缓存一段较短的时间，重复的错误查询不再请求上游
+            store_search(self.cache, cache_key, number, [])
+            return []
+        if code != "200":
+            return []
 
-            locations = data.get("location", [])
+        # 缓存结果
+        store_search(self.cache, cache_key, number, locations)
 
-            # 缓存结果
-            self.cache[cache_key] = {
-                "timestamp": time.time(),
-                "data": locations
-            }
+        return locations
 
-            return locations
+    def _lookup_city(self, city_name: str, adm: Optional[str] = None) -> Optional[Dict]:
+        """城市搜索的第一个结果（供解析层使用）"""
+        cities = self.search_city(city_name, adm=adm, number=1)
+        return cities[0] if cities else None
 
-        except Exception as e:
-            print(f"搜索失败: {e}")
-            return []
+    def nearest_city(self, lat: float, lon: float) -> Optional[Dict]:
+        """
+        通过经纬度获取最近的城市
 
-    def get_weather_now(self, city_id: str) -> Optional[Dict]:
-        """获取实时天气"""
-        cache_key = f"weather_{city_id}"
-        if cache_key in self.cache:
-            if time.time() - self.cache[cache_key]["timestamp"] < 300:  # 5分钟缓存
-                return self.cache[cache_key]["data"]
+        有空间索引时在本地计算，否则使用城市搜索接口的坐标查询（"经度,纬度"）
 
-        token = self.load_jwt_token()
-        url = f"https://{self.api_host}/v7/weather/now"
+        :param lat: 纬度
+        :param lon: 经度
+        :return: 城市信息
+        """
+        if self.spatial_index is not None:
+            nearest = self.spatial_index.nearest(lat, lon, k=1)
+            if nearest:
+                return self.spatial_index.get(nearest[0][0])
+
+        cities = self.search_city(f"{lon:.2f},{lat:.2f}", number=1)
+        return cities[0] if cities else None
+
+    def _load_weather_now(self, city_id: str, priority: int = PRIORITY_INTERACTIVE,
+                          refresh: bool = False) -> Observation:
+        """合并同一城市的并发请求（失败时抛出异常）"""
+        return self.singleflight.do(request_key(WEATHER_PATH, weather_params(city_id)),
+                                    self._fetch_weather_now, city_id, priority, refresh)
+
+    def _fetch_weather_now(self, city_id: str, priority: int = PRIORITY_INTERACTIVE,
+                           refresh: bool = False) -> Observation:
+        """请求实时天气并写入缓存（失败时抛出异常；refresh=True 时忽略未过期的缓存）"""
+        # 等待合并期间其他线程可能已写入缓存
+        cached = None if refresh else self.cache.get("weather", city_id)
+        if cached is not None:
+            return cached
+
+        stage = self.metrics.time
+        with stage("qweather_stage_seconds", endpoint=WEATHER_PATH, stage="token"):
+            token = self.load_jwt_token()
+        url = build_url(self.api_host, WEATHER_PATH)
 
         headers = {"Authorization": f"Bearer {token}"}
-        params = {"location": city_id, "lang": "zh"}
+        params = weather_params(city_id)
 
-        try:
-            response = requests.get(url, headers=headers, params=params, timeout=10)
+        span = self.tracer.span
+        with stage("qweather_stage_seconds", endpoint=WEATHER_PATH, stage="request"), \
+                span("request", endpoint=WEATHER_PATH):
+            response = self.transport.get(url, headers=headers, params=params, timeout=10,
+                                          priority=priority)
             response.raise_for_status()
 
-            data = response.json()
-            if data.get("code") != "200":
-                return None
+        with stage("qweather_stage_seconds", endpoint=WEATHER_PATH, stage="parse"), \
+                span("parse"):
+            code, observation = decode_weather_now(response.content)
+            if code != "200":
+                raise ValueError(f"API错误: {code}")
+
+        self._store_weather(city_id, observation)
+        return observation
+
+    def _store_weather(self, city_id: str, observation: Observation):
+        """保存上游返回的观测：写入缓存，通知预取调度，追加到历史"""
+        # 过期后保留一段时间，供 stale-while-revalidate / stale-if-error 使用
+        self.cache.set("weather", city_id, observation,
+                       stale_ttl=max(self.stale_while_revalidate, self.stale_if_error))
+        if self.prefetcher is not None:
+            self.prefetcher.record_fetch(city_id, observation)
+        if self.history is not None:
+            try:
+                self.history.append(city_id, observation)
+            except Exception as e:  # 历史只是附带记录，保存失败不影响本次查询
+                print(f"保存历史失败: {e}")
+
+    def refresh_weather_now(self, city_id: str, priority: int = PRIORITY_BACKGROUND) -> Observation:
+        """
+        忽略缓存重新请求实时天气并写入缓存（供预取使用，失败时抛出异常）
+
+        :param priority: 限流优先级，默认作为后台请求
+        """
+        return self._load_weather_now(city_id, priority, refresh=True)
 
-            # 缓存结果
-            self.cache[cache_key] = {
-                "timestamp": time.time(),
-                "data": data
-            }
+    def _stale_weather(self, city_id: str, grace: float) -> Optional[Observation]:
+        """读取过期不超过 grace 秒的天气缓存（已标记 stale），没有则返回 None"""
+        if grace <= 0:
+            return None
+        data, age, _ = self.cache.get_stale("weather", city_id)
+        if data is None or age >= self.cache.ttl_for("weather") + grace:
+            return None
+        return mark_stale(data, age)
+
+    def _refresh_in_background(self, city_id: str):
+        """在后台线程中刷新天气缓存（同一城市同时只有一个刷新）"""
+        with self._refreshing_lock:
+            if city_id in self._refreshing:
+                return
+            self._refreshing.add(city_id)
+
+        def refresh():
+            try:
+                self._load_weather_now(city_id, PRIORITY_BACKGROUND)
+            except Exception as e:
+                print(f"后台刷新失败: {e}")
+            finally:
+                with self._refreshing_lock:
+                    self._refreshing.discard(city_id)
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    def _cached_weather(self, city_id: str) -> Optional[Observation]:
+        """读取天气缓存；过期但在 stale-while-revalidate 窗口内时返回旧数据并触发后台刷新"""
+        cached = self.cache.get("weather", city_id)
+        if cached is not None:
+            return cached
+
+        stale = self._stale_weather(city_id, self.stale_while_revalidate)
+        if stale is not None:
+            self._refresh_in_background(city_id)
+        return stale
+
+    def get_weather_now(self, city_id: str) -> Optional[Observation]:
+        """
+        获取实时天气（解析后的 Observation）
+
+        启用 stale_while_revalidate / stale_if_error 时可能返回过期数据，
+        此时结果中带有 stale=True 和 age（已缓存秒数）
+        """
+        if self.prefetcher is not None:
+            self.prefetcher.record_access(city_id)
+        with self.tracer.span("fetch", city_id=city_id) as span:
+            cached = self._cached_weather(city_id)
+            span.set("cache_hit", cached is not None)
+            if cached is not None:
+                span.set("stale", cached.stale)
+                return cached
+
+            try:
+                return self._load_weather_now(city_id)
+            except Exception as e:
+                self.metrics.inc("qweather_client_errors_total", operation="get_weather_now")
+                span.fail(str(e))
+                print(f"天气查询失败: {e}")
+                return self._stale_weather(city_id, self.stale_if_error)
+
+    def get_weather_many(self, city_ids: Iterable[str],
+                         max_workers: int = DEFAULT_MAX_WORKERS,
+                         timeout: Optional[float] = None,
+                         priority: int = PRIORITY_INTERACTIVE) -> Dict[str, Dict]:
+        """
+        批量获取实时天气
+
+        去重后先返回缓存中的城市，其余城市在线程池中并发请求，
+        单个城市失败或超时不影响其他城市
+
+        :param city_ids: 城市ID列表
+        :param max_workers: 最大并发数（不宜超过传输层每个主机的连接数）
+        :param timeout: 整批的等待时间（秒），超时未完成的城市记为错误
+        :param priority: 限流优先级，后台批量刷新应使用 PRIORITY_BACKGROUND
+        :return: {城市ID: {"data": Observation或None, "error": 错误信息或None}}，顺序与输入一致
+        """
+        results = {}
+        pending = []
+        for city_id in dict.fromkeys(city_ids):  # 去重并保持顺序
+            if self.prefetcher is not None and priority == PRIORITY_INTERACTIVE:
+                self.prefetcher.record_access(city_id)
+            cached = self._cached_weather(city_id)
+            if cached is not None:
+                results[city_id] = {"data": cached, "error": None}
+            else:
+                results[city_id] = {"data": None, "error": "超时"}
+                pending.append(city_id)
 
-            return data
+        if not pending:
+            return results
 
+        pool = ThreadPoolExecutor(max_workers=min(max_workers, len(pending)))
+        try:
+            futures = {pool.submit(self._load_weather_now, city_id, priority): city_id
+                       for city_id in pending}
+            done, _ = wait(futures, timeout=timeout)
+            for future in done:
+                city_id = futures[future]
+                try:
+                    results[city_id] = {"data": future.result(), "error": None}
+                except Exception as e:
+                    stale = self._stale_weather(city_id, self.stale_if_error)
+                    results[city_id] = {"data": stale, "error": None if stale else str(e)}
+        finally:
+            # 超时的请求不再等待，未开始的直接取消
+            pool.shutdown(wait=False, cancel_futures=True)
+
+        return results
+
+    def _weather_or_error(self, city_id: str, priority: int) -> Dict:
+        """获取一个城市的天气，返回流式输出的一条记录"""
+        if self.prefetcher is not None and priority == PRIORITY_INTERACTIVE:
+            self.prefetcher.record_access(city_id)
+        try:
+            data = self._cached_weather(city_id) or self._load_weather_now(city_id, priority)
+            return {"id": city_id, "data": data, "error": None}
         except Exception as e:
-            print(f"天气查询失败: {e}")
-            return None
+            stale = self._stale_weather(city_id, self.stale_if_error)
+            return {"id": city_id, "data": stale, "error": None if stale else str(e)}
+
+    def stream_weather(self, city_ids: Iterable[str], sink: NDJSONSink,
+                       max_workers: int = DEFAULT_MAX_WORKERS,
+                       priority: int = PRIORITY_INTERACTIVE) -> Dict[str, int]:
+        """
+        批量获取实时天气并逐条写入输出（按完成顺序）
+
+        与 get_weather_many 不同，city_ids 可以是任意长的迭代器：
+        同时在途的城市不超过 max_workers 的两倍，结果不在内存中累积
 
-    def save_weather_data(self, weather_data: Dict, filename: str):
-        """保存天气数据到文件"""
+        :param city_ids: 城市ID（可迭代对象，按需读取）
+        :param sink: 输出，如 output_sink.open_sink("weather.ndjson.gz")
+        :param max_workers: 最大并发数
+        :param priority: 限流优先级
+        :return: {"written": 写入条数, "errors": 失败条数}
+        """
+        written = errors = 0
+        pending = set()
+
+        def drain(return_when):
+            nonlocal pending, written, errors
+            done, pending = wait(pending, return_when=return_when)
+            for future in done:
+                record = future.result()
+                sink.write(record)
+                written += 1
+                errors += record["error"] is not None
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            for city_id in city_ids:
+                if len(pending) >= max_workers * 2:
+                    drain(FIRST_COMPLETED)
+                pending.add(pool.submit(self._weather_or_error, city_id, priority))
+            if pending:
+                drain(ALL_COMPLETED)
+
+        return {"written": written, "errors": errors}
+
+    def query_weather_by_city(self, city_name: str, adm: Optional[str] = None) -> Optional[Observation]:
+        """
+        通过城市名称查询天气
+
+        之前解析过的名称不再请求城市搜索接口；城市ID和"经度,纬度"直接查询天气
+
+        :param city_name: 城市名称、9位城市ID或"经度,纬度"
+        :param adm: 上级行政区划（用于过滤重名）
+        :return: 天气数据（city 属性为城市信息），未找到城市或查询失败返回 None
+        """
+        with self.tracer.span("query_weather_by_city", query=city_name):
+            city = self.resolver.resolve(city_name, adm)
+            if not city:
+                return None
+
+            weather = self.get_weather_now(city["id"])
+            if not weather:
+                return None
+            # 生成副本再附加城市信息，缓存中的对象保持不变
+            return weather.replace(city=city)
+
+    def save_weather_data(self, weather_data, filename: str):
+        """
+        保存天气数据（字典或 Observation）到文件
+
+        文件名为 .ndjson / .jsonl / .gz / .zst 时作为一行追加，否则覆盖写入格式化的JSON
+        """
+        if is_sink_path(filename):
+            try:
+                with open_sink(filename) as sink:
+                    sink.write(weather_data)
+                print(f"✅ 数据已追加到: {filename}")
+            except Exception as e:
+                print(f"保存失败: {e}")
+            return
+
+        if isinstance(weather_data, Observation):
+            weather_data = weather_data.to_dict()
         try:
             with open(filename, 'w', encoding='utf-8') as f:
                 json.dump(weather_data, f, ensure_ascii=False, indent=2)
@@ -114,48 +466,19 @@ class WeatherToolkit:
             print(f"保存失败: {e}")
 
     def format_city_list(self, cities: List[Dict]) -> str:
-        """格式化城市列表"""
+        """格式化城市列表（带序号的文本表格）"""
         if not cities:
             return "未找到匹配的城市"
 
-        result = f"找到 {len(cities)} 个城市:\n"
-        for i, city in enumerate(cities, 1):
-            result += f"{i}. {city['name']} (ID: {city['id']})\n"
-            result += f"   位置: {city.get('adm1', '未知')}, {city.get('country', '未知')}\n"
-            result += f"   经纬度: {city.get('lat', '未知')}, {city.get('lon', '未知')}\n"
-            result += f"   排名: {city.get('rank', '未知')}\n\n"
-
-        return result
+        return f"找到 {len(cities)} 个城市:\n" + render_text(cities)
 
-    def format_weather(self, weather_data: Dict, city_info: Dict) -> str:
+    def format_weather(self, weather: Optional[Observation], city_info: Dict) -> str:
         """格式化天气信息"""
-        if not weather_data or "now" not in weather_data:
+        if weather is None:
             return "未获取到天气数据"
 
-        now = weather_data["now"]
-
-        result = f"\n{'='*60}\n"
-        result += f"🌤️  {city_info.get('name', '未知城市')} 实时天气\n"
-        result += f"{'='*60}\n"
-
-        result += f"📍 城市信息:\n"
-        result += f"  名称: {city_info.get('name', '未知')}\n"
-        result += f"  ID: {city_info.get('id', '未知')}\n"
-        result += f"  位置: {city_info.get('adm1', '未知')}, {city_info.get('country', '未知')}\n"
-        result += f"  经纬度: {city_info.get('lat', '未知')}, {city_info.get('lon', '未知')}\n"
-
-        result += f"\n🌡️  天气数据:\n"
-        result += f"  更新时间: {now.get('obsTime', '未知时间').replace('T', ' ')}\n"
-        result += f"  温度: {now.get('temp', 'N/A')}°C\n"
-        result += f"  天气状况: {now.get('text', 'N/A')}\n"
-        result += f"  体感温度: {now.get('feelsLike', 'N/A')}°C\n"
-        result += f"  风向: {now.get('windDir', 'N/A')}\n"
-        result += f"  风力: {now.get('windScale', 'N/A')}级\n"
-        result += f"  湿度: {now.get('humidity', 'N/A')}%\n"
-        result += f"  气压: {now.get('pressure', 'N/A')} hPa\n"
-
-        result += f"{'='*60}\n"
-        return result
+        with self.tracer.span("format"):
+            return weather_card(weather, city_info)
 
 
 def main():
@@ -231,14 +554,18 @@ def main():
         elif choice == "2":
             # 查询天气
             city_id = input("请输入城市ID: ").strip()
-            weather = toolkit.get_weather_now(city_id)
+            with toolkit.tracer.span("query_weather_by_id", city_id=city_id):
+                weather = toolkit.get_weather_now(city_id)
+                if weather:
+                    # 获取城市信息（解析过的城市不再请求搜索接口）
+                    city_info = toolkit.resolver.describe(city_id)
+                    if city_info is None:
+                        cities = toolkit.search_city(city_id, number=1)
+                        city_info = cities[0] if cities else {"name": "未知城市", "id": city_id}
+                    text = toolkit.format_weather(weather, city_info)
 
             if weather:
-                # 获取城市信息
-                cities = toolkit.search_city(city_id, number=1)
-                city_info = cities[0] if cities else {"name": "未知城市", "id": city_id}
-
-                print(toolkit.format_weather(weather, city_info))
+                print(text)
 
                 save = input("\n是否保存结果到文件？(y/n): ").strip().lower()
                 if save == "y":
@@ -281,7 +608,7 @@ def main():
                     # 保存完整数据
                     full_data = {
                         "city_info": city_info,
-                        "weather": weather
+                        "weather": weather.to_dict()
                     }
                     toolkit.save_weather_data(full_data, filename)
 